@@ -0,0 +1,152 @@
+"""Admission control of the endpoints, to shed load instead of timing out under bursts.
+
+Each view is assigned a budget with the admitted decorator. A budget lets a number
+of requests run at once in a worker and a bounded number of others wait for their
+turn. Beyond that, or after waiting too long, requests are rejected at once with a
+503 and a Retry-After header. The heavy workbook endpoints and the cheap ones have
+separate budgets, so a burst of imports cannot take all the threads of a worker.
+
+Budgets are kept per process, like the gunicorn worker threads they share.
+"""
+
+import threading
+from functools import wraps
+
+from flask import current_app, jsonify, make_response
+
+
+class AdmissionGate:
+    """A semaphore with a bounded wait queue and counters of the admitted requests."""
+
+    def __init__(self, concurrency, queue_size, timeout):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def enter(self):
+        """Take a slot, waiting for one if the queue is not full. Returns False if rejected."""
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.waiting >= self.queue_size:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        with self._lock:
+            if acquired:
+                self.running += 1
+                self.admitted += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def leave(self):
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+            }
+
+
+_gates_lock = threading.Lock()
+
+
+def get_gate(budget, app=None):
+    """The admission gate of a budget of ADMISSION_BUDGETS, created on first use."""
+    app = app or current_app
+    gates = app.extensions.setdefault("admission_gates", {})
+    gate = gates.get(budget)
+    if gate is None:
+        with _gates_lock:
+            gate = gates.get(budget)
+            if gate is None:
+                limits = app.config["ADMISSION_BUDGETS"][budget]
+                gate = gates[budget] = AdmissionGate(
+                    int(limits["concurrency"]),
+                    int(limits["queue_size"]),
+                    float(app.config["ADMISSION_TIMEOUT"]),
+                )
+    return gate
+
+
+def gate_stats(app):
+    """The stats of the gates created so far, by budget."""
+    gates = app.extensions.get("admission_gates", {})
+    return {budget: gate.stats() for budget, gate in list(gates.items())}
+
+
+def rejected_response():
+    response = jsonify({"error": "The server is busy, retry later."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(current_app.config["ADMISSION_RETRY_AFTER"])
+    return response
+
+
+def _release_once(gate):
+    taken = threading.Lock()
+
+    def release():
+        if taken.acquire(blocking=False):
+            gate.leave()
+
+    return release
+
+
+def _released_after(iterable, release):
+    try:
+        yield from iterable
+    finally:
+        release()
+
+
+def admitted(budget):
+    """Decorate a view so that it runs within the admission budget of that name.
+
+    The slot is freed when the view returns, or for streamed responses once the
+    stream is exhausted or closed.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            gate = get_gate(budget)
+            if not gate.enter():
+                current_app.logger.warning(f"Request rejected by the {budget} budget")
+                return rejected_response()
+            release = _release_once(gate)
+            streamed = False
+            try:
+                response = make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    response.response = _released_after(response.response, release)
+                    # Closed without being read, such as on a client disconnect.
+                    response.call_on_close(release)
+                    streamed = True
+                return response
+            finally:
+                if not streamed:
+                    release()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,76 @@
+"""Benchmark of the CommonDataElement validation of a 100k CDEs data model.
+
+Compares the hand-written validate_common_data_element the compiled schema replaced
+against the function compiled from COMMON_DATA_ELEMENT_SCHEMA, and times
+validate_json on the whole data model.
+Run from the data_quality_tool directory with: python -m benchmarks.cde_validator
+"""
+
+import timeit
+
+from benchmarks.generator import make_cde, make_data_model
+from common_entities import InvalidDataModelError
+from validator.json_validator import (
+    TYPE_2_SQL,
+    validate_common_data_element,
+    validate_json,
+)
+
+
+def hand_written_validate_common_data_element(cde, path):
+    required_fields = ["code", "sql_type", "isCategorical", "type"]
+
+    for field in required_fields:
+        if field not in cde:
+            raise InvalidDataModelError(
+                f"Missing required field '{field}' in CommonDataElement at path: '{path}'. Please ensure all required fields are provided."
+            )
+    type_key = cde.get("type")
+    if type_key not in TYPE_2_SQL:
+        raise InvalidDataModelError(
+            f"Invalid 'type' value '{type_key}' in CommonDataElement at path: '{path}'. Must be one of {list(TYPE_2_SQL.keys())}."
+        )
+
+    expected_sql_type, expected_is_categorical = TYPE_2_SQL[type_key]
+    if (
+        cde.get("sql_type") != expected_sql_type
+        or cde.get("isCategorical") != expected_is_categorical
+    ):
+        raise InvalidDataModelError(
+            f"Incorrect 'sql_type' or 'isCategorical' for type '{type_key}' in CommonDataElement at path: '{path}'. Expected ('{expected_sql_type}', {expected_is_categorical}), but got ('{cde.get('sql_type')}', {cde.get('isCategorical')})."
+        )
+
+    if cde.get("isCategorical") and not cde.get("enumerations"):
+        raise InvalidDataModelError(
+            f"'enumerations' is required for categorical CommonDataElement at path: '{path}', but it is missing."
+        )
+
+    if cde.get("minValue") is not None and cde.get("maxValue") is not None:
+        if cde["minValue"] >= cde["maxValue"]:
+            raise InvalidDataModelError(
+                f"Invalid range: 'minValue' ({cde['minValue']}) is greater than or equal to 'maxValue' ({cde['maxValue']}) in CommonDataElement at path: '{path}'."
+            )
+
+
+def main(cdes=100_000):
+    cde_list = [make_cde(index) for index in range(cdes)]
+    for name, validate in [
+        ("hand-written", hand_written_validate_common_data_element),
+        ("compiled", validate_common_data_element),
+    ]:
+        elapsed = min(
+            timeit.repeat(
+                lambda: [validate(cde, "/model") for cde in cde_list],
+                number=1,
+                repeat=5,
+            )
+        )
+        print(f"{name} CDE validation of {cdes} CDEs: {elapsed * 1000:.1f} ms")
+
+    data_model = make_data_model(cdes, depth=1, width=cdes // 100)
+    elapsed = min(timeit.repeat(lambda: validate_json(data_model), number=1, repeat=5))
+    print(f"validate_json of a {cdes} CDEs data model: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
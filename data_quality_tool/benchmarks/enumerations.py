@@ -0,0 +1,73 @@
+"""Micro-benchmark of the enumerations parser.
+
+Compares common_parsers.parse_enumerations against the former chained str.replace
+and json.loads approach on many nominal CDEs with long enumeration lists.
+Run from the data_quality_tool directory with: python -m benchmarks.enumerations
+"""
+
+import json
+import timeit
+
+from common_parsers import parse_enumerations
+
+
+def replace_and_json_enumerations(values):
+    transformed_values = (
+        "[" + values.replace('","', '":"').replace('", "', '": "') + "]"
+    )
+    enumerations = json.loads(transformed_values)
+    codes = [code for _enum in enumerations for code, label in _enum.items()]
+    if len(codes) != len(set(codes)):
+        raise ValueError(codes)
+    return [
+        {"code": list(item.keys())[0], "label": list(item.values())[0]}
+        for item in enumerations
+    ]
+
+
+def enumeration_strings(cdes, enumerations_per_cde):
+    return [
+        ", ".join(
+            f'{{"cde{c}_enum{e}", "Label {e} of nominal variable {c}"}}'
+            for e in range(enumerations_per_cde)
+        )
+        for c in range(cdes)
+    ]
+
+
+def pairs_to_dicts(enumerations):
+    return [{"code": code, "label": label} for code, label in enumerations]
+
+
+def main():
+    for cdes, enumerations_per_cde in [(5000, 5), (2000, 50), (200, 500)]:
+        strings = enumeration_strings(cdes, enumerations_per_cde)
+        cases = {
+            # A single parse of every string.
+            "parse": (
+                lambda: [replace_and_json_enumerations(s) for s in strings],
+                lambda: [parse_enumerations(s) for s in strings],
+            ),
+            # An Excel import: the validator and the converter used to parse each string
+            # on their own, the tokenizer result is parsed once and turned into dicts.
+            "import": (
+                lambda: [
+                    (replace_and_json_enumerations(s), replace_and_json_enumerations(s))
+                    for s in strings
+                ],
+                lambda: [pairs_to_dicts(parse_enumerations(s)) for s in strings],
+            ),
+        }
+        for case, (former, tokenizer) in cases.items():
+            former_time = min(timeit.repeat(former, number=1, repeat=5))
+            tokenizer_time = min(timeit.repeat(tokenizer, number=1, repeat=5))
+            print(
+                f"{case} {cdes} CDEs x {enumerations_per_cde} enumerations:"
+                f" replace+json {former_time * 1000:.1f} ms,"
+                f" tokenizer {tokenizer_time * 1000:.1f} ms,"
+                f" speedup x{former_time / tokenizer_time:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Seeded generator of synthetic data models and of their workbooks, for the benchmarks.
+
+The data models have a root group holding the dataset CDE, under which groups are
+nested 'depth' levels deep with 'width' subgroups each. The CDEs are spread evenly
+over the deepest groups and their types are drawn with the weights of 'type_mix'.
+The same arguments always give the same data model.
+
+Run from the data_quality_tool directory with:
+python -m benchmarks.generator --cdes 10000 --output model.xlsx
+"""
+
+import argparse
+import json
+import random
+
+from common_entities import EXCEL_COLUMNS
+from converter.json_to_excel import iter_parse_json, write_json_to_excel
+from validator.json_validator import TYPE_2_SQL
+
+TYPES = ("nominal", "real", "integer", "text")
+DEFAULT_TYPE_MIX = {variable_type: 1 for variable_type in TYPES}
+
+DATASET_CDE = {
+    "code": "dataset",
+    "label": "Dataset",
+    "sql_type": "text",
+    "isCategorical": True,
+    "type": "nominal",
+    "enumerations": [{"code": "d1", "label": "Dataset 1"}],
+}
+
+
+def make_cde(index, variable_type=None, rng=None, enumerations=2):
+    """A valid CDE of the given type, or of a type cycling with the index.
+
+    Without rng the values of the CDE only depend on its index and type.
+    """
+    variable_type = variable_type or TYPES[index % len(TYPES)]
+    sql_type, is_categorical = TYPE_2_SQL[variable_type]
+    cde = {
+        "code": f"cde{index}",
+        "label": f"CDE {index}",
+        "sql_type": sql_type,
+        "isCategorical": is_categorical,
+        "type": variable_type,
+    }
+    if variable_type == "nominal":
+        count = rng.randint(2, enumerations) if rng and enumerations > 2 else 2
+        cde["enumerations"] = [
+            {"code": f"cde{index}_{e}", "label": f"Value {e} of CDE {index}"}
+            for e in range(count)
+        ]
+    elif variable_type == "integer":
+        low = rng.randint(0, 100) if rng else 0
+        cde["minValue"], cde["maxValue"] = low, low + (
+            rng.randint(1, 1000) if rng else 100
+        )
+    elif variable_type == "real":
+        low = round(rng.uniform(0, 100), 2) if rng else 0
+        cde["minValue"] = low
+        cde["maxValue"] = round(low + (rng.uniform(1, 1000) if rng else 100), 2)
+    return cde
+
+
+def group_paths(depth, width):
+    """The codes of the groups leading to each of the deepest groups of the hierarchy."""
+    paths = [()]
+    for _ in range(depth):
+        paths = [path + (w,) for path in paths for w in range(width)]
+    return [
+        tuple(
+            "group" + "_".join(map(str, path[:level])) for level in range(1, depth + 1)
+        )
+        for path in paths
+    ]
+
+
+def make_data_model(
+    cdes, depth=2, width=10, type_mix=None, seed=0, enumerations=10, code="model"
+):
+    """A valid data model of 'cdes' CDEs, the dataset CDE included.
+
+    Args:
+        cdes: The number of CDEs.
+        depth: The number of levels of groups under the root of the data model.
+        width: The number of subgroups of every group, so the CDEs are spread over
+            width ** depth groups.
+        type_mix: The relative weights of the CDE types, an even mix if unset.
+        seed: The seed of the random choices of the types and values.
+        enumerations: The highest number of enumerations of the nominal CDEs.
+        code: The code of the data model.
+    """
+    rng = random.Random(seed)
+    type_mix = type_mix or DEFAULT_TYPE_MIX
+    types = rng.choices(list(type_mix), weights=list(type_mix.values()), k=cdes - 1)
+    variables = [
+        make_cde(index, variable_type, rng, enumerations)
+        for index, variable_type in enumerate(types, start=1)
+    ]
+
+    data_model = {
+        "code": code,
+        "version": "1.0",
+        "label": code.capitalize(),
+        "variables": [dict(DATASET_CDE)],
+        "groups": [],
+    }
+    if depth == 0:
+        data_model["variables"].extend(variables)
+        return data_model
+
+    leaves = []
+    groups = {(): data_model}
+    for path in group_paths(depth, width):
+        for level in range(1, depth + 1):
+            if path[:level] not in groups:
+                group = {"code": path[level - 1], "label": path[level - 1]}
+                if level < depth:
+                    group["groups"] = []
+                parent = groups[path[: level - 1]]
+                parent["groups"].append(group)
+                groups[path[:level]] = group
+        leaves.append(groups[path])
+    per_group, extra = divmod(len(variables), len(leaves))
+    start = 0
+    for position, group in enumerate(leaves):
+        end = start + per_group + (position < extra)
+        group["variables"] = variables[start:end]
+        start = end
+    _drop_empty_groups(data_model)
+    return data_model
+
+
+def _drop_empty_groups(group):
+    # With fewer CDEs than groups, the last groups would hold no CDE.
+    kept = []
+    for subgroup in group.get("groups", []):
+        _drop_empty_groups(subgroup)
+        if subgroup.get("variables") or subgroup.get("groups"):
+            kept.append(subgroup)
+    if "groups" in group:
+        group["groups"] = kept
+
+
+def make_workbook(data_model, output):
+    """Write the workbook matching a data model to a path or a binary file object."""
+    write_json_to_excel(data_model, output)
+
+
+def concept_paths(data_model):
+    """The concept paths of the CDEs of a data model, as lists of labels and codes."""
+    column = EXCEL_COLUMNS.index("conceptPath")
+    return [row[column].split("/") for row in iter_parse_json(data_model)]
+
+
+def parse_type_mix(text):
+    """Parse a type mix given as 'nominal=2,real=1,integer=1,text=0'."""
+    type_mix = {}
+    for item in text.split(","):
+        variable_type, _, weight = item.partition("=")
+        variable_type = variable_type.strip()
+        if variable_type not in TYPES:
+            raise argparse.ArgumentTypeError(
+                f"Unknown CDE type '{variable_type}', expected one of {list(TYPES)}."
+            )
+        try:
+            type_mix[variable_type] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in '{item}'.")
+    if not any(type_mix.values()):
+        raise argparse.ArgumentTypeError("At least one CDE type needs a weight.")
+    return type_mix
+
+
+def add_arguments(parser):
+    """Add the options of the generator to an argument parser."""
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument(
+        "--type-mix",
+        type=parse_type_mix,
+        default=DEFAULT_TYPE_MIX,
+        help="relative weights of the CDE types, e.g. nominal=2,real=1,integer=1,text=0",
+    )
+    parser.add_argument("--enumerations", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cdes", type=int, default=1000)
+    add_arguments(parser)
+    parser.add_argument(
+        "--output", required=True, help="a .json or a .xlsx file to write"
+    )
+    args = parser.parse_args()
+    data_model = make_data_model(
+        args.cdes,
+        depth=args.depth,
+        width=args.width,
+        type_mix=args.type_mix,
+        seed=args.seed,
+        enumerations=args.enumerations,
+    )
+    if args.output.endswith(".xlsx"):
+        make_workbook(data_model, args.output)
+    else:
+        with open(args.output, "w") as file:
+            json.dump(data_model, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
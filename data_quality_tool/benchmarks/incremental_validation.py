@@ -0,0 +1,50 @@
+"""Benchmark of revalidating a large data model after a single CDE edit.
+
+Validates a 100k CDEs data model without the subtree cache, then with a warm
+cache after the label of one CDE changed, as when an expert edits a model and
+the whole document is posted again.
+Run from the data_quality_tool directory with: python -m benchmarks.incremental_validation
+"""
+
+import copy
+import time
+
+from benchmarks.generator import make_data_model
+from validator.json_validator import (
+    ValidatedSubtrees,
+    subtree_hashes,
+    validate_json,
+)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main(cdes=100_000):
+    data_model = make_data_model(cdes, depth=1, width=cdes // 100)
+    cache = ValidatedSubtrees()
+
+    full = min(timed(validate_json, data_model, None) for _ in range(3))
+    print(f"full validation of {cdes} CDEs: {full * 1000:.1f} ms")
+    hashing = min(timed(subtree_hashes, data_model) for _ in range(3))
+    print(f"  of which hashing would take: {hashing * 1000:.1f} ms")
+    cold = timed(validate_json, data_model, cache)
+    print(f"first validation filling the cache: {cold * 1000:.1f} ms")
+
+    edited = []
+    for edit in range(5):
+        data_model = copy.deepcopy(data_model)
+        data_model["groups"][edit * 97]["variables"][3]["label"] = f"Edited {edit}"
+        edited.append(timed(validate_json, data_model, cache))
+    print(
+        f"validation after a one CDE edit: {min(edited) * 1000:.1f} ms,"
+        f" speedup x{full / min(edited):.2f}"
+    )
+    print(f"subtree cache: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark of insert_variable_into_structure on wide and deep hierarchies.
+
+Compares the indexed insertion against the former linear scan of the sibling groups.
+Run from the data_quality_tool directory with: python -m benchmarks.insert_variable
+"""
+
+import timeit
+
+from benchmarks.generator import concept_paths, make_data_model
+from converter.excel_to_json import insert_variable_into_structure
+
+
+def linear_insert_variable_into_structure(root, variable, path):
+    for part in path[:-1]:
+        for group in root["groups"]:
+            if group["code"] == part:
+                root = group
+                break
+        else:
+            new_group = {"code": part, "label": part, "groups": [], "variables": []}
+            root["groups"].append(new_group)
+            root = new_group
+    root["variables"].append(variable)
+
+
+def deep_paths(depth, siblings_per_level):
+    # At every level there are 'siblings_per_level' groups and the last one nests the next level.
+    last = siblings_per_level - 1
+    spine = ["model"] + [f"level{level}_{last}" for level in range(depth)]
+    return [
+        spine[: level + 1] + [f"level{level}_{s}", f"var{level}_{s}"]
+        for level in range(depth)
+        for s in range(siblings_per_level)
+    ]
+
+
+def build_linear(paths):
+    root = {"code": "root", "groups": [], "variables": []}
+    for path in paths:
+        linear_insert_variable_into_structure(root, {"code": path[-1]}, path)
+
+
+def build_indexed(paths):
+    root = {"code": "root", "groups": [], "variables": []}
+    group_index = {}
+    for path in paths:
+        insert_variable_into_structure(root, {"code": path[-1]}, path, group_index)
+
+
+def main():
+    cases = {
+        "wide (1000 groups x 20 variables)": concept_paths(
+            make_data_model(20_000, depth=1, width=1000)
+        ),
+        "deep (200 levels x 50 sibling groups)": deep_paths(200, 50),
+    }
+    for name, paths in cases.items():
+        linear = min(timeit.repeat(lambda: build_linear(paths), number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: build_indexed(paths), number=1, repeat=3))
+        print(
+            f"{name}: linear {linear * 1000:.1f} ms, indexed {indexed * 1000:.1f} ms,"
+            f" speedup x{linear / indexed:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
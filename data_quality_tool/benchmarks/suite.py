@@ -0,0 +1,238 @@
+"""Benchmark suite of the conversions, the validations and the endpoints.
+
+Times every benchmark on generated data models and workbooks of each size, see
+benchmarks.generator, and writes the results as JSON. Given the results of an
+earlier run, such as one of the parent commit, the benchmarks that got slower by
+more than the threshold are reported and the suite exits with status 1.
+
+Run from the data_quality_tool directory with:
+python -m benchmarks.suite --output new.json [--compare old.json]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+from benchmarks.generator import add_arguments, make_data_model, make_workbook
+
+# A benchmark regresses when its best time grows by more than this ratio and by
+# more than MIN_DELTA seconds, so that the noise of the fastest ones is ignored.
+DEFAULT_THRESHOLD = 1.25
+MIN_DELTA = 0.005
+
+RESULTS_VERSION = 1
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def function_benchmarks(data_model, workbook):
+    """The benchmarks of the conversion and validation functions, by name."""
+    import pandas as pd
+
+    from converter.excel_to_json import convert_excel_to_json
+    from converter.json_to_excel import convert_json_to_excel, write_json_to_excel
+    from validator.excel_validator import validate_excel
+    from validator.json_validator import validate_json
+
+    df = pd.read_excel(BytesIO(workbook))
+    return {
+        # Without the subtree cache, which would skip the repeated validations.
+        "validate_json": lambda: validate_json(data_model, None),
+        "validate_excel": lambda: validate_excel(df),
+        "convert_excel_to_json": lambda: convert_excel_to_json(df),
+        "convert_json_to_excel": lambda: convert_json_to_excel(data_model),
+        "write_json_to_excel": lambda: write_json_to_excel(data_model, BytesIO()),
+    }
+
+
+def endpoint_benchmarks(data_model, workbook):
+    """The benchmarks of the endpoints, called through the Flask test client."""
+    from controller import app
+
+    client = app.test_client()
+    body = json.dumps(data_model)
+
+    def json_body():
+        return {"data": body, "content_type": "application/json"}
+
+    def upload():
+        # The test client consumes the file of the form, a new one is needed every time.
+        return {
+            "data": {"file": (BytesIO(workbook), "model.xlsx")},
+            "content_type": "multipart/form-data",
+        }
+
+    return {
+        "POST /validate-json": endpoint_request(client, "/validate-json", json_body),
+        "POST /json-to-excel": endpoint_request(client, "/json-to-excel", json_body),
+        "POST /validate-excel": endpoint_request(client, "/validate-excel", upload),
+        "POST /excel-to-json": endpoint_request(client, "/excel-to-json", upload),
+    }
+
+
+def endpoint_request(client, path, request_arguments):
+    """A benchmark posting to an endpoint and reading the whole response."""
+
+    def request():
+        response = client.post(path, **request_arguments())
+        body = response.get_data()
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}: {body[:200]}")
+
+    return request
+
+
+def configure_app():
+    """Run the work of the requests inline and cache nothing, so each does it all."""
+    from controller import app
+
+    app.config.update(
+        PROCESS_POOL_WORKERS=0,
+        RESULT_CACHE_PATH=None,
+        EXCEL_MAX_ROWS=None,
+        MAX_CONTENT_LENGTH=None,
+    )
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def run(sizes, repeat, generator_options, selected=None, log=print):
+    """Run the benchmarks on data models of each size and return their results."""
+    results = {}
+    for cdes in sizes:
+        data_model = make_data_model(cdes, **generator_options)
+        output = BytesIO()
+        make_workbook(data_model, output)
+        workbook = output.getvalue()
+        benchmarks = {
+            **function_benchmarks(data_model, workbook),
+            **endpoint_benchmarks(data_model, workbook),
+        }
+        for name, function in benchmarks.items():
+            if selected and not any(part in name for part in selected):
+                continue
+            runs = [timed(function) for _ in range(repeat)]
+            key = f"{name} [{cdes}]"
+            results[key] = {
+                "benchmark": name,
+                "cdes": cdes,
+                "min": min(runs),
+                "median": statistics.median(runs),
+                "runs": runs,
+            }
+            log(
+                f"{key}: min {min(runs) * 1000:.1f} ms, median {statistics.median(runs) * 1000:.1f} ms"
+            )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD, min_delta=MIN_DELTA):
+    """Compare the best times of two runs of the suite.
+
+    Returns:
+        tuple: The lines of the report, and the names of the regressed benchmarks.
+    """
+    lines = []
+    regressions = []
+    old_benchmarks = baseline["benchmarks"]
+    for name, new in results["benchmarks"].items():
+        old = old_benchmarks.get(name)
+        if old is None:
+            lines.append(f"{name}: new, {new['min'] * 1000:.1f} ms")
+            continue
+        ratio = new["min"] / old["min"] if old["min"] else float("inf")
+        regressed = ratio > threshold and new["min"] - old["min"] > min_delta
+        if regressed:
+            regressions.append(name)
+        lines.append(
+            f"{name}: {old['min'] * 1000:.1f} ms -> {new['min'] * 1000:.1f} ms,"
+            f" x{ratio:.2f}{' REGRESSION' if regressed else ''}"
+        )
+    if baseline.get("options") != results.get("options"):
+        lines.append(
+            "Warning: the runs were made with different options, see 'options'."
+        )
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10_000, 100_000],
+        help="numbers of CDEs of the data models",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        help="run the benchmarks whose name contains one of these strings",
+    )
+    add_arguments(parser)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of a run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    generator_options = {
+        "depth": args.depth,
+        "width": args.width,
+        "type_mix": args.type_mix,
+        "seed": args.seed,
+        "enumerations": args.enumerations,
+    }
+    configure_app()
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {**generator_options, "repeat": args.repeat},
+        "benchmarks": run(args.sizes, args.repeat, generator_options, args.only),
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        lines, regressions = compare(baseline, results, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(
+                f"{len(regressions)} benchmarks regressed by more than x{args.threshold}."
+            )
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
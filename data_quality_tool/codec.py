@@ -0,0 +1,107 @@
+"""JSON encoding and decoding, and compression of the responses of the endpoints.
+
+orjson is used when it is installed, as in the Docker image, the standard library
+json module otherwise. Documents orjson cannot handle, such as integers bigger
+than 64 bits, fall back to the standard library too.
+"""
+
+import gzip
+import json
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None
+
+
+def dumps(data, pretty=False, default=None, sort_keys=False):
+    """Serialize data to UTF-8 JSON bytes, compact unless pretty is set.
+
+    default is called on the objects that are not JSON serializable, as in json.dumps.
+    With sort_keys, the keys of the objects are sorted so that equal documents give
+    equal bytes.
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(data, default=default, option=option)
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(
+            data, default=default, indent=2, ensure_ascii=False, sort_keys=sort_keys
+        ).encode()
+    return json.dumps(
+        data,
+        default=default,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        sort_keys=sort_keys,
+    ).encode()
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Let the standard library raise its own error, or accept what it accepts,
+            # such as NaN and Infinity.
+            pass
+    return json.loads(data)
+
+
+def wants_pretty(request):
+    """Whether the client asked for indented JSON with the 'pretty' query parameter."""
+    pretty = request.args.get("pretty")
+    return pretty is not None and pretty.lower() not in ("0", "false", "no")
+
+
+class JSONCodecProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the codec, used by request.json and jsonify."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = has_request_context() and wants_pretty(request)
+        return self._app.response_class(
+            dumps(obj, pretty=pretty, default=self.default), mimetype=self.mimetype
+        )
+
+
+def gzip_response(response, min_size, level):
+    """Compress a JSON or text response with gzip if the client accepts it.
+
+    Streamed and file responses, and bodies smaller than min_size, are left as is.
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or not (response.is_json or response.mimetype.startswith("text/"))
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=level, mtime=0))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
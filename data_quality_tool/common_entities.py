@@ -42,6 +42,33 @@ class InvalidDataModelError(Exception):
     """Exception raised for errors in the input data model."""
 
 
+class NoJSONError(InvalidDataModelError):
+    """Exception raised for request bodies that hold no JSON data model."""
+
+
+class WorkbookTooLargeError(InvalidDataModelError):
+    """Exception raised for workbooks with more rows or columns than allowed."""
+
+
+class InvalidExcelRowsError(InvalidDataModelError):
+    """Exception raised with every invalid row of an Excel file.
+
+    Attributes:
+        errors (list): One {"row", "code", "error"} dict per invalid row,
+            where "row" is the row number shown by Excel.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "\n".join(f"Row {error['row']}: {error['error']}" for error in errors)
+        )
+
+    def __reduce__(self):
+        # Rebuilt from the errors, when sent back from a worker process.
+        return type(self), (self.errors,)
+
+
 JSON_EXCEL_FIELDS_MAP = {
     "label": "name",
     "code": "code",
@@ -0,0 +1,115 @@
+"""Parsers for the mini-languages used in the 'values' column of the Excel files."""
+
+import json
+import math
+import re
+from functools import lru_cache
+
+from common_entities import InvalidDataModelError
+
+# Number of distinct (values, type) pairs whose parse result is kept by parse_values.
+VALUES_CACHE_SIZE = 4096
+
+# A quoted, non-empty string in which quotes can be escaped with a backslash.
+_QUOTED = r'"([^"\\]*(?:\\.[^"\\]*)*)"'
+# One {"code", "label"} pair followed by the separating comma or the end of the input.
+_ENUMERATION_ITEM = re.compile(
+    r"\s*\{\s*" + _QUOTED + r"\s*,\s*" + _QUOTED + r"\s*\}\s*(,|\Z)", re.DOTALL
+)
+
+
+def is_missing(value):
+    """Whether a cell is empty: None, or NaN as pandas reads empty cells."""
+    return value is None or value != value
+
+
+def _unquote(value):
+    """Resolve the backslash escapes of a quoted string, as in JSON."""
+    return json.loads(f'"{value}"')
+
+
+def parse_enumerations(values):
+    """
+    Parses an enumerations string into a tuple of (code, label) pairs in a single pass.
+    Expected format: '{"code1", "label1"}, {"code2", "label2"}'.
+    Raises InvalidDataModelError if the string is malformed or if a code is repeated.
+    """
+    enumerations = []
+    seen_codes = set()
+    match_item = _ENUMERATION_ITEM.match
+    has_escapes = "\\" in values
+    position, end = 0, len(values)
+    try:
+        while True:
+            match = match_item(values, position)
+            if match is None:
+                raise ValueError(values)
+            code, label, separator = match.groups()
+            if has_escapes:
+                code, label = _unquote(code), _unquote(label)
+            if not code or not label:
+                raise ValueError(values)
+            seen_codes.add(code)
+            enumerations.append((code, label))
+            position = match.end()
+            if position == end:
+                if separator:
+                    # A trailing comma is not followed by another pair.
+                    raise ValueError(values)
+                break
+    except ValueError:
+        raise InvalidDataModelError(
+            'Nominal values format error: \'{"code", "label"}, {"code", "label"}\' expected but got '
+            + values
+            + "."
+        )
+    if len(seen_codes) != len(enumerations):
+        codes = [code for code, _ in enumerations]
+        raise InvalidDataModelError(
+            f"Duplicate codes found in enumeration values {codes=}."
+        )
+    return tuple(enumerations)
+
+
+def parse_min_max(values):
+    """
+    Parses a '<min>-<max>' range into two floats, splitting on the last hyphen only,
+    so "-10-100" → (-10.0, 100.0).
+    """
+    min_str, separator, max_str = values.rpartition("-")
+    try:
+        if not separator:
+            raise ValueError(values)
+        min_value, max_value = float(min_str.strip()), float(max_str.strip())
+        # float() also accepts "nan" and "inf", which are not valid bounds.
+        if not (math.isfinite(min_value) and math.isfinite(max_value)):
+            raise ValueError(values)
+        return min_value, max_value
+    except ValueError:
+        raise InvalidDataModelError(
+            f"Values must match format '<float or integer>-<float or integer>' but got '{values}'."
+        )
+
+
+@lru_cache(maxsize=VALUES_CACHE_SIZE)
+def parse_values(values, variable_type):
+    """
+    Parses the 'values' of a variable according to its type:
+    - For 'nominal', a tuple of (code, label) pairs, see parse_enumerations.
+    - For 'real' and 'integer', the (min, max) range as floats, see parse_min_max.
+    - For any other type, None.
+
+    The same enumerations and ranges repeat across many CDEs, so results are kept in
+    an LRU cache keyed by the raw string and the type. Cached results are shared by
+    every caller and are therefore immutable tuples. Invalid values are not cached.
+    """
+    if variable_type == "nominal":
+        return parse_enumerations(values)
+    if variable_type in ("real", "integer"):
+        return parse_min_max(values)
+    return None
+
+
+def parse_cache_info():
+    """Hit and miss counters of the parse_values cache."""
+    return parse_values.cache_info()._asdict()
@@ -1,30 +1,258 @@
-from flask import Flask, request, jsonify, send_file
-import json
+from flask import (
+    Flask,
+    g,
+    request,
+    jsonify,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 import logging
-from io import BytesIO
-import pandas as pd
+import math
+import os
+import tempfile
 from flask_cors import CORS
-from converter.excel_to_json import convert_excel_to_json
-from converter.json_to_excel import convert_json_to_excel
-from validator import json_validator, excel_validator
+from admission import admitted, gate_stats, get_gate, rejected_response
+from werkzeug.exceptions import RequestEntityTooLarge
+from codec import JSONCodecProvider, dumps, gzip_response, wants_pretty
+from common_entities import InvalidExcelRowsError, NoJSONError, WorkbookTooLargeError
+from common_parsers import parse_cache_info
+from executors import (
+    get_process_pool,
+    map_unordered,
+    pool_cache_counters,
+    run_workload,
+)
+import metrics
+from metrics import record_cdes, stage
+import jobs
+import profiling
+from structured_logging import payload_sampled, payload_summary, setup_logging
+from result_cache import cached_response, get_result_cache
+from uploads import SpooledUploadRequest, upload_path
+from validator import json_validator
+import workloads
 
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
+app.json = JSONCodecProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-logging.basicConfig(level=logging.INFO)
+app.config.update(
+    # Requests of the endpoints of a budget running at once in a worker, and waiting
+    # for their turn at most ADMISSION_TIMEOUT seconds. Others get a 503 with a
+    # Retry-After header. All the running and waiting requests should fit in the
+    # threads of a worker, GUNICORN_THREADS. Job polls beyond the "poll" budget
+    # are answered at once instead of waiting.
+    ADMISSION_BUDGETS={
+        "heavy": {"concurrency": 2, "queue_size": 2},
+        "light": {"concurrency": 3, "queue_size": 1},
+        "poll": {"concurrency": 2, "queue_size": 0},
+    },
+    ADMISSION_TIMEOUT=10,
+    ADMISSION_RETRY_AFTER=5,
+    # Bigger requests are rejected with a 413 before their body is read.
+    MAX_CONTENT_LENGTH=100 * 1024 * 1024,
+    # Workbooks with more data rows or columns are rejected with a 413 before parsing.
+    EXCEL_MAX_ROWS=200_000,
+    EXCEL_MAX_COLUMNS=64,
+    # SQLite file of the result cache shared by the workers, the cache is disabled if unset.
+    RESULT_CACHE_PATH=None,
+    RESULT_CACHE_MAX_BYTES=256 * 1024 * 1024,
+    RESULT_CACHE_TTL=24 * 60 * 60,
+    # Requests of up to this size are looked up in the result cache before admission,
+    # bigger ones are admitted before their payload is read and hashed.
+    RESULT_CACHE_EARLY_MAX_BYTES=256 * 1024,
+    # Exported workbooks bigger than this are spooled to a temporary file on disk.
+    XLSX_SPOOL_MAX_SIZE=1024 * 1024,
+    # Processes of the pool running the batch validation and the CPU bound work of the
+    # requests of at least OFFLOAD_MIN_BYTES, one per core if unset, 0 to run inline.
+    # The work taking more than PROCESS_POOL_TIMEOUT seconds fails, and the pool
+    # is replaced.
+    PROCESS_POOL_WORKERS=None,
+    PROCESS_POOL_TIMEOUT=300,
+    OFFLOAD_MIN_BYTES=256 * 1024,
+    # JSON and text responses of at least GZIP_MIN_SIZE bytes are gzipped when accepted.
+    GZIP_MIN_SIZE=1024,
+    GZIP_LEVEL=6,
+    # Requests with an "X-Profile: 1" header or a "profile" query parameter are profiled
+    # if enabled, and the PROFILE_MAX_FILES most recent profiles are kept in PROFILE_DIR.
+    PROFILING_ENABLED=False,
+    PROFILE_DIR=None,
+    PROFILE_MAX_FILES=20,
+    # Bearer token of the admin endpoints, they are disabled if unset.
+    ADMIN_TOKEN=None,
+    # Log records are written by a background thread, as "text" or as "json" lines.
+    LOG_LEVEL="INFO",
+    LOG_FORMAT="text",
+    # Fraction of the JSON requests whose full payload is logged, for debugging.
+    LOG_PAYLOAD_SAMPLE_RATE=0.0,
+    # Asynchronous conversion jobs, kept with their inputs in JOBS_DIR, a temporary
+    # directory if unset, for JOBS_TTL seconds after their last update. Each worker
+    # runs JOBS_CONCURRENCY of them at once, and new jobs get a 503 while
+    # JOBS_MAX_PENDING are queued or running. Polls wait JOBS_MAX_WAIT seconds at most.
+    # Workers update their unfinished jobs every JOBS_HEARTBEAT seconds, and the jobs
+    # not updated for JOBS_STALE_AFTER seconds are failed.
+    JOBS_DIR=None,
+    JOBS_TTL=60 * 60,
+    JOBS_CONCURRENCY=2,
+    JOBS_MAX_PENDING=32,
+    JOBS_MAX_WAIT=30,
+    JOBS_HEARTBEAT=10,
+    JOBS_STALE_AFTER=60,
+)
+# Any setting can be overridden with a DQT_ prefixed environment variable.
+app.config.from_prefixed_env("DQT")
+
+setup_logging(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
 logger = logging.getLogger(__name__)
 
+NDJSON_MIMETYPES = {"application/x-ndjson", "application/jsonl"}
+
+
+def uploaded_files():
+    """The uploaded files of the request.
+
+    The first access parses the multipart body and spools the files to disk, and is
+    timed as the read stage.
+    """
+    if g.get("files_read"):
+        return request.files
+    with stage("read"):
+        files = request.files
+    g.files_read = True
+    return files
+
+
+def uploaded_file_payload():
+    """The spooled file of the uploaded workbook, used as the result cache key."""
+    file = uploaded_files().get("file")
+    if not file or file.filename == "":
+        return None
+    return file.stream
+
+
+def json_payload():
+    """The raw JSON body, used as the result cache key.
+
+    The body is hashed as sent rather than parsed and serialized again, so equal
+    documents written differently are cached apart.
+    """
+    if not request.is_json:
+        return None
+    return request.get_data() or None
+
+
+def request_json():
+    with stage("parse"):
+        return request.get_json(silent=True)
+
+
+def request_data_model(offload):
+    """The JSON data model of the request, or None if there is none.
+
+    Offloaded requests get the raw body, it is parsed by the workload rather than
+    on the request thread.
+    """
+    if not offload:
+        return request_json()
+    return (request.get_data() or None) if request.is_json else None
+
+
+def offload_request():
+    """Whether the CPU bound work of the current request runs in the process pool.
+
+    Small requests run inline, sending them to another process would cost more, and
+    so do profiled requests, whose work must run in the profiled thread.
+    """
+    if profiling.is_profiled():
+        return False
+    size = request.content_length
+    return size is not None and size >= app.config["OFFLOAD_MIN_BYTES"]
+
+
+def cache_stats_with_pool(cache):
+    """The stats of a cache of this process, with the hits and misses in the pool added.
+
+    Args:
+        cache: "values_parse_cache" or "validated_subtrees".
+    """
+    if cache == "values_parse_cache":
+        stats = parse_cache_info()
+    else:
+        stats = json_validator.validated_subtrees.stats()
+    counters = pool_cache_counters().get(cache, {})
+    return {**stats, **{name: stats[name] + count for name, count in counters.items()}}
+
+
+def workbook_limits():
+    return {
+        "max_rows": app.config["EXCEL_MAX_ROWS"],
+        "max_columns": app.config["EXCEL_MAX_COLUMNS"],
+    }
+
+
+def log_payload(message, json_data=None):
+    """Log a summary of the JSON payload, and the payload itself for sampled requests.
+
+    Without json_data, for offloaded requests, the CDEs are counted by the workload.
+    """
+    summary = payload_summary(request.get_data(), json_data)
+    if json_data is not None:
+        record_cdes(summary.get("cdes"))
+    logger.info(message, extra={"fields": summary})
+    if payload_sampled(app.config["LOG_PAYLOAD_SAMPLE_RATE"]):
+        logger.info("Sampled payload: %s", request.get_data(as_text=True))
+
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+
+# Registered first so that it runs last, once the response is compressed.
+@app.after_request
+def finish_request_metrics(response):
+    return metrics.finish_request(response)
+
+
+@app.after_request
+def compress_response(response):
+    with stage("compress"):
+        return gzip_response(
+            response, app.config["GZIP_MIN_SIZE"], app.config["GZIP_LEVEL"]
+        )
+
+
+@app.before_request
+def start_request_profile():
+    profiling.start_profile()
+
+
+# Registered last so that it runs first, the profile covers the view only.
+@app.after_request
+def finish_request_profile(response):
+    return profiling.finish_profile(response)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    logger.error(f"Request body bigger than {app.config['MAX_CONTENT_LENGTH']} bytes")
+    return jsonify({"error": "Request body too large."}), 413
+
 
 @app.route("/")
+@admitted("light")
 def home():
     logger.info("Home endpoint accessed")
     return "Welcome to the Excel-JSON Converter API!"
 
 
 @app.route("/excel-to-json", methods=["POST"])
+@cached_response(uploaded_file_payload, "heavy")
 def excel_to_json():
     logger.info("excel_to_json endpoint accessed")
-    if "file" not in request.files:
+    if "file" not in uploaded_files():
         logger.error("No file part in request")
         return jsonify({"error": "No file part"}), 400
     file = request.files["file"]
@@ -33,67 +261,90 @@ def excel_to_json():
         return jsonify({"error": "No selected file"}), 400
     if file:
         try:
-            logger.info(f"Processing file: {file.filename}")
-            file_stream = BytesIO(file.read())
-            df = pd.read_excel(file_stream, engine="openpyxl")
-            logger.info("Excel file read into DataFrame")
-            excel_validator.validate_excel(df)
-            logger.info("Excel file validated")
-            json_data = convert_excel_to_json(df)
-            logger.info("Excel file converted to JSON")
-            pretty_json_data = json.dumps(json_data, indent=4)
-            logger.info("JSON data pretty-printed")
+            workbook = upload_path(file)
+            logger.info(
+                f"Processing file: {file.filename}",
+                extra={"fields": payload_summary(file.stream)},
+            )
+            body = run_workload(
+                workloads.convert_workbook,
+                workbook,
+                wants_pretty(request),
+                offload=offload_request(),
+                **workbook_limits(),
+            )
+            logger.info("Excel file validated and converted to JSON")
+            logger.info(
+                f"Values parse cache: {cache_stats_with_pool('values_parse_cache')}"
+            )
             response = app.response_class(
-                response=pretty_json_data, status=200, mimetype="application/json"
+                response=body, status=200, mimetype="application/json"
             )
+            logger.info("JSON data serialized")
             return response
+        except WorkbookTooLargeError as e:
+            logger.error(f"Excel file too large: {str(e)}")
+            return jsonify({"error": str(e)}), 413
+        except InvalidExcelRowsError as e:
+            logger.error(f"Excel validation errors in {len(e.errors)} rows")
+            return jsonify({"error": str(e), "errors": e.errors}), 400
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}")
             return jsonify({"error": str(e)}), 500
 
 
 @app.route("/json-to-excel", methods=["POST"])
+@cached_response(json_payload, "heavy")
 def json_to_excel():
     logger.info("json_to_excel endpoint accessed")
-    if not request.json:
+    offload = offload_request()
+    data_model = request_data_model(offload)
+    if not data_model:
         logger.error("No JSON provided in request")
         return jsonify({"error": "No JSON provided"}), 400
-    json_data = request.json
     try:
-        logger.info(f"Processing JSON data: {json_data}")
-        json_validator.validate_json(json_data)
-        logger.info("JSON data validated")
-        df = convert_json_to_excel(json_data)
-        logger.info("JSON data converted to Excel")
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False)
-        output.seek(0)
-        logger.info("Excel file created and saved to buffer")
+        log_payload("Processing JSON data", None if offload else data_model)
+        if offload:
+            path = run_workload(workloads.export_data_model_to_file, data_model)
+            output = open(path, "rb")
+            # The file is deleted once the response closes it.
+            os.remove(path)
+        else:
+            output = tempfile.SpooledTemporaryFile(
+                max_size=app.config["XLSX_SPOOL_MAX_SIZE"]
+            )
+            workloads.export_data_model(data_model, output)
+            output.seek(0)
+        logger.info("JSON data validated, converted to Excel and spooled for streaming")
         return send_file(
             output,
             as_attachment=True,
             download_name="output.xlsx",
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
+    except NoJSONError as e:
+        logger.error("No JSON provided in request")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error processing JSON: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/validate-json", methods=["POST"])
+@cached_response(json_payload, "light")
 def validate_json():
     logger.info("validate_json endpoint accessed")
     try:
-        if not request.json:
+        offload = offload_request()
+        data_model = request_data_model(offload)
+        if not data_model:
             logger.error("No JSON provided in request")
             return jsonify({"error": "No JSON provided"}), 400
 
-        json_data = request.json
-        logger.info(f"Received JSON: {json_data}")
+        log_payload("Received JSON", None if offload else data_model)
 
         # Validate the JSON
-        json_validator.validate_json(json_data)
+        run_workload(workloads.validate_data_model, data_model, offload=offload)
         logger.info("JSON data is valid")
         return jsonify({"message": "Data model is valid."})
     except json_validator.InvalidDataModelError as e:
@@ -104,10 +355,50 @@ def validate_json():
         return jsonify({"error": "Internal server error"}), 500
 
 
+@app.route("/validate-json/batch", methods=["POST"])
+@admitted("heavy")
+def validate_json_batch():
+    logger.info("validate_json_batch endpoint accessed")
+    if request.mimetype in NDJSON_MIMETYPES:
+        # Lines are parsed by the pool too, as they are read from the request.
+        data_models = (line for line in request.stream if line.strip())
+        validate = json_validator.json_validation_result
+    else:
+        data_models = request_json()
+        if not isinstance(data_models, list):
+            logger.error("No JSON array of data models provided in request")
+            return (
+                jsonify(
+                    {
+                        "error": "A JSON array or an NDJSON stream of data models is expected."
+                    }
+                ),
+                400,
+            )
+        validate = json_validator.validation_result
+
+    pool = get_process_pool()
+
+    def results():
+        validated = 0
+        for index, result in map_unordered(pool, validate, data_models):
+            if isinstance(result, Exception):
+                logger.error(f"Unhandled error validating data model {index}: {result}")
+                result = {"valid": False, "error": "Internal server error"}
+            validated += 1
+            yield dumps({"index": index, **result}) + b"\n"
+        logger.info(f"Validated a batch of {validated} data models")
+
+    return app.response_class(
+        stream_with_context(results()), mimetype="application/x-ndjson"
+    )
+
+
 @app.route("/validate-excel", methods=["POST"])
+@cached_response(uploaded_file_payload, "heavy")
 def validate_excel():
     logger.info("validate_excel endpoint accessed")
-    if "file" not in request.files:
+    if "file" not in uploaded_files():
         logger.error("No file part in request")
         return jsonify({"error": "No file part"}), 400
     file = request.files["file"]
@@ -116,18 +407,207 @@ def validate_excel():
         return jsonify({"error": "No selected file"}), 400
     if file:
         try:
-            logger.info(f"Processing file: {file.filename}")
-            file_stream = BytesIO(file.read())
-            df = pd.read_excel(file_stream, engine="openpyxl")
-            logger.info("Excel file read into DataFrame")
-            excel_validator.validate_excel(df)
+            workbook = upload_path(file)
+            logger.info(
+                f"Processing file: {file.filename}",
+                extra={"fields": payload_summary(file.stream)},
+            )
+            run_workload(
+                workloads.validate_workbook,
+                workbook,
+                offload=offload_request(),
+                **workbook_limits(),
+            )
             logger.info("Excel file is valid")
+            logger.info(
+                f"Values parse cache: {cache_stats_with_pool('values_parse_cache')}"
+            )
             return jsonify({"message": "Data model is valid."})
+        except WorkbookTooLargeError as e:
+            logger.error(f"Excel file too large: {str(e)}")
+            return jsonify({"error": str(e)}), 413
+        except InvalidExcelRowsError as e:
+            logger.error(f"Excel validation errors in {len(e.errors)} rows")
+            return jsonify({"error": str(e), "errors": e.errors}), 400
         except json_validator.InvalidDataModelError as e:
             logger.error(f"Excel validation error: {str(e)}")
             return jsonify({"error": str(e)}), 400
 
 
+@app.route("/jobs/excel-to-json", methods=["POST"])
+@admitted("light")
+def submit_excel_to_json_job():
+    logger.info("submit_excel_to_json_job endpoint accessed")
+    if "file" not in uploaded_files():
+        logger.error("No file part in request")
+        return jsonify({"error": "No file part"}), 400
+    file = request.files["file"]
+    if file.filename == "":
+        logger.error("No selected file")
+        return jsonify({"error": "No selected file"}), 400
+    store = jobs.get_job_store()
+    if store.pending() >= app.config["JOBS_MAX_PENDING"]:
+        logger.warning("Job rejected, too many pending jobs")
+        return rejected_response()
+    logger.info(
+        f"Submitting file: {file.filename}",
+        extra={"fields": payload_summary(file.stream)},
+    )
+    job_id = jobs.submit_conversion(
+        upload_path(file), wants_pretty(request), **workbook_limits()
+    )
+    logger.info(f"Job {job_id} queued")
+    response = jsonify(store.get(job_id))
+    response.status_code = 202
+    response.headers["Location"] = url_for("job_status", job_id=job_id)
+    return response
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """The status of a job, waiting up to ?wait=<seconds> for it to finish."""
+    if not jobs.JOB_ID.fullmatch(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    store = jobs.get_job_store()
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    wait = min(max(wait, 0), app.config["JOBS_MAX_WAIT"])
+    poll = get_gate("poll")
+    if wait and poll.enter():
+        try:
+            job = store.wait(job_id, wait)
+        finally:
+            poll.leave()
+    else:
+        # Too many polls are waiting already, the client polls again.
+        job = store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == jobs.SUCCEEDED:
+        job["result"] = url_for("job_result", job_id=job_id)
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    if not jobs.JOB_ID.fullmatch(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    store = jobs.get_job_store()
+    job = store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == jobs.FAILED:
+        return (
+            jsonify({key: job[key] for key in ("error", "errors") if key in job}),
+            400,
+        )
+    body = store.result(job_id) if job["status"] == jobs.SUCCEEDED else None
+    if body is None:
+        return jsonify({"error": "Job not finished", "status": job["status"]}), 409
+    return app.response_class(response=body, status=200, mimetype="application/json")
+
+
+@app.route("/cache-stats")
+def cache_stats():
+    logger.info("cache_stats endpoint accessed")
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+@app.route("/admin/profiles")
+def list_profiles():
+    if not profiling.is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    directory = profiling.profile_dir()
+    if not os.path.isdir(directory):
+        return jsonify({"profiles": []})
+    return jsonify({"profiles": profiling.list_profiles(directory)})
+
+
+@app.route("/admin/profiles/<profile_id>")
+def download_profile(profile_id):
+    if not profiling.is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    logger.info(f"Profile {profile_id} downloaded")
+    if request.args.get("format") == "text":
+        return app.response_class(
+            profiling.profile_summary(path), mimetype="text/plain"
+        )
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=f"{profile_id}.prof",
+        mimetype="application/octet-stream",
+    )
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def result_cache_gauges():
+    cache = get_result_cache(app)
+    if cache is None:
+        return {}
+    stats = cache.stats()
+    return {
+        (("value", name),): stats[name]
+        for name in ("hits", "misses", "evictions", "entries", "size_bytes")
+    }
+
+
+metrics.register_gauges(
+    "dqt_values_parse_cache",
+    "Counters of the cache of parsed enumerations and ranges, with the hits and misses"
+    " of the process pool.",
+    lambda: {
+        (("value", name),): value
+        for name, value in cache_stats_with_pool("values_parse_cache").items()
+        if value is not None
+    },
+)
+metrics.register_gauges(
+    "dqt_validated_subtrees",
+    "Counters of the cache of validated data model subtrees, with the hits and misses"
+    " of the process pool.",
+    lambda: {
+        (("value", name),): value
+        for name, value in cache_stats_with_pool("validated_subtrees").items()
+    },
+)
+metrics.register_gauges(
+    "dqt_result_cache", "Counters of the result cache, if enabled.", result_cache_gauges
+)
+
+metrics.register_gauges(
+    "dqt_jobs",
+    "Jobs by status, shared by the workers.",
+    lambda: {
+        (("status", status),): count
+        for status, count in jobs.get_job_store(app).stats().items()
+    },
+)
+metrics.register_gauges(
+    "dqt_admission",
+    "Requests running, waiting and rejected per admission budget.",
+    lambda: {
+        (("budget", budget), ("value", name)): value
+        for budget, stats in gate_stats(app).items()
+        for name, value in stats.items()
+    },
+)
+
+
 if __name__ == "__main__":
     logger.info("Starting Flask server...")
     app.run(host="0.0.0.0", port=8000)
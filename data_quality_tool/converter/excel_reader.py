@@ -0,0 +1,96 @@
+"""Lazy row reader for CDEs Metadata Schema workbooks.
+
+Rows are streamed from the first worksheet with openpyxl's read-only mode,
+so a workbook is never materialized as a DataFrame.
+"""
+
+from itertools import zip_longest
+
+from common_entities import WorkbookTooLargeError
+
+
+def normalize_cell(value):
+    """Cells are handled as strings, empty cells as None."""
+    if value is None:
+        return None
+    value = str(value)
+    if value == "":
+        return None
+    return value
+
+
+def check_dimensions(rows, columns, max_rows=None, max_columns=None):
+    """Raise a WorkbookTooLargeError if a sheet has more data rows or columns than allowed.
+
+    Unknown dimensions, and limits set to None, are not checked.
+    """
+    if max_rows is not None and rows is not None and rows > max_rows:
+        raise WorkbookTooLargeError(
+            f"The workbook has {rows} data rows, at most {max_rows} are allowed."
+        )
+    if max_columns is not None and columns is not None and columns > max_columns:
+        raise WorkbookTooLargeError(
+            f"The workbook has {columns} columns, at most {max_columns} are allowed."
+        )
+
+
+def read_excel_rows(file, max_rows=None, max_columns=None):
+    """Open a workbook and return its header and a lazy iterator of row dicts.
+
+    The dimensions recorded in the sheet are checked against max_rows and max_columns
+    before any row is parsed. As they are optional in the file, the number of rows is
+    checked again while the rows are read, and the columns against the header.
+
+    Args:
+        file: A path or a seekable binary file-like object.
+        max_rows: The maximum number of data rows, below the header, or None.
+        max_columns: The maximum number of columns, or None.
+
+    Returns:
+        tuple: The list of column names of the first row and a generator that
+        yields a (row number, row dict) pair per non-empty data row. Row numbers
+        are the 1-based numbers shown by Excel and row dicts are keyed by column name.
+
+    Raises:
+        WorkbookTooLargeError: If the sheet exceeds max_rows or max_columns.
+    """
+    # Imported on first use, so that processes serving only JSON do not load openpyxl.
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    sheet = workbook.worksheets[0]
+    try:
+        data_rows = None if sheet.max_row is None else sheet.max_row - 1
+        check_dimensions(data_rows, sheet.max_column, max_rows, max_columns)
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is not None:
+            check_dimensions(None, len(header), max_rows, max_columns)
+    except BaseException:
+        workbook.close()
+        raise
+    if header is None:
+        workbook.close()
+        return [], iter(())
+    columns = [normalize_cell(column) for column in header]
+    return [column for column in columns if column is not None], _iter_row_dicts(
+        workbook, rows, columns, max_rows
+    )
+
+
+def _iter_row_dicts(workbook, rows, columns, max_rows=None):
+    try:
+        for row_number, values in enumerate(rows, start=2):
+            if max_rows is not None and row_number - 1 > max_rows:
+                raise WorkbookTooLargeError(
+                    f"The workbook has more than the {max_rows} data rows allowed."
+                )
+            row = {
+                column: normalize_cell(value)
+                for column, value in zip_longest(columns, values)
+                if column is not None
+            }
+            if any(value is not None for value in row.values()):
+                yield row_number, row
+    finally:
+        workbook.close()
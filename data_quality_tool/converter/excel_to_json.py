@@ -1,10 +1,10 @@
-import pandas as pd
-import json
-
 from common_entities import (
     EXCEL_TYPE_2_SQL_TYPE_ISCATEGORICAL_MAP,
     InvalidDataModelError,
+    InvalidExcelRowsError,
 )
+from common_parsers import is_missing, parse_values
+from validator.excel_validator import validate_excel_columns, validate_variable
 
 
 EXCEL_JSON_FIELDS_MAP_WITHOUT_VALUES = {
@@ -25,77 +25,81 @@ def process_enumerations(values):
     Parses a custom-formatted string into a list of dictionaries with 'code' and 'label'.
     Expected format: '{"code1", "label1"}, {"code2", "label2"}'.
     """
-    # Transform the string to a JSON-compatible format
-    try:
-        # Transforming {"key","value"} into [{"key": "value"}]
-        transformed_values = (
-            "[" + values.replace('","', '":"').replace('", "', '": "') + "]"
-        )
-        enumerations = json.loads(transformed_values)
-    except json.JSONDecodeError:
-        raise InvalidDataModelError(
-            'Nominal values format error: \'{"code", "label"}, {"code", "label"}\' expected but got '
-            + values
-            + "."
-        )
     return [
-        {"code": list(item.keys())[0], "label": list(item.values())[0]}
-        for item in enumerations
+        {"code": code, "label": label}
+        for code, label in parse_values(values, "nominal")
     ]
 
 
-def insert_variable_into_structure(root, variable, path):
+def insert_variable_into_structure(root, variable, path, group_index=None):
     """
     Insert a variable into the hierarchical structure based on the provided path.
+
+    'group_index' maps the id of each group to a {code: subgroup} dict of its subgroups,
+    so finding the group at each level is a dict lookup instead of a scan of its siblings.
+    Passing the same dict for every variable of a tree makes an insertion O(depth).
+    The index of a group is built the first time the group is visited, so groups that
+    were already in the structure are found as well.
     """
+    if group_index is None:
+        group_index = {}
     # The last path element of the list is always the variable.
     for part in path[:-1]:
         # Find or create the group at the current level
-        found = False
-        for group in root["groups"]:
-            if group["code"] == part:
-                root = group
-                found = True
-                break
-
-        if not found:
-            new_group = {"code": part, "label": part, "groups": [], "variables": []}
-            root["groups"].append(new_group)
-            root = new_group
+        subgroups = group_index.get(id(root))
+        if subgroups is None:
+            subgroups = group_index[id(root)] = {}
+            for group in root["groups"]:
+                subgroups.setdefault(group["code"], group)
+
+        group = subgroups.get(part)
+        if group is None:
+            group = {"code": part, "label": part, "groups": [], "variables": []}
+            root["groups"].append(group)
+            subgroups[part] = group
+        root = group
 
     root["variables"].append(variable)
 
 
-def process_values_based_on_type(row, variable):
+def parse_range(code, values, variable_type="real"):
+    """
+    Parses a '<min>-<max>' range, splitting on the last hyphen only, into two floats.
+    """
+    if "-" not in values:
+        raise InvalidDataModelError(
+            f"Values must match format '<float or integer>-<float or integer>' but got '{values}'."
+        )
+
+    try:
+        return parse_values(values, variable_type)
+    except InvalidDataModelError:
+        raise InvalidDataModelError(
+            f"Range values for variable {code} must be valid numbers but got '{values}'."
+        )
+
+
+def process_values_based_on_type(row, variable, parsed_values=None):
     """
     Processes the 'values' field based on the variable's 'type':
     - For 'integer' or 'real', extracts 'minValue' and 'maxValue' from a range specified in 'values'
       and ensures these values are of the appropriate type.
       If 'type' is 'integer' but the parsed bounds aren't whole numbers, raises DatasetError.
     - For 'nominal', retrieves a list of 'enumerations' from 'values'.
+    If the row has already been validated, 'parsed_values' holds the values the validator
+    parsed (see excel_validator.validate_variable) and the string is not parsed again.
+    Parse results are shared (see common_parsers.parse_values), so the enumerations are
+    copied into new dicts for every variable.
     """
     code = row.get("code")
     values = row.get("values")
     variable_type = row.get("type")
 
     if variable_type in ["real", "integer"] and values:
-        # Split on the last hyphen only
-        parts = values.rsplit("-", 1)
-        if len(parts) != 2:
-            raise InvalidDataModelError(
-                f"Values must match format '<float or integer>-<float or integer>' but got '{values}'."
-            )
-
-        min_str, max_str = parts[0].strip(), parts[1].strip()
-
-        # Parse both ends as floats first
-        try:
-            min_val = float(min_str)
-            max_val = float(max_str)
-        except ValueError:
-            raise InvalidDataModelError(
-                f"Range values for variable {code} must be valid numbers but got '{values}'."
-            )
+        if parsed_values is None:
+            min_val, max_val = parse_range(code, values, variable_type)
+        else:
+            min_val, max_val = parsed_values
 
         if variable_type == "integer":
             # If either bound has a fractional part, that's invalid for integer variables
@@ -115,7 +119,11 @@ def process_values_based_on_type(row, variable):
             raise InvalidDataModelError(
                 f"The 'values' should not be empty for variable {code} when type is 'nominal'"
             )
-        variable["enumerations"] = process_enumerations(values)
+        if parsed_values is None:
+            parsed_values = parse_values(values, variable_type)
+        variable["enumerations"] = [
+            {"code": code, "label": label} for code, label in parsed_values
+        ]
 
 
 def validate_variable_type(row):
@@ -128,10 +136,11 @@ def validate_variable_type(row):
         )
 
 
-def process_variable(row):
+def process_variable(row, parsed_values=None):
     """
     Processes a single row into a variable dictionary, applying validations
     and transformations based on the row's data.
+    'parsed_values' are the already parsed 'values' of the row, if any.
     """
     # Validate variable type first
     validate_variable_type(row)
@@ -140,11 +149,11 @@ def process_variable(row):
     variable = {
         json_key: row[excel_col]
         for excel_col, json_key in EXCEL_JSON_FIELDS_MAP_WITHOUT_VALUES.items()
-        if excel_col in row and pd.notnull(row[excel_col])
+        if excel_col in row and not is_missing(row[excel_col])
     }
 
     # Process 'values' based on variable type, which might modify 'variable' in-place
-    process_values_based_on_type(row, variable)
+    process_values_based_on_type(row, variable, parsed_values)
 
     (
         variable["sql_type"],
@@ -157,24 +166,35 @@ def process_variable(row):
 def remove_single_variable_group(group, parent=None):
     # This is used only in the case that we want to extract from a tree only the variables that actually have values,
     # so that the tree has a more clear structure.
-    if "groups" in group:
-        # Process subgroups recursively
-        for subgroup in group["groups"]:
-            remove_single_variable_group(subgroup, group)
+    # The tree is walked in post-order with an explicit stack, so that deep trees cannot hit the
+    # recursion limit, and the subgroups of each group are rebuilt in a single pass.
+    collapsed = set()
+    stack = [(group, parent, False)]
+    while stack:
+        group, parent, subgroups_processed = stack.pop()
+        if "groups" not in group:
+            continue
+        if not subgroups_processed:
+            # Process subgroups first, in their order
+            stack.append((group, parent, True))
+            stack.extend(
+                (subgroup, group, False) for subgroup in reversed(group["groups"])
+            )
+            continue
 
-        # After processing subgroups, check if any subgroup meets the criteria
-        groups_to_remove = []
+        # Keep the subgroups that were neither moved up nor hold a single variable
+        remaining_groups = []
         for subgroup in group["groups"]:
+            if id(subgroup) in collapsed:
+                continue
             if "groups" not in subgroup:
                 if "variables" not in group:
                     group["variables"] = []
                 if len(subgroup.get("variables", [])) == 1:
                     group["variables"].append(subgroup["variables"][0])
-                    groups_to_remove.append(subgroup)
-
-        # Remove the subgroups that have been processed
-        for subgroup in groups_to_remove:
-            group["groups"].remove(subgroup)
+                    continue
+            remaining_groups.append(subgroup)
+        group["groups"][:] = remaining_groups
 
         # If current group has only one variable after processing, move it up to the parent group
         if (
@@ -186,56 +206,58 @@ def remove_single_variable_group(group, parent=None):
             if "variables" not in parent:
                 parent["variables"] = []
             parent["variables"].append(group["variables"][0])
-            parent["groups"].remove(group)
+            collapsed.add(id(group))
 
 
 def clean_empty_fields(data):
-    if isinstance(data, dict):  # If the item is a dictionary
-        keys_to_delete = [
-            key
-            for key, value in data.items()
-            if (key in ["variables", "groups", "enumerations"] and not value)
-            or value == ""
-        ]
-        for key in keys_to_delete:
-            del data[
+    # Walks every nested dictionary and list with an explicit stack instead of recursion.
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):  # If the item is a dictionary
+            keys_to_delete = [
                 key
-            ]  # Delete the key if its value is an empty list or an empty string
-        for key in data:  # Recursively clean remaining dictionary items
-            clean_empty_fields(data[key])
-    elif isinstance(data, list):
-        # If the item is a list, apply the function to each element
-        for item in data:
-            clean_empty_fields(item)
-
-
-def convert_excel_to_json(df):
+                for key, value in item.items()
+                if (key in ["variables", "groups", "enumerations"] and not value)
+                or value == ""
+            ]
+            for key in keys_to_delete:
+                del item[
+                    key
+                ]  # Delete the key if its value is an empty list or an empty string
+            stack.extend(item.values())  # Clean remaining dictionary items
+        elif isinstance(item, list):
+            # If the item is a list, clean each element
+            stack.extend(item)
+
+
+def row_to_variable(row, parsed_values=None):
     """
-    Converts a DataFrame from Excel into a JSON structure, handling enumerations specifically,
-    and adds 'isCategorical' and 'sql_type' based on the 'type'.
+    Processes a row into a variable and the concept path it should be inserted at.
     """
-    df = df.astype(str).replace("nan", None)
-    root = {"variables": [], "groups": [], "code": "root"}
+    try:
 
-    for _, row in df.iterrows():
-        try:
+        variable = process_variable(row, parsed_values)
+        if (
+            "conceptPath" in variable
+            and variable["conceptPath"]
+            and variable["conceptPath"] != "None"
+        ):
+            path = variable["conceptPath"].split("/")
+            del variable["conceptPath"]
+            return variable, path
+        else:
+            raise InvalidDataModelError(
+                f"The variable {variable['code']} is missing the conceptPath"
+            )
+    except InvalidDataModelError as e:
+        raise InvalidDataModelError(f"Error processing variable: {e}")
 
-            variable = process_variable(row.to_dict())
-            if (
-                "conceptPath" in variable
-                and variable["conceptPath"]
-                and variable["conceptPath"] != "None"
-            ):
-                path = variable["conceptPath"].split("/")
-                del variable["conceptPath"]
-                insert_variable_into_structure(root, variable, path)
-            else:
-                raise InvalidDataModelError(
-                    f"The variable {variable['code']} is missing the conceptPath"
-                )
-        except InvalidDataModelError as e:
-            raise InvalidDataModelError(f"Error processing variable: {e}")
 
+def build_data_model(root):
+    """
+    Turns the root of the variables tree into the final data model.
+    """
     if root["groups"]:
         data_model = root["groups"][0]
         data_model["version"] = "to be defined"
@@ -244,3 +266,59 @@ def convert_excel_to_json(df):
         return data_model
     else:
         return {"code": "No groups found", "groups": [], "variables": root["variables"]}
+
+
+def convert_excel_rows(rows):
+    """
+    Converts an iterable of row dicts into a JSON structure, handling enumerations specifically,
+    and adds 'isCategorical' and 'sql_type' based on the 'type'.
+    Missing cells are expected to be None and every other cell a string.
+    """
+    root = {"variables": [], "groups": [], "code": "root"}
+    group_index = {}
+
+    for row in rows:
+        variable, path = row_to_variable(row)
+        insert_variable_into_structure(root, variable, path, group_index)
+
+    return build_data_model(root)
+
+
+def import_excel_rows(columns, numbered_rows, validate_only=False):
+    """
+    Validates and converts the rows of an Excel file in a single pass.
+
+    'numbered_rows' yields (row number, row dict) pairs, see excel_reader.read_excel_rows.
+    Every row is validated and then converted reusing the enumerations and ranges
+    parsed by the validator. Invalid rows do not stop the pass: all of them are
+    reported together in an InvalidExcelRowsError. With 'validate_only' the rows go
+    through exactly the same checks but no tree is built and None is returned.
+    """
+    validate_excel_columns(columns)
+    root = {"variables": [], "groups": [], "code": "root"}
+    group_index = {}
+    errors = []
+
+    for row_number, row in numbered_rows:
+        try:
+            parsed_values = validate_variable(row)
+            variable, path = row_to_variable(row, parsed_values)
+        except InvalidDataModelError as e:
+            errors.append({"row": row_number, "code": row.get("code"), "error": str(e)})
+            continue
+        if not validate_only and not errors:
+            insert_variable_into_structure(root, variable, path, group_index)
+
+    if errors:
+        raise InvalidExcelRowsError(errors)
+    if validate_only:
+        return None
+    return build_data_model(root)
+
+
+def convert_excel_to_json(df):
+    """
+    Converts a DataFrame from Excel into a JSON structure, see convert_excel_rows.
+    """
+    df = df.astype(str).replace("nan", None)
+    return convert_excel_rows(df.to_dict("records"))
@@ -1,6 +1,6 @@
 """Standalone script for converting a CDEs Metadata Schema of the Medical Informatics Platform (MIP) from JSON format back to EXCEL format."""
 
-import pandas as pd
+import xlsxwriter
 
 from common_entities import EXCEL_JSON_FIELDS_MAP, EXCEL_COLUMNS, InvalidDataModelError
 
@@ -31,57 +31,101 @@ def extract_values(variable):
 
 def parse_variables(variable, concept_path):
     """Parse individual variables from the json data, handling special cases and constructing the concept path."""
+    return variable_row(variable, "/".join(concept_path))
+
+
+def variable_row(variable, parent_path):
+    """Build the Excel row of a variable whose group has the concept path 'parent_path'."""
     data_row = []
     for excel_field, json_key in EXCEL_JSON_FIELDS_MAP.items():
         if excel_field == "values":
             value = extract_values(variable)
         elif json_key == "conceptPath":
-            concept_path_str = "/".join(concept_path + [variable.get("code", "")])
-            value = concept_path_str
+            code = variable.get("code", "")
+            value = f"{parent_path}/{code}" if parent_path else code
         else:
             value = variable.get(json_key, "")
         data_row.append(value)
     return data_row
 
 
-def recursive_parse_json(json_data, concept_path=[]):
-    """Recursively parses JSON data to extract variables and their details.
+def iter_parse_json(json_data, concept_path=()):
+    """Lazily yields the Excel rows of the variables of the JSON data, in document order.
+
+    The tree is walked with an explicit stack of (node, concept path) entries, where each
+    concept path is built once per group from the one of its parent.
 
     Args:
         json_data (dict or list): The JSON data to parse.
-        concept_path (list): The path to the current position in the hierarchy.
+        concept_path (sequence): The path to the position of json_data in the hierarchy.
 
-    Returns:
-        list: A list of parsed variables with their details.
+    Yields:
+        list: The details of a variable, in the order of EXCEL_COLUMNS.
     """
-    data = []
-
-    if isinstance(json_data, dict):
-        # Extract the concept path for the current level
-        label = json_data.get("label", json_data.get("code", ""))
-        if label:  # Update concept path only if label or code is present
-            concept_path.append(label)
+    stack = [(json_data, "/".join(concept_path))]
+    while stack:
+        node, parent_path = stack.pop()
+        if not isinstance(node, dict):
+            continue
+
+        # Extend the concept path only if label or code is present
+        label = node.get("label", node.get("code", ""))
+        path = parent_path
+        if label:
+            path = f"{parent_path}/{label}" if parent_path else label
 
         # Process variables at the current level
-        for variable in json_data.get("variables") or []:
-            data.append(parse_variables(variable, concept_path))
+        for variable in node.get("variables") or []:
+            yield variable_row(variable, path)
 
-        # Recursively process each group in the current level
-        for group in json_data.get("groups") or []:
-            data.extend(recursive_parse_json(group, concept_path.copy()))
+        # Process the groups of the current level next, in their order
+        stack.extend((group, path) for group in reversed(node.get("groups") or []))
+
+
+def recursive_parse_json(json_data, concept_path=None):
+    """Parses JSON data to extract variables and their details.
+
+    Args:
+        json_data (dict or list): The JSON data to parse.
+        concept_path (list): The path to the current position in the hierarchy.
 
-        if label:  # Ensure concept path is not permanently altered
-            concept_path.pop()
-    return data
+    Returns:
+        list: A list of parsed variables with their details, see iter_parse_json.
+    """
+    return list(iter_parse_json(json_data, concept_path or ()))
 
 
 def convert_json_to_excel(cdes_data):
+    # Imported here, the endpoints write the workbook with xlsxwriter without pandas.
+    import pandas as pd
 
     # Parse the json data to a list of dict items with
     # "csvFile", "name", "code", "type", "values", "unit",
     # "description", "canBeNull", "comments", "conceptPath",
     # and "methodology keys that can be used to create a pandas
     # dataframe
-    result = recursive_parse_json(cdes_data)
+    result = iter_parse_json(cdes_data)
     # Create a pandas dataframe from the list of dict items
     return pd.DataFrame(result, columns=EXCEL_COLUMNS)
+
+
+# Header format of the pandas xlsxwriter exports, kept for familiar looking files.
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def write_json_to_excel(cdes_data, output):
+    """Writes the variables of the json data as the rows of an xlsx workbook.
+
+    The workbook is written with xlsxwriter's constant_memory mode, so every row is
+    flushed as soon as it is written and memory stays flat whatever the number of CDEs.
+
+    Args:
+        cdes_data (dict): The data model.
+        output: A path or a binary file-like object to write the workbook to.
+    """
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, EXCEL_COLUMNS, workbook.add_format(HEADER_FORMAT))
+    for row_number, data_row in enumerate(iter_parse_json(cdes_data), start=1):
+        worksheet.write_row(row_number, 0, data_row)
+    workbook.close()
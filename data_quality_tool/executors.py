@@ -0,0 +1,231 @@
+"""Process pool for the CPU bound work of the endpoints.
+
+Each gunicorn worker lazily creates its own pool the first time it is needed, so
+the pool is never inherited across the fork of the workers. While a request thread
+waits for its work to finish in the pool, the other threads of the worker keep
+serving requests.
+
+The pool processes are started by a forkserver, or spawned where there is none,
+rather than forked from the worker, whose other threads may hold locks at the
+time. They are warmed up like the workers, see workloads.warm_up. A pool whose
+process died, such as one killed for running out of memory, is replaced.
+
+The hits and misses of the caches of the parsers and validators in the pool
+processes are sent back with the results of the work, and kept per worker with
+pool_cache_counters.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    TimeoutError,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+import metrics
+from common_parsers import parse_cache_info
+from validator.json_validator import validated_subtrees
+
+
+class WorkloadTimeoutError(Exception):
+    """The work sent to the process pool did not finish within PROCESS_POOL_TIMEOUT."""
+
+
+def process_pool_size(app=None):
+    """The configured PROCESS_POOL_WORKERS, the number of cores when unset, 0 to run inline."""
+    app = app or current_app
+    workers = app.config.get("PROCESS_POOL_WORKERS")
+    if workers is None:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def _warm_up_process():
+    import workloads
+
+    workloads.warm_up()
+
+
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(app=None):
+    """The process pool of the app, or None if it is configured with 0 workers."""
+    app = app or current_app
+    workers = process_pool_size(app)
+    if workers <= 0:
+        return None
+    pool = app.extensions.get("process_pool")
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = app.extensions.get("process_pool")
+            if pool is None or pool.pid != os.getpid():
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_pool_context(),
+                    initializer=_warm_up_process,
+                )
+                pool.pid = os.getpid()
+                pool.max_workers = workers
+                pool.extensions = app.extensions
+                app.extensions["process_pool"] = pool
+    return pool
+
+
+def discard_process_pool(pool, terminate=False):
+    """Stop using a pool, so that the next call of get_process_pool creates a new one.
+
+    Args:
+        pool: A pool returned by get_process_pool.
+        terminate: Whether to kill its processes, such as one stuck in a workload.
+    """
+    with _pool_lock:
+        if pool.extensions.get("process_pool") is pool:
+            del pool.extensions["process_pool"]
+    if terminate:
+        # ProcessPoolExecutor has no public way to stop a running workload.
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def map_unordered(pool, function, items, max_pending=None):
+    """Apply a function to every item and yield (index, result) pairs as they finish.
+
+    Items are consumed lazily and at most max_pending of them, twice the number of
+    workers by default, are submitted at once. Exceptions raised by the function are
+    yielded in place of its result. Without a pool the items are processed in order.
+    """
+    if pool is None:
+        for index, item in enumerate(items):
+            try:
+                yield index, function(item)
+            except Exception as e:
+                yield index, e
+        return
+
+    max_pending = max_pending or 2 * pool.max_workers
+    pending = {}
+    items = enumerate(items)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_pending:
+            try:
+                index, item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            try:
+                pending[pool.submit(_counting_caches, function, item)] = index
+            except BrokenProcessPool:
+                discard_process_pool(pool)
+                raise
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            exception = future.exception()
+            if isinstance(exception, BrokenProcessPool):
+                discard_process_pool(pool)
+            if exception is not None:
+                yield index, exception
+                continue
+            result, cache_deltas = future.result()
+            _add_pool_cache_counters(cache_deltas)
+            yield index, result
+
+
+def _cache_counters():
+    return {
+        "values_parse_cache": Counter(
+            {name: parse_cache_info()[name] for name in ("hits", "misses")}
+        ),
+        "validated_subtrees": Counter(
+            {name: validated_subtrees.stats()[name] for name in ("hits", "misses")}
+        ),
+    }
+
+
+_pool_cache_counters = {}
+_pool_cache_counters_lock = threading.Lock()
+
+
+def _add_pool_cache_counters(deltas):
+    with _pool_cache_counters_lock:
+        for cache, counters in deltas.items():
+            _pool_cache_counters.setdefault(cache, Counter()).update(counters)
+
+
+def pool_cache_counters():
+    """The hits and misses of the caches, by cache, in the work sent to the pool."""
+    with _pool_cache_counters_lock:
+        return {
+            cache: dict(counters) for cache, counters in _pool_cache_counters.items()
+        }
+
+
+def _counting_caches(function, *args, **kwargs):
+    """Call a function and return its result with the hits and misses of the caches."""
+    before = _cache_counters()
+    result = function(*args, **kwargs)
+    after = _cache_counters()
+    return result, {cache: after[cache] - before[cache] for cache in after}
+
+
+def _collect_measurements(function, args, kwargs):
+    with metrics.collect() as measurements:
+        result, cache_deltas = _counting_caches(function, *args, **kwargs)
+    return result, measurements, cache_deltas
+
+
+def run_workload(function, *args, offload=True, **kwargs):
+    """Call function(*args, **kwargs) in the process pool, or inline without a pool or offload.
+
+    The stages timed by the function in the worker process are added to those of
+    the current request. Exceptions are raised again in the caller.
+
+    Raises:
+        BrokenProcessPool: If the process running the function died, the pool is
+            replaced for the next calls.
+        WorkloadTimeoutError: If the function took more than PROCESS_POOL_TIMEOUT
+            seconds, the pool is replaced and its processes are stopped.
+    """
+    pool = get_process_pool() if offload else None
+    if pool is None:
+        return function(*args, **kwargs)
+    timeout = current_app.config.get("PROCESS_POOL_TIMEOUT")
+    with metrics.stage("offload"):
+        try:
+            future = pool.submit(_collect_measurements, function, args, kwargs)
+        except RuntimeError:
+            # Broken by an earlier workload, or shut down once replaced by another
+            # thread, this one has not run yet.
+            discard_process_pool(pool)
+            pool = get_process_pool()
+            future = pool.submit(_collect_measurements, function, args, kwargs)
+        try:
+            result, measurements, cache_deltas = future.result(timeout=timeout)
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+        except TimeoutError:
+            discard_process_pool(pool, terminate=True)
+            raise WorkloadTimeoutError(
+                f"The work did not finish within {timeout} seconds."
+            )
+    metrics.merge(measurements)
+    _add_pool_cache_counters(cache_deltas)
+    return result
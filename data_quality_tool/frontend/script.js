@@ -15,7 +15,7 @@ async function convertExcelToJson() {
     formData.append('file', excelFile);
 
     try {
-        const response = await fetch('http://127.0.0.1:8000/excel-to-json', {
+        const response = await fetch('http://127.0.0.1:8000/excel-to-json?pretty', {
             method: 'POST',
             body: formData
         });
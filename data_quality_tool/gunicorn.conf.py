@@ -0,0 +1,27 @@
+"""Gunicorn settings of the service, see the Dockerfile.
+
+The app is imported and warmed up once in the master process, before the workers
+are forked, so the workers share its memory pages copy-on-write and serve their
+first requests without paying the imports and the first calls.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# A thread waiting for the process pool, see executors.py, does not hold up the
+# other requests of its worker.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "10"))
+preload_app = True
+
+
+def when_ready(server):
+    # Called in the master once the app is loaded, before the workers are forked.
+    import workloads
+
+    workloads.warm_up()
+    # Keep the collector from touching, and so copying, the objects shared with
+    # the workers.
+    gc.freeze()
+    server.log.info("App warmed up")
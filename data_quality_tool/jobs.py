@@ -0,0 +1,318 @@
+"""Asynchronous conversion jobs, for workbooks whose conversion outlasts HTTP timeouts.
+
+A submitted workbook is kept in JOBS_DIR and converted in the background by a
+bounded runner of the worker that accepted it, which sends the work to the process
+pool. The state and the result of the jobs are kept in a SQLite database in the
+same directory, so every gunicorn worker of a host can answer the polls. Jobs are
+dropped JOBS_TTL seconds after their last update.
+
+The worker running a job updates it every JOBS_HEARTBEAT seconds until it finishes,
+so the unfinished jobs not updated for JOBS_STALE_AFTER seconds, such as those of a
+worker that was killed or restarted, are failed.
+"""
+
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from codec import dumps, loads
+from common_entities import InvalidDataModelError, InvalidExcelRowsError
+from executors import run_workload
+import workloads
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+STALE_ERROR = "The worker running the job stopped, submit the workbook again."
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    error TEXT,
+    result BLOB,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated);
+"""
+
+
+def _timestamp(seconds):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+class JobStore:
+    """A SQLite backed store of the state and the result of the jobs."""
+
+    def __init__(self, directory, ttl, stale_after):
+        self.directory = directory
+        self.path = os.path.join(directory, "jobs.sqlite3")
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._local = threading.local()
+
+    def _connection(self):
+        # SQLite connections can be used neither across threads nor across a fork.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def input_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.xlsx")
+
+    def create(self, job_id):
+        """Record a queued job, then drop the expired ones."""
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT INTO jobs (id, status, created, updated) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, now, now),
+            )
+            expired = [
+                expired_id
+                for (expired_id,) in connection.execute(
+                    "SELECT id FROM jobs WHERE updated <= ?", (now - self.ttl,)
+                )
+            ]
+            connection.execute("DELETE FROM jobs WHERE updated <= ?", (now - self.ttl,))
+        for expired_id in expired:
+            # Left behind by a worker that stopped while running the job.
+            try:
+                os.remove(self.input_path(expired_id))
+            except FileNotFoundError:
+                pass
+
+    def touch(self, job_ids):
+        """Record that the unfinished jobs among job_ids are still being worked on."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        self._connection().execute(
+            f"UPDATE jobs SET updated = ? WHERE id IN ({', '.join('?' * len(job_ids))})"
+            " AND status IN (?, ?)",
+            (time.time(), *job_ids, QUEUED, RUNNING),
+        )
+
+    def fail_stale(self):
+        """Fail the unfinished jobs whose worker stopped updating them."""
+        now = time.time()
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ?"
+            " WHERE status IN (?, ?) AND updated <= ? AND updated > ?",
+            (
+                FAILED,
+                dumps({"error": STALE_ERROR}).decode(),
+                now,
+                QUEUED,
+                RUNNING,
+                now - self.stale_after,
+                now - self.ttl,
+            ),
+        )
+
+    def _update(self, job_id, status, error=None, result=None):
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, result = ?, updated = ? WHERE id = ?",
+            (status, error, result, time.time(), job_id),
+        )
+
+    def start(self, job_id):
+        self._update(job_id, RUNNING)
+
+    def succeed(self, job_id, result):
+        self._update(job_id, SUCCEEDED, result=result)
+
+    def fail(self, job_id, error, errors=None):
+        """Record the error message of a failed job, and its invalid rows if any."""
+        error = {"error": error}
+        if errors is not None:
+            error["errors"] = errors
+        self._update(job_id, FAILED, error=dumps(error).decode())
+
+    def get(self, job_id):
+        """The status of a job, or None if it is unknown or expired."""
+        self.fail_stale()
+        row = (
+            self._connection()
+            .execute(
+                "SELECT status, error, created, updated FROM jobs"
+                " WHERE id = ? AND updated > ?",
+                (job_id, time.time() - self.ttl),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        status, error, created, updated = row
+        job = {"id": job_id, "status": status, "created": _timestamp(created)}
+        if status in FINISHED:
+            job["finished"] = _timestamp(updated)
+        if error is not None:
+            job.update(loads(error))
+        return job
+
+    def result(self, job_id):
+        """The result of a succeeded job, or None."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = ? AND updated > ?",
+                (job_id, SUCCEEDED, time.time() - self.ttl),
+            )
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def wait(self, job_id, timeout, interval=0.2):
+        """The status of a job once finished, or after timeout seconds at most."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            time.sleep(min(interval, remaining))
+
+    def stats(self):
+        """The number of jobs by status, shared by all the processes using the store."""
+        self.fail_stale()
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED), 0)
+        counts.update(
+            self._connection().execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE updated > ? GROUP BY status",
+                (time.time() - self.ttl,),
+            )
+        )
+        return counts
+
+    def pending(self):
+        """The number of queued and running jobs."""
+        stats = self.stats()
+        return stats[QUEUED] + stats[RUNNING]
+
+
+def jobs_dir(app=None):
+    app = app or current_app
+    return app.config.get("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "dqt-jobs")
+
+
+def get_job_store(app=None):
+    app = app or current_app
+    directory = jobs_dir(app)
+    store = app.extensions.get("job_store")
+    if store is None or store.directory != directory:
+        store = app.extensions["job_store"] = JobStore(
+            directory,
+            ttl=app.config["JOBS_TTL"],
+            stale_after=app.config["JOBS_STALE_AFTER"],
+        )
+    return store
+
+
+def get_job_runner(app=None):
+    """The threads of this worker running the jobs, JOBS_CONCURRENCY at most."""
+    app = app or current_app
+    runner = app.extensions.get("job_runner")
+    if runner is None or runner.pid != os.getpid():
+        runner = ThreadPoolExecutor(
+            max_workers=int(app.config["JOBS_CONCURRENCY"]),
+            thread_name_prefix="dqt-job",
+        )
+        runner.pid = os.getpid()
+        # The store of every job submitted to the runner and not finished yet.
+        runner.jobs = {}
+        threading.Thread(
+            target=_heartbeat,
+            args=(app, runner, float(app.config["JOBS_HEARTBEAT"])),
+            name="dqt-job-heartbeat",
+            daemon=True,
+        ).start()
+        app.extensions["job_runner"] = runner
+    return runner
+
+
+def _heartbeat(app, runner, interval):
+    """Update the unfinished jobs of a runner every interval seconds, until it is replaced."""
+    while True:
+        time.sleep(interval)
+        if app.extensions.get("job_runner") is not runner:
+            return
+        stores = {}
+        for job_id, store in list(runner.jobs.items()):
+            stores.setdefault(store, []).append(job_id)
+        for store, job_ids in stores.items():
+            try:
+                store.touch(job_ids)
+            except sqlite3.Error:
+                logger.exception("Failed to update the running jobs")
+
+
+def _keep(path, destination):
+    """Keep a spooled upload beyond its request, without copying it when possible."""
+    try:
+        os.link(path, destination)
+    except OSError:
+        shutil.copyfile(path, destination)
+
+
+def submit_conversion(workbook, pretty=False, **limits):
+    """Queue the conversion of a spooled workbook and return the id of its job."""
+    app = current_app._get_current_object()
+    store = get_job_store(app)
+    job_id = uuid.uuid4().hex
+    input_path = store.input_path(job_id)
+    os.makedirs(store.directory, exist_ok=True)
+    _keep(workbook, input_path)
+    store.create(job_id)
+    runner = get_job_runner(app)
+    runner.jobs[job_id] = store
+    runner.submit(_run_conversion, app, runner, job_id, input_path, pretty, limits)
+    return job_id
+
+
+def _run_conversion(app, runner, job_id, input_path, pretty, limits):
+    store = runner.jobs[job_id]
+    with app.app_context():
+        try:
+            store.start(job_id)
+            body = run_workload(
+                workloads.convert_workbook, input_path, pretty, **limits
+            )
+        except InvalidExcelRowsError as e:
+            store.fail(job_id, str(e), e.errors)
+        except InvalidDataModelError as e:
+            store.fail(job_id, str(e))
+        except Exception as e:
+            app.logger.exception(f"Job {job_id} failed")
+            store.fail(job_id, str(e))
+        else:
+            store.succeed(job_id, body)
+            app.logger.info(f"Job {job_id} succeeded")
+        finally:
+            runner.jobs.pop(job_id, None)
+            os.remove(input_path)
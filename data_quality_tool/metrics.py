@@ -0,0 +1,273 @@
+"""Per-stage timing of the requests, exported as Server-Timing headers and Prometheus metrics.
+
+Views time their stages with the stage context manager. When the request ends,
+finish_request observes the timings in histograms labelled by endpoint, stage and
+outcome, and adds them to a Server-Timing header. The histograms and the gauges of
+the registered collectors are rendered in the Prometheus text format by render.
+
+Metrics are kept per process, each gunicorn worker exports its own.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+SIZE_BUCKETS = tuple(1024 * 4**power for power in range(11))  # 1 KiB to 1 GiB
+COUNT_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A Prometheus histogram with a fixed set of label names."""
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [
+                    ("le", _format_value(bound))
+                ], cumulative
+            yield f"{self.name}_bucket", labels + [("le", "+Inf")], values[-2]
+            yield f"{self.name}_count", labels, values[-2]
+            yield f"{self.name}_sum", labels, values[-1]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        lines.extend(
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in self.samples()
+        )
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_SECONDS = Histogram(
+    "dqt_request_duration_seconds",
+    "Duration of the requests.",
+    ("endpoint", "outcome"),
+    DURATION_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "dqt_request_stage_duration_seconds",
+    "Duration of the stages of the requests.",
+    ("endpoint", "stage", "outcome"),
+    DURATION_BUCKETS,
+)
+PAYLOAD_BYTES = Histogram(
+    "dqt_payload_size_bytes",
+    "Size of the request and response bodies.",
+    ("endpoint", "direction", "outcome"),
+    SIZE_BUCKETS,
+)
+DATA_MODEL_CDES = Histogram(
+    "dqt_data_model_cdes",
+    "Number of CommonDataElements in the processed data models.",
+    ("endpoint", "outcome"),
+    COUNT_BUCKETS,
+)
+HISTOGRAMS = [REQUEST_SECONDS, STAGE_SECONDS, PAYLOAD_BYTES, DATA_MODEL_CDES]
+
+# name -> (documentation, callable returning {labels tuple or (): value})
+_collectors = {}
+
+
+def register_gauges(name, documentation, collect):
+    """Export the values returned by collect() at scrape time as a gauge.
+
+    collect returns a dict mapping tuples of (label, value) pairs to numbers.
+    """
+    _collectors[name] = (documentation, collect)
+
+
+def render():
+    """All the metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, (documentation, collect) in _collectors.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in sorted(collect().items()):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_worker = threading.local()
+
+
+def _measurements():
+    """The measurements of the work collected in this thread, or of the current request.
+
+    The collected work comes first: a worker process forked while a request is handled
+    inherits its context.
+    """
+    measurements = getattr(_worker, "measurements", None)
+    if measurements is None and has_request_context():
+        measurements = g.get("metrics")
+    return measurements
+
+
+def start_request():
+    g.metrics = {"start": time.perf_counter(), "stages": [], "cdes": None}
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        measurements = _measurements()
+        if measurements is not None:
+            measurements["stages"].append((name, time.perf_counter() - start))
+
+
+def record_cdes(count):
+    """Record the number of CommonDataElements of the data model of the current request."""
+    measurements = _measurements()
+    if measurements is not None:
+        measurements["cdes"] = count
+
+
+@contextmanager
+def collect():
+    """Collect the stages and the CDE count of work done outside of a request.
+
+    Used in the worker processes, the collected measurements are then merged into
+    those of the request that sent the work with merge.
+    """
+    _worker.measurements = {"stages": [], "cdes": None}
+    try:
+        yield _worker.measurements
+    finally:
+        _worker.measurements = None
+
+
+def merge(measurements):
+    current = _measurements()
+    if current is None:
+        return
+    current["stages"].extend(measurements["stages"])
+    if measurements["cdes"] is not None:
+        current["cdes"] = measurements["cdes"]
+
+
+def counted_cdes(rows):
+    """Yield the rows of an Excel file and record their number once consumed."""
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    record_cdes(count)
+
+
+def outcome_of(status_code):
+    if status_code < 400:
+        return "success"
+    if status_code < 500:
+        return "invalid"
+    return "error"
+
+
+def finish_request(response):
+    """Observe the timings and sizes of the request and add its Server-Timing header."""
+    measurements = g.get("metrics")
+    if measurements is None:
+        return response
+    total = time.perf_counter() - measurements["start"]
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    outcome = outcome_of(response.status_code)
+
+    REQUEST_SECONDS.observe(total, endpoint=endpoint, outcome=outcome)
+    for name, duration in measurements["stages"]:
+        STAGE_SECONDS.observe(duration, endpoint=endpoint, stage=name, outcome=outcome)
+    if request.content_length is not None:
+        PAYLOAD_BYTES.observe(
+            request.content_length,
+            endpoint=endpoint,
+            direction="request",
+            outcome=outcome,
+        )
+    if not response.is_streamed and response.content_length is not None:
+        PAYLOAD_BYTES.observe(
+            response.content_length,
+            endpoint=endpoint,
+            direction="response",
+            outcome=outcome,
+        )
+    if measurements["cdes"] is not None:
+        DATA_MODEL_CDES.observe(
+            measurements["cdes"], endpoint=endpoint, outcome=outcome
+        )
+
+    timings = [
+        f"{name};dur={duration * 1000:.2f}" for name, duration in measurements["stages"]
+    ]
+    timings.append(f"total;dur={total * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+    return response
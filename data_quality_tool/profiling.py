@@ -0,0 +1,131 @@
+"""Opt-in profiling of single requests on production inputs.
+
+When PROFILING_ENABLED is set, a request sent with an "X-Profile: 1" header or a
+"profile" query parameter runs under cProfile. The profile is saved in PROFILE_DIR,
+which keeps the PROFILE_MAX_FILES most recent ones, and its id is returned in the
+X-Profile-Id response header. The admin endpoints serve the profiles back to the
+holders of the ADMIN_TOKEN.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import tempfile
+import time
+import uuid
+
+from flask import current_app, g, request
+
+PROFILE_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def profile_dir(app=None):
+    app = app or current_app
+    return app.config.get("PROFILE_DIR") or os.path.join(
+        tempfile.gettempdir(), "dqt-profiles"
+    )
+
+
+def profiling_requested():
+    """Whether profiling is enabled and the current request asks for it."""
+    if not current_app.config.get("PROFILING_ENABLED"):
+        return False
+    header = request.headers.get("X-Profile", "")
+    return header.lower() in ("1", "true", "yes") or "profile" in request.args
+
+
+def is_profiled():
+    """Whether the current request runs under the profiler."""
+    return g.get("profiler") is not None
+
+
+def start_profile():
+    if not profiling_requested():
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this thread.
+        current_app.logger.warning("Request not profiled, a profiler is already active")
+        return
+    g.profiler = profiler
+
+
+def finish_profile(response):
+    """Stop the profiler of the request, save its profile and add its id to the response."""
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    rotate_profiles(directory, current_app.config["PROFILE_MAX_FILES"])
+    response.headers["X-Profile-Id"] = profile_id
+    current_app.logger.info(f"Request {request.path} profiled as {profile_id}")
+    return response
+
+
+def rotate_profiles(directory, max_files):
+    """Delete the oldest profiles beyond the max_files most recent ones."""
+    for profile in list_profiles(directory)[max_files:]:
+        try:
+            os.remove(os.path.join(directory, f"{profile['id']}.prof"))
+        except FileNotFoundError:
+            # Already rotated by another worker.
+            pass
+
+
+def list_profiles(directory):
+    """The saved profiles, the most recent first."""
+    profiles = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            profile_id, extension = os.path.splitext(entry.name)
+            if extension != ".prof" or not PROFILE_ID.fullmatch(profile_id):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            profiles.append((stat.st_mtime, profile_id, stat.st_size))
+    profiles.sort(reverse=True)
+    return [
+        {
+            "id": profile_id,
+            "size": size,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime)),
+        }
+        for mtime, profile_id, size in profiles
+    ]
+
+
+def profile_path(profile_id, app=None):
+    """The file of a saved profile, or None if the id is malformed or unknown."""
+    if not PROFILE_ID.fullmatch(profile_id):
+        return None
+    path = os.path.join(profile_dir(app), f"{profile_id}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def profile_summary(path, limit=50):
+    """The functions of a profile with the highest cumulative time, as pstats prints them."""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def is_admin():
+    """Whether the request carries the configured ADMIN_TOKEN as a bearer token."""
+    token = current_app.config.get("ADMIN_TOKEN")
+    if not token:
+        return False
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        credentials.encode(), token.encode()
+    )
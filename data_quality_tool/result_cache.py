@@ -0,0 +1,242 @@
+"""Content-addressed cache of endpoint responses.
+
+Responses are stored in a SQLite database keyed by a hash of the request payload,
+so every gunicorn worker of a host shares the same cache. Entries expire after a
+TTL and the least recently used ones are evicted when the cache grows too big.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import partial, wraps
+
+from flask import current_app, make_response, request
+
+from admission import admitted
+
+from metrics import stage
+from profiling import is_profiled
+from uploads import update_digest
+
+# Bump when the output of the conversions or validations, or the computation of the
+# keys, changes, so that results computed by a previous version are not served any more.
+RESULT_CACHE_VERSION = "3"
+
+# Only deterministic outcomes are cached: successes and validation errors.
+CACHEABLE_STATUS_CODES = {200, 400}
+
+# Headers that are recomputed for every response.
+_SKIPPED_HEADERS = {"content-length", "date"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResultCache:
+    """A SQLite backed cache of (status, headers, body) responses."""
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connection(self):
+        # SQLite connections can be used neither across threads nor across a fork.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def key(endpoint, payload):
+        """The content address of a payload, bytes or a binary file, sent to an endpoint."""
+        digest = hashlib.sha256(f"{RESULT_CACHE_VERSION}:{endpoint}:".encode())
+        update_digest(digest, payload)
+        return digest.hexdigest()
+
+    def _count(self, connection, name):
+        connection.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key):
+        """Return the cached (status, headers, body) of a key, or None."""
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT status, headers, body FROM results WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self._count(connection, "misses")
+                return None
+            connection.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._count(connection, "hits")
+        status, headers, body = row
+        return status, json.loads(headers), body
+
+    def put(self, key, status, headers, body):
+        """Store a response, then drop expired entries and evict the least recently used ones."""
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO results"
+                " (key, status, headers, body, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(headers), body, len(body), now, now),
+            )
+            connection.execute(
+                "DELETE FROM results WHERE created <= ?", (now - self.ttl,)
+            )
+            (size,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            if size > self.max_bytes:
+                evicted = 0
+                for entry_key, entry_size in connection.execute(
+                    "SELECT key, size FROM results ORDER BY accessed"
+                ).fetchall():
+                    if size <= self.max_bytes:
+                        break
+                    connection.execute(
+                        "DELETE FROM results WHERE key = ?", (entry_key,)
+                    )
+                    size -= entry_size
+                    evicted += 1
+                connection.execute(
+                    "INSERT INTO counters (name, value) VALUES ('evictions', ?)"
+                    " ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (evicted,),
+                )
+
+    def stats(self):
+        """Counters of the cache, shared by all the processes using it."""
+        connection = self._connection()
+        counters = dict(connection.execute("SELECT name, value FROM counters"))
+        entries, size = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def get_result_cache(app=None):
+    """The result cache of the app, or None if RESULT_CACHE_PATH is not configured."""
+    app = app or current_app
+    path = app.config.get("RESULT_CACHE_PATH")
+    if not path:
+        return None
+    cache = app.extensions.get("result_cache")
+    if cache is None or cache.path != path:
+        cache = app.extensions["result_cache"] = ResultCache(
+            path,
+            max_bytes=app.config["RESULT_CACHE_MAX_BYTES"],
+            ttl=app.config["RESULT_CACHE_TTL"],
+        )
+    return cache
+
+
+def cached_response(payload_of_request, budget):
+    """Decorate a view so that its responses are cached by the content of the request.
+
+    The view runs within the admission budget of that name, see admission.admitted.
+    Requests of up to RESULT_CACHE_EARLY_MAX_BYTES are looked up in the cache before
+    they are admitted, so that cache hits do not wait for a slot. Bigger requests,
+    and those of unknown size, are admitted before their payload is read and hashed.
+
+    Args:
+        payload_of_request: Called before the view, returns the bytes, or the binary
+            file, that determine the response, or None when the request must not be
+            cached.
+        budget: The name of the admission budget of the view.
+    """
+
+    def decorator(view):
+        admitted_view = admitted(budget)(view)
+
+        def cached_view(run_view, *args, **kwargs):
+            cache = get_result_cache()
+            with stage("cache"):
+                payload = payload_of_request()
+                if payload is not None:
+                    # The query string selects variants of the response, such as ?pretty.
+                    key = cache.key(
+                        f"{view.__name__}?{request.query_string.decode()}", payload
+                    )
+                    cached = cache.get(key)
+            if payload is None:
+                return run_view(*args, **kwargs)
+            if cached is not None:
+                status, headers, body = cached
+                return current_app.response_class(body, status=status, headers=headers)
+
+            response = make_response(run_view(*args, **kwargs))
+            if response.status_code in CACHEABLE_STATUS_CODES:
+                # Files are sent in passthrough mode, read them into the response.
+                response.direct_passthrough = False
+                headers = [
+                    (name, value)
+                    for name, value in response.headers.items()
+                    if name.lower() not in _SKIPPED_HEADERS
+                ]
+                with stage("cache"):
+                    cache.put(key, response.status_code, headers, response.get_data())
+            return response
+
+        admitted_cached_view = admitted(budget)(partial(cached_view, view))
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Profiled requests must run the view.
+            if get_result_cache() is None or is_profiled():
+                return admitted_view(*args, **kwargs)
+            size = request.content_length
+            if (
+                size is None
+                or size > current_app.config["RESULT_CACHE_EARLY_MAX_BYTES"]
+            ):
+                return admitted_cached_view(*args, **kwargs)
+            return cached_view(admitted_view, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
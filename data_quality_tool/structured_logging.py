@@ -0,0 +1,113 @@
+"""Logging off the request threads, with payload summaries instead of payload dumps.
+
+Records are put on a queue by a QueueHandler and written by a QueueListener thread,
+so the request threads never wait on log I/O. Structured fields are passed with
+extra={"fields": {...}} and rendered as JSON or as key=value pairs.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from uploads import update_digest
+from validator.json_validator import count_common_data_elements
+
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as JSON lines, or as text followed by their key=value fields."""
+
+    def __init__(self, json_lines=False):
+        super().__init__(TEXT_FORMAT)
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        if self.json_lines:
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+        message = super().format(record)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+def setup_logging(level="INFO", log_format="text"):
+    """Send the records of the root logger through a queue to a stderr handler.
+
+    Threads do not survive a fork, and one forked while writing a record could leave
+    the stderr lock held in the child. The listener is therefore stopped before a
+    fork, such as the one of the gunicorn workers, and started again on both sides.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines=log_format == "json"))
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level)
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(
+        before=stop_logging,
+        after_in_parent=start_logging,
+        after_in_child=start_logging,
+    )
+
+
+def start_logging():
+    if _listener is not None and _listener._thread is None:
+        _listener.start()
+
+
+def stop_logging():
+    """Write the queued records and stop the listener thread."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def payload_summary(body, data=None):
+    """Hash, size and CDE count of a request payload, to log in place of the payload.
+
+    Args:
+        body: The raw bytes of the payload, or a binary file holding them.
+        data: The parsed data model, if any.
+    """
+    digest = hashlib.sha256()
+    size = update_digest(digest, body)
+    summary = {"sha256": digest.hexdigest()[:16], "bytes": size}
+    if isinstance(data, dict):
+        try:
+            summary["cdes"] = count_common_data_elements(data)
+        except (AttributeError, TypeError):
+            # Malformed data models are reported by the validation.
+            pass
+    return summary
+
+
+def payload_sampled(sample_rate):
+    """Whether to dump the full payload of this request, for a fraction of requests."""
+    return sample_rate > 0 and random.random() < sample_rate
@@ -92,3 +92,23 @@ class TestCleanEmptyFields(unittest.TestCase):
         }
         clean_empty_fields(data)
         self.assertEqual(data, expected)
+
+    def test_deep_tree_does_not_hit_the_recursion_limit(self):
+        data = {"code": "root", "groups": []}
+        group = data
+        for level in range(5000):
+            subgroup = {
+                "code": f"level{level}",
+                "groups": [],
+                "variables": [],
+                "description": "",
+            }
+            group["groups"].append(subgroup)
+            group = subgroup
+        clean_empty_fields(data)
+        depth = 0
+        while "groups" in data:
+            (data,) = data["groups"]
+            depth += 1
+        self.assertEqual(depth, 5000)
+        self.assertEqual(data, {"code": "level4999"})
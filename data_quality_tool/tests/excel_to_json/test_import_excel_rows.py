@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+
+from common_entities import EXCEL_COLUMNS, InvalidDataModelError, InvalidExcelRowsError
+from converter.excel_to_json import import_excel_rows
+
+
+def make_row(**fields):
+    row = dict.fromkeys(EXCEL_COLUMNS)
+    row.update(fields)
+    return row
+
+
+class TestImportExcelRows(unittest.TestCase):
+    def setUp(self):
+        rows = [
+            make_row(
+                name="Dataset",
+                code="dataset",
+                type="nominal",
+                values='{"d1", "Dataset 1"}, {"d2", "Dataset 2"}',
+                conceptPath="Model/dataset",
+            ),
+            make_row(
+                name="Age",
+                code="age",
+                type="integer",
+                values="0-120",
+                conceptPath="Model/Demographics/age",
+            ),
+        ]
+        self.rows = list(enumerate(rows, start=2))
+
+    def test_validates_and_converts(self):
+        result = import_excel_rows(EXCEL_COLUMNS, self.rows)
+        self.assertEqual(result["code"], "Model")
+        self.assertEqual(
+            result["variables"][0]["enumerations"],
+            [
+                {"code": "d1", "label": "Dataset 1"},
+                {"code": "d2", "label": "Dataset 2"},
+            ],
+        )
+        age = result["groups"][0]["variables"][0]
+        self.assertEqual((age["minValue"], age["maxValue"]), (0, 120))
+
+    def test_validate_only_builds_no_tree(self):
+        self.assertIsNone(
+            import_excel_rows(EXCEL_COLUMNS, self.rows, validate_only=True)
+        )
+
+    def test_validate_only_runs_conversion_checks(self):
+        self.rows[1][1]["values"] = "0.5-120"
+        with self.assertRaises(InvalidDataModelError) as context:
+            import_excel_rows(EXCEL_COLUMNS, self.rows, validate_only=True)
+        self.assertIn("are not whole numbers", str(context.exception))
+
+    def test_validation_errors_are_raised(self):
+        self.rows[0][1]["values"] = '{"d1", "Dataset 1"}, {"d1", "Dataset 2"}'
+        with self.assertRaises(InvalidDataModelError) as context:
+            import_excel_rows(EXCEL_COLUMNS, self.rows)
+        self.assertIn(
+            "Row 2: On :dataset got: Duplicate codes found", str(context.exception)
+        )
+
+    def test_all_invalid_rows_are_reported(self):
+        self.rows[0][1]["name"] = None
+        self.rows[1][1]["values"] = "120-0"
+        with self.assertRaises(InvalidExcelRowsError) as context:
+            import_excel_rows(EXCEL_COLUMNS, self.rows, validate_only=True)
+        self.assertEqual(
+            context.exception.errors,
+            [
+                {
+                    "row": 2,
+                    "code": "dataset",
+                    "error": "On :dataset got: Missing value for required column 'name'.",
+                },
+                {
+                    "row": 3,
+                    "code": "age",
+                    "error": "On :age got: Min value must be smaller than max value min_str='120' and max_str='0'.",
+                },
+            ],
+        )
+
+    def test_missing_columns(self):
+        with self.assertRaises(InvalidDataModelError) as context:
+            import_excel_rows(["name", "code"], self.rows)
+        self.assertIn("Mismatch in Excel columns", str(context.exception))
+
+    def test_values_are_parsed_once(self):
+        with patch("converter.excel_to_json.parse_values") as parse_values:
+            import_excel_rows(EXCEL_COLUMNS, self.rows)
+        parse_values.assert_not_called()
@@ -84,3 +84,30 @@ class TestInsertVariableIntoStructure(unittest.TestCase):
         insert_variable_into_structure(self.root, variable, path)
         # Verify variable is inserted at the root level
         self.assertIn(variable, self.root["variables"])
+
+    def test_shared_group_index(self):
+        group_index = {}
+        for i in range(3):
+            insert_variable_into_structure(
+                self.root,
+                {"code": f"V{i}"},
+                ["Group1", f"Sub{i % 2}", f"V{i}"],
+                group_index,
+            )
+        self.assertEqual(len(self.root["groups"]), 1)
+        self.assertEqual(
+            [group["code"] for group in self.root["groups"][0]["groups"]],
+            ["Sub0", "Sub1"],
+        )
+        self.assertEqual(
+            [v["code"] for v in self.root["groups"][0]["groups"][0]["variables"]],
+            ["V0", "V2"],
+        )
+        self.assertEqual(group_index[id(self.root)], {"Group1": self.root["groups"][0]})
+
+    def test_group_index_finds_existing_groups(self):
+        existing = {"code": "Group1", "label": "Group1", "groups": [], "variables": []}
+        self.root["groups"].append(existing)
+        insert_variable_into_structure(self.root, {"code": "V1"}, ["Group1", "V1"], {})
+        self.assertEqual(len(self.root["groups"]), 1)
+        self.assertEqual(existing["variables"], [{"code": "V1"}])
@@ -0,0 +1,117 @@
+import re
+import unittest
+import zipfile
+from io import BytesIO
+
+from openpyxl import Workbook
+
+from common_entities import EXCEL_COLUMNS, WorkbookTooLargeError
+from converter.excel_reader import read_excel_rows, normalize_cell
+
+
+def build_workbook(rows):
+    workbook = Workbook()
+    worksheet = workbook.active
+    for row in rows:
+        worksheet.append(row)
+    stream = BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def without_dimension(stream):
+    """Remove the optional <dimension> element of the sheet, as some writers do."""
+    output = BytesIO()
+    with zipfile.ZipFile(stream) as source, zipfile.ZipFile(output, "w") as target:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                data = re.sub(rb"<dimension [^>]*/>", b"", data)
+            target.writestr(item, data)
+    output.seek(0)
+    return output
+
+
+class TestReadExcelRows(unittest.TestCase):
+    def test_reads_header_and_rows(self):
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            columns, rows = read_excel_rows(file)
+            rows = list(rows)
+        self.assertEqual(columns, EXCEL_COLUMNS)
+        self.assertEqual(
+            [row["code"] for _, row in rows],
+            ["dataset", "group_variable", "nested_group_variable"],
+        )
+        self.assertEqual([row_number for row_number, _ in rows], [2, 3, 4])
+        self.assertIsNone(rows[0][1]["csvFile"])
+        self.assertEqual(rows[1][1]["values"], "-10-100")
+
+    def test_cells_are_normalized_to_strings(self):
+        stream = build_workbook([["code", "values", "unit"], [1, 2.5, ""]])
+        columns, rows = read_excel_rows(stream)
+        self.assertEqual(
+            list(rows), [(2, {"code": "1", "values": "2.5", "unit": None})]
+        )
+
+    def test_empty_rows_are_skipped(self):
+        stream = build_workbook([["code", "name"], [None, None], ["a", "A"]])
+        columns, rows = read_excel_rows(stream)
+        self.assertEqual(list(rows), [(3, {"code": "a", "name": "A"})])
+
+    def test_short_rows_are_padded(self):
+        stream = build_workbook([["code", "name", "unit"], ["a"]])
+        columns, rows = read_excel_rows(stream)
+        self.assertEqual(list(rows), [(2, {"code": "a", "name": None, "unit": None})])
+
+    def test_empty_workbook(self):
+        columns, rows = read_excel_rows(build_workbook([]))
+        self.assertEqual(columns, [])
+        self.assertEqual(list(rows), [])
+
+    def test_normalize_cell(self):
+        self.assertIsNone(normalize_cell(None))
+        self.assertIsNone(normalize_cell(""))
+        self.assertEqual(normalize_cell(10), "10")
+
+
+class TestReadExcelRowsLimits(unittest.TestCase):
+    def setUp(self):
+        self.rows = [["code", "name", "unit"], ["a", "A"], ["b", "B"], ["c", "C"]]
+
+    def test_within_limits(self):
+        columns, rows = read_excel_rows(
+            build_workbook(self.rows), max_rows=3, max_columns=3
+        )
+        self.assertEqual(len(list(rows)), 3)
+
+    def test_too_many_rows_in_the_dimensions(self):
+        with self.assertRaises(WorkbookTooLargeError) as context:
+            read_excel_rows(build_workbook(self.rows), max_rows=2)
+        self.assertEqual(
+            str(context.exception),
+            "The workbook has 3 data rows, at most 2 are allowed.",
+        )
+
+    def test_too_many_columns_in_the_dimensions(self):
+        with self.assertRaises(WorkbookTooLargeError) as context:
+            read_excel_rows(build_workbook(self.rows), max_columns=2)
+        self.assertEqual(
+            str(context.exception),
+            "The workbook has 3 columns, at most 2 are allowed.",
+        )
+
+    def test_unsized_sheet(self):
+        stream = without_dimension(build_workbook(self.rows))
+        with self.assertRaises(WorkbookTooLargeError):
+            read_excel_rows(stream, max_columns=2)
+
+        stream.seek(0)
+        columns, rows = read_excel_rows(stream, max_rows=2)
+        self.assertEqual(next(rows)[1]["code"], "a")
+        with self.assertRaises(WorkbookTooLargeError) as context:
+            list(rows)
+        self.assertEqual(
+            str(context.exception),
+            "The workbook has more than the 2 data rows allowed.",
+        )
@@ -583,3 +583,47 @@ class TestCleanEmptyFields(unittest.TestCase):
         }
         remove_single_variable_group(data)
         self.assertEqual(data, expected)
+
+    def test_every_sibling_is_processed(self):
+        data = {
+            "code": "root",
+            "groups": [
+                {"code": "first", "groups": [], "variables": [{"code": "v1"}]},
+                {
+                    "code": "second",
+                    "groups": [
+                        {"code": "leaf", "variables": [{"code": "v2"}]},
+                    ],
+                    "variables": [{"code": "v3"}],
+                },
+            ],
+            "variables": [],
+        }
+        remove_single_variable_group(data)
+        self.assertEqual(
+            data,
+            {
+                "code": "root",
+                "groups": [
+                    {
+                        "code": "second",
+                        "groups": [],
+                        "variables": [{"code": "v3"}, {"code": "v2"}],
+                    }
+                ],
+                "variables": [{"code": "v1"}],
+            },
+        )
+
+    def test_deep_tree_does_not_hit_the_recursion_limit(self):
+        data = {"code": "root", "groups": [], "variables": []}
+        group = data
+        for level in range(5000):
+            subgroup = {"code": f"level{level}", "groups": [], "variables": []}
+            group["groups"].append(subgroup)
+            group = subgroup
+        group["variables"].append({"code": "deepest"})
+        remove_single_variable_group(data)
+        self.assertEqual(
+            data, {"code": "root", "groups": [], "variables": [{"code": "deepest"}]}
+        )
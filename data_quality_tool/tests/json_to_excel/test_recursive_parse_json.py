@@ -1,6 +1,6 @@
 import unittest
 
-from converter.json_to_excel import recursive_parse_json
+from converter.json_to_excel import iter_parse_json, recursive_parse_json
 
 
 class TestRecursiveParseJsonFunction(unittest.TestCase):
@@ -122,3 +122,45 @@ class TestRecursiveParseJsonFunction(unittest.TestCase):
             ["", "Variable *1", "V@1", "", "", "", "", "", "", "Group &1/V@1", ""]
         ]
         self.assertEqual(recursive_parse_json(json_data), expected)
+
+    def test_calls_do_not_share_the_concept_path(self):
+        json_data = {"label": "Group", "variables": [{"code": "V1"}]}
+        first = recursive_parse_json(json_data)
+        second = recursive_parse_json(json_data)
+        self.assertEqual(first, second)
+        self.assertEqual(second[0][9], "Group/V1")
+
+    def test_initial_concept_path(self):
+        json_data = {"label": "Group", "variables": [{"code": "V1"}]}
+        self.assertEqual(
+            recursive_parse_json(json_data, ["Root"])[0][9], "Root/Group/V1"
+        )
+
+    def test_deep_structure(self):
+        json_data = {"label": "L0", "groups": []}
+        group = json_data
+        for level in range(1, 5000):
+            subgroup = {"label": f"L{level}", "groups": []}
+            group["groups"].append(subgroup)
+            group = subgroup
+        group["variables"] = [{"code": "V1"}]
+        (row,) = recursive_parse_json(json_data)
+        self.assertEqual(row[9].count("/"), 5000)
+
+
+class TestIterParseJson(unittest.TestCase):
+    def test_rows_are_yielded_lazily_in_document_order(self):
+        json_data = {
+            "label": "Root",
+            "variables": [{"code": "V1"}],
+            "groups": [
+                {
+                    "label": "A",
+                    "groups": [{"label": "B", "variables": [{"code": "V2"}]}],
+                },
+                {"label": "C", "variables": [{"code": "V3"}]},
+            ],
+        }
+        rows = iter_parse_json(json_data)
+        self.assertEqual(next(rows)[9], "Root/V1")
+        self.assertEqual([row[9] for row in rows], ["Root/A/B/V2", "Root/C/V3"])
@@ -0,0 +1,36 @@
+import json
+import unittest
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from common_entities import EXCEL_COLUMNS
+from converter.json_to_excel import convert_json_to_excel, write_json_to_excel
+
+
+class TestWriteJsonToExcel(unittest.TestCase):
+    def read_rows(self, output):
+        output.seek(0)
+        workbook = load_workbook(output, read_only=True)
+        rows = [list(row) for row in workbook.worksheets[0].iter_rows(values_only=True)]
+        workbook.close()
+        return rows
+
+    def test_rows_match_the_dataframe_export(self):
+        with open("MinimalDataModelExample.json", "r") as file:
+            json_data = json.load(file)
+        output = BytesIO()
+        write_json_to_excel(json_data, output)
+        rows = self.read_rows(output)
+
+        self.assertEqual(rows[0], EXCEL_COLUMNS)
+        expected = convert_json_to_excel(json_data).values.tolist()
+        self.assertEqual(
+            rows[1:],
+            [[value if value != "" else None for value in row] for row in expected],
+        )
+
+    def test_model_without_variables(self):
+        output = BytesIO()
+        write_json_to_excel({"code": "empty", "label": "Empty"}, output)
+        self.assertEqual(self.read_rows(output), [EXCEL_COLUMNS])
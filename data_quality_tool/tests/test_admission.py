@@ -0,0 +1,155 @@
+import threading
+import time
+import unittest
+
+from flask import Flask, stream_with_context
+
+import metrics
+from admission import AdmissionGate, admitted, gate_stats, get_gate
+from controller import app as controller_app
+
+
+def build_app(concurrency=1, queue_size=1, timeout=5):
+    app = Flask(__name__)
+    app.config.update(
+        ADMISSION_BUDGETS={
+            "heavy": {"concurrency": concurrency, "queue_size": queue_size}
+        },
+        ADMISSION_TIMEOUT=timeout,
+        ADMISSION_RETRY_AFTER=7,
+    )
+    app.started = threading.Event()
+    app.proceed = threading.Event()
+
+    @app.route("/slow")
+    @admitted("heavy")
+    def slow():
+        app.started.set()
+        app.proceed.wait(5)
+        return "done"
+
+    @app.route("/fast")
+    @admitted("heavy")
+    def fast():
+        return "done"
+
+    @app.route("/stream")
+    @admitted("heavy")
+    def stream():
+        def lines():
+            yield "a\n"
+            yield "b\n"
+
+        return app.response_class(stream_with_context(lines()))
+
+    return app
+
+
+class TestAdmissionGate(unittest.TestCase):
+    def test_queue_full(self):
+        gate = AdmissionGate(concurrency=1, queue_size=0, timeout=5)
+        self.assertTrue(gate.enter())
+        self.assertFalse(gate.enter())
+        gate.leave()
+        self.assertTrue(gate.enter())
+        self.assertEqual(
+            gate.stats(),
+            {
+                "running": 1,
+                "waiting": 0,
+                "admitted": 2,
+                "rejected": 1,
+                "concurrency": 1,
+                "queue_size": 0,
+            },
+        )
+
+    def test_timeout(self):
+        gate = AdmissionGate(concurrency=1, queue_size=1, timeout=0.05)
+        self.assertTrue(gate.enter())
+        start = time.perf_counter()
+        self.assertFalse(gate.enter())
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual(gate.stats()["waiting"], 0)
+        self.assertEqual(gate.stats()["rejected"], 1)
+
+    def test_waiting_request_is_admitted(self):
+        gate = AdmissionGate(concurrency=1, queue_size=1, timeout=5)
+        self.assertTrue(gate.enter())
+        threading.Timer(0.05, gate.leave).start()
+        self.assertTrue(gate.enter())
+
+
+class TestAdmitted(unittest.TestCase):
+    def test_rejected_fast_when_the_queue_is_full(self):
+        app = build_app(concurrency=1, queue_size=0)
+        client = app.test_client()
+        thread = threading.Thread(target=client.get, args=("/slow",))
+        thread.start()
+        try:
+            self.assertTrue(app.started.wait(5))
+            start = time.perf_counter()
+            response = app.test_client().get("/fast")
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "7")
+            self.assertEqual(
+                response.json, {"error": "The server is busy, retry later."}
+            )
+        finally:
+            app.proceed.set()
+            thread.join()
+        self.assertEqual(app.test_client().get("/fast").status_code, 200)
+
+    def test_rejected_after_the_timeout(self):
+        app = build_app(concurrency=1, queue_size=1, timeout=0.05)
+        thread = threading.Thread(target=app.test_client().get, args=("/slow",))
+        thread.start()
+        try:
+            self.assertTrue(app.started.wait(5))
+            self.assertEqual(app.test_client().get("/fast").status_code, 503)
+        finally:
+            app.proceed.set()
+            thread.join()
+
+    def test_slot_freed_after_normal_responses(self):
+        app = build_app(concurrency=1, queue_size=0)
+        client = app.test_client()
+        for _ in range(3):
+            self.assertEqual(client.get("/fast").status_code, 200)
+        self.assertEqual(get_gate("heavy", app).stats()["running"], 0)
+
+    def test_slot_freed_after_streamed_responses(self):
+        app = build_app(concurrency=1, queue_size=0)
+        client = app.test_client()
+        response = client.get("/stream")
+        self.assertEqual(get_gate("heavy", app).stats()["running"], 1)
+        self.assertEqual(response.data, b"a\nb\n")
+        self.assertEqual(get_gate("heavy", app).stats()["running"], 0)
+
+        response = client.get("/stream")
+        response.close()
+        self.assertEqual(get_gate("heavy", app).stats()["running"], 0)
+        self.assertEqual(client.get("/fast").status_code, 200)
+
+    def test_slot_freed_when_the_view_raises(self):
+        app = build_app(concurrency=1, queue_size=0)
+
+        @app.route("/error")
+        @admitted("heavy")
+        def error():
+            raise RuntimeError("boom")
+
+        client = app.test_client()
+        self.assertEqual(client.get("/error").status_code, 500)
+        self.assertEqual(get_gate("heavy", app).stats()["running"], 0)
+
+
+class TestAdmissionMetrics(unittest.TestCase):
+    def test_gauges(self):
+        client = controller_app.test_client()
+        client.get("/")
+        self.assertEqual(gate_stats(controller_app)["light"]["running"], 0)
+        body = metrics.render()
+        self.assertIn('dqt_admission{budget="light",value="running"} 0', body)
+        self.assertIn('dqt_admission{budget="light",value="rejected"} 0', body)
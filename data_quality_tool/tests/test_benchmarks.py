@@ -0,0 +1,71 @@
+import json
+import unittest
+from collections import Counter
+from io import BytesIO
+
+from benchmarks.generator import concept_paths, make_data_model, make_workbook
+from benchmarks.suite import compare, run
+from validator.json_validator import count_common_data_elements, validate_json
+import workloads
+
+
+class TestGenerator(unittest.TestCase):
+    def test_valid_and_seeded(self):
+        data_model = make_data_model(1000, depth=3, width=4, seed=7)
+        validate_json(data_model, None)
+        self.assertEqual(count_common_data_elements(data_model), 1000)
+        self.assertEqual(make_data_model(1000, depth=3, width=4, seed=7), data_model)
+        self.assertNotEqual(make_data_model(1000, depth=3, width=4, seed=8), data_model)
+
+    def test_hierarchy(self):
+        data_model = make_data_model(100, depth=2, width=3)
+        paths = concept_paths(data_model)
+        self.assertEqual(paths[0], ["Model", "dataset"])
+        self.assertEqual(
+            {tuple(path[1:-1]) for path in paths[1:]},
+            {(f"group{a}", f"group{a}_{b}") for a in range(3) for b in range(3)},
+        )
+        # Fewer CDEs than groups
+        small = make_data_model(3, depth=2, width=3)
+        self.assertEqual(len(concept_paths(small)), 3)
+        validate_json(small, None)
+
+    def test_type_mix(self):
+        data_model = make_data_model(
+            401, depth=0, type_mix={"nominal": 1, "real": 0, "integer": 0, "text": 1}
+        )
+        types = Counter(cde["type"] for cde in data_model["variables"][1:])
+        self.assertEqual(set(types), {"nominal", "text"})
+        self.assertEqual(sum(types.values()), 400)
+
+    def test_workbook_matches_the_data_model(self):
+        data_model = make_data_model(200, depth=2, width=3, seed=1)
+        workbook = BytesIO()
+        make_workbook(data_model, workbook)
+        converted = json.loads(workloads.convert_workbook(workbook))
+        self.assertEqual(count_common_data_elements(converted), 200)
+        self.assertEqual(concept_paths(converted), concept_paths(data_model))
+
+
+class TestSuite(unittest.TestCase):
+    def test_run(self):
+        results = run([50], 1, {"depth": 1, "width": 5}, log=lambda line: None)
+        self.assertEqual(len(results), 9)
+        self.assertEqual(results["POST /excel-to-json [50]"]["cdes"], 50)
+        self.assertEqual(len(results["validate_json [50]"]["runs"]), 1)
+
+    def test_compare(self):
+        def results(**times):
+            return {
+                "options": {"seed": 0},
+                "benchmarks": {name: {"min": time} for name, time in times.items()},
+            }
+
+        lines, regressions = compare(
+            results(slower=1.0, fast=0.001, same=1.0),
+            results(slower=1.5, fast=0.002, same=1.1, added=1.0),
+            threshold=1.25,
+        )
+        self.assertEqual(regressions, ["slower"])
+        self.assertIn("slower: 1000.0 ms -> 1500.0 ms, x1.50 REGRESSION", lines)
+        self.assertIn("added: new, 1000.0 ms", lines)
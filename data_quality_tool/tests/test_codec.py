@@ -0,0 +1,86 @@
+import gzip
+import json
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+import codec
+from controller import app
+
+
+class TestCodec(unittest.TestCase):
+    data = {"code": "model", "label": "Modèle", "variables": [{"minValue": 0.5}]}
+
+    def check_codec(self):
+        compact = codec.dumps(self.data)
+        self.assertIsInstance(compact, bytes)
+        self.assertNotIn(b" ", compact.replace(b"Mod\xc3\xa8le", b""))
+        self.assertEqual(codec.loads(compact), self.data)
+        pretty = codec.dumps(self.data, pretty=True)
+        self.assertIn(b'\n  "code": "model"', pretty)
+        self.assertEqual(json.loads(pretty), self.data)
+        # Beyond what orjson supports
+        self.assertEqual(codec.dumps({"big": 2**70}), b'{"big":1180591620717411303424}')
+        self.assertEqual(codec.dumps({1: "a"}), b'{"1":"a"}')
+        self.assertTrue(codec.loads("[NaN]")[0] != codec.loads("[NaN]")[0])
+        with self.assertRaises(ValueError):
+            codec.loads("{not json")
+        self.assertEqual(
+            codec.dumps({"b": {"d": 1, "c": 2}, "a": "é"}, sort_keys=True),
+            '{"a":"é","b":{"c":2,"d":1}}'.encode(),
+        )
+
+    def test_codec(self):
+        self.check_codec()
+
+    def test_standard_library_codec(self):
+        with patch.object(codec, "orjson", None):
+            self.check_codec()
+
+    def test_default(self):
+        self.assertEqual(codec.dumps({"set": {1}}, default=list), b'{"set":[1]}')
+
+
+class TestResponses(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            self.workbook = file.read()
+
+    def excel_to_json(self, query="", **headers):
+        return self.client.post(
+            "/excel-to-json" + query,
+            data={"file": (BytesIO(self.workbook), "model.xlsx")},
+            content_type="multipart/form-data",
+            headers=headers,
+        )
+
+    def test_compact_by_default(self):
+        response = self.excel_to_json()
+        self.assertNotIn(b"\n", response.data)
+        pretty = self.excel_to_json("?pretty")
+        self.assertIn(b'\n  "code"', pretty.data)
+        self.assertEqual(response.json, pretty.json)
+
+    def test_gzip(self):
+        with patch.dict(app.config, GZIP_MIN_SIZE=100):
+            response = self.excel_to_json(**{"Accept-Encoding": "gzip, deflate"})
+            plain = self.excel_to_json()
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertNotIn("Content-Encoding", plain.headers)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_excel_is_not_compressed(self):
+        with open("MinimalDataModelExample.json") as file:
+            data_model = json.load(file)
+        with patch.dict(app.config, GZIP_MIN_SIZE=1):
+            response = self.client.post(
+                "/json-to-excel", json=data_model, headers={"Accept-Encoding": "gzip"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Content-Encoding", response.headers)
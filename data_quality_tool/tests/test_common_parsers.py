@@ -0,0 +1,95 @@
+import unittest
+
+from common_entities import InvalidDataModelError
+from common_parsers import parse_cache_info, parse_enumerations, parse_values
+
+
+class TestParseEnumerations(unittest.TestCase):
+    def test_valid_input(self):
+        self.assertEqual(
+            parse_enumerations('{"code1", "label1"}, {"code2", "label2"}'),
+            (("code1", "label1"), ("code2", "label2")),
+        )
+
+    def test_whitespace_is_optional(self):
+        self.assertEqual(
+            parse_enumerations(' { "code1" ,"label1" },{"code2","label2"} '),
+            (("code1", "label1"), ("code2", "label2")),
+        )
+
+    def test_label_with_quoted_comma(self):
+        self.assertEqual(
+            parse_enumerations('{"code1", "yes\\",\\"no"}'),
+            (("code1", 'yes","no'),),
+        )
+
+    def test_escaped_characters(self):
+        self.assertEqual(
+            parse_enumerations('{"code1", "label with \\"escaped quotes\\""}'),
+            (("code1", 'label with "escaped quotes"'),),
+        )
+
+    def test_malformed_inputs(self):
+        for values in [
+            "",
+            "Not a valid format at all",
+            '{"code1" "label1"}',
+            '{"code1": "label1"}',
+            '{"code1", "label1", "extra"}',
+            '{"code1", "label1"},',
+            '{"code1", "label1"} {"code2", "label2"}',
+            '{"", "label1"}',
+            '{"code1", "label1"',
+        ]:
+            with self.subTest(values=values):
+                with self.assertRaises(InvalidDataModelError) as context:
+                    parse_enumerations(values)
+                self.assertIn("Nominal values format error", str(context.exception))
+
+    def test_duplicate_codes(self):
+        with self.assertRaises(InvalidDataModelError) as context:
+            parse_enumerations('{"code1", "label1"}, {"code1", "label2"}')
+        self.assertEqual(
+            "Duplicate codes found in enumeration values codes=['code1', 'code1'].",
+            str(context.exception),
+        )
+
+
+class TestParseValues(unittest.TestCase):
+    def setUp(self):
+        parse_values.cache_clear()
+
+    def test_parse_by_type(self):
+        self.assertEqual(
+            parse_values('{"y", "Yes"}, {"n", "No"}', "nominal"),
+            (("y", "Yes"), ("n", "No")),
+        )
+        self.assertEqual(parse_values("-10-100", "integer"), (-10.0, 100.0))
+        self.assertEqual(parse_values("0.5 - 1.5", "real"), (0.5, 1.5))
+        self.assertIsNone(parse_values("anything", "text"))
+
+    def test_invalid_range(self):
+        for values in ["10", "a-b", "-10", "nan-5", "0-nan", "0-inf", "-inf-0"]:
+            with self.subTest(values=values):
+                with self.assertRaises(InvalidDataModelError) as context:
+                    parse_values(values, "real")
+                self.assertEqual(
+                    f"Values must match format '<float or integer>-<float or integer>' but got '{values}'.",
+                    str(context.exception),
+                )
+
+    def test_results_are_cached_per_values_and_type(self):
+        first = parse_values('{"y", "Yes"}, {"n", "No"}', "nominal")
+        second = parse_values('{"y", "Yes"}, {"n", "No"}', "nominal")
+        parse_values("1-2", "real")
+        parse_values("1-2", "integer")
+        self.assertIs(first, second)
+        info = parse_cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (1, 3))
+        self.assertEqual(info["currsize"], 3)
+
+    def test_invalid_values_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(InvalidDataModelError):
+                parse_values("a-b", "real")
+        self.assertEqual(parse_cache_info()["currsize"], 0)
@@ -1,11 +1,16 @@
 import json
+import os
 import unittest
 from io import BytesIO
 
 import pandas as pd
+from flask import request
+from openpyxl import load_workbook
 
 from data_quality_tool.common_entities import EXCEL_COLUMNS
 from controller import app
+from uploads import upload_path
+from validator.excel_validator import validate_excel
 
 
 class TestController(unittest.TestCase):
@@ -233,6 +238,289 @@ class TestController(unittest.TestCase):
             response_data = response.json
             self.assertIn("error", response_data)
             self.assertEqual(
-                "On :dataset got: Missing value for required column 'name'.",
+                "Row 2: On :dataset got: Missing value for required column 'name'.",
                 response_data["error"],
             )
+            self.assertEqual(
+                [
+                    {
+                        "row": 2,
+                        "code": "dataset",
+                        "error": "On :dataset got: Missing value for required column 'name'.",
+                    }
+                ],
+                response_data["errors"],
+            )
+
+
+class TestValidateJsonBatch(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.testing = True
+        self.client = self.app.test_client()
+        with open("MinimalDataModelExample.json", "r") as file:
+            self.valid = json.load(file)
+        self.invalid = {**self.valid, "code": ""}
+
+    def tearDown(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = None
+
+    def results(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        results = [json.loads(line) for line in response.data.decode().splitlines()]
+        return sorted(results, key=lambda result: result["index"])
+
+    def assert_results(self, results):
+        self.assertEqual(
+            results,
+            [
+                {"index": 0, "valid": True, "message": "Data model is valid."},
+                {
+                    "index": 1,
+                    "valid": False,
+                    "error": "'code' in DataModel must be a non-empty string. Current value: ''.",
+                },
+                {
+                    "index": 2,
+                    "valid": False,
+                    "error": "Data model must be a JSON object.",
+                },
+            ],
+        )
+
+    def test_json_array(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 0
+        response = self.client.post(
+            "/validate-json/batch", json=[self.valid, self.invalid, 5]
+        )
+        self.assert_results(self.results(response))
+
+    def test_ndjson_in_a_process_pool(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 2
+        body = "\n".join(json.dumps(item) for item in [self.valid, self.invalid, 5])
+        response = self.client.post(
+            "/validate-json/batch",
+            data=body + "\n\n{not json\n",
+            content_type="application/x-ndjson",
+        )
+        results = self.results(response)
+        self.assert_results(results[:3])
+        self.assertEqual(results[3]["index"], 3)
+        self.assertFalse(results[3]["valid"])
+        self.assertTrue(results[3]["error"].startswith("Invalid JSON: "))
+
+    def test_no_array(self):
+        response = self.client.post("/validate-json/batch", json=self.valid)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json,
+            {"error": "A JSON array or an NDJSON stream of data models is expected."},
+        )
+
+
+class TestOffloadedRequests(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.testing = True
+        self.client = self.app.test_client()
+        self.app.config["PROCESS_POOL_WORKERS"] = 2
+        self.app.config["OFFLOAD_MIN_BYTES"] = 0
+        with open("MinimalDataModelExample.json", "rb") as file:
+            self.data_model = file.read()
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            self.workbook = file.read()
+
+    def tearDown(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = None
+        self.app.config["OFFLOAD_MIN_BYTES"] = 256 * 1024
+
+    def post(self, path, **kwargs):
+        response = self.client.post(path, **kwargs)
+        stages = [
+            timing.split(";")[0]
+            for timing in response.headers["Server-Timing"].split(", ")
+        ]
+        return response, stages
+
+    def test_excel_to_json(self):
+        def convert():
+            return self.post(
+                "/excel-to-json",
+                content_type="multipart/form-data",
+                data={"file": (BytesIO(self.workbook), "MinimalDataModelExample.xlsx")},
+            )
+
+        response, stages = convert()
+        self.assertEqual(response.status_code, 200)
+        # The stages timed in the worker process follow the offload stage including them.
+        self.assertEqual(
+            stages,
+            ["read", "offload", "parse", "convert", "serialize", "compress", "total"],
+        )
+        self.app.config["OFFLOAD_MIN_BYTES"] = len(self.workbook) * 2
+        inline_response, inline_stages = convert()
+        self.assertNotIn("offload", inline_stages)
+        self.assertEqual(response.data, inline_response.data)
+
+    def test_validate_excel_errors(self):
+        with open("MinimalDataModelError.xlsx", "rb") as file:
+            data = {"file": (file, "MinimalDataModelError.xlsx")}
+            response, stages = self.post(
+                "/validate-excel", content_type="multipart/form-data", data=data
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["errors"][0]["code"], "dataset")
+        self.assertIn("offload", stages)
+
+    def test_validate_json(self):
+        response, stages = self.post(
+            "/validate-json", data=self.data_model, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"message": "Data model is valid."})
+        # The body is only parsed in the worker process.
+        self.assertEqual(stages, ["offload", "parse", "validate", "compress", "total"])
+
+        response, _ = self.post(
+            "/validate-json", data=b"{not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"error": "No JSON provided"})
+
+        invalid = {**json.loads(self.data_model), "code": ""}
+        response, _ = self.post("/validate-json", json=invalid)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json["error"],
+            "'code' in DataModel must be a non-empty string. Current value: ''.",
+        )
+
+    def test_json_to_excel(self):
+        response, stages = self.post(
+            "/json-to-excel", data=self.data_model, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("write", stages)
+        self.assertIn("offload", stages)
+        df = pd.read_excel(BytesIO(response.data))
+        self.assertIn("dataset", set(df["code"]))
+        response.close()
+
+        response, _ = self.post(
+            "/json-to-excel", data=b"[]", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"error": "No JSON provided"})
+
+    def test_caches_of_the_pool_are_counted(self):
+        def counters():
+            text = self.client.get("/metrics").get_data(as_text=True)
+            return {
+                line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+                for line in text.splitlines()
+                if line.startswith(
+                    ("dqt_values_parse_cache{", "dqt_validated_subtrees{")
+                )
+            }
+
+        before = counters()
+        self.post(
+            "/validate-json", data=self.data_model, content_type="application/json"
+        )
+        self.post(
+            "/validate-excel",
+            content_type="multipart/form-data",
+            data={"file": (BytesIO(self.workbook), "MinimalDataModelExample.xlsx")},
+        )
+        after = counters()
+        for cache in ("dqt_values_parse_cache", "dqt_validated_subtrees"):
+            lookups = [f'{cache}{{value="{name}"}}' for name in ("hits", "misses")]
+            self.assertGreater(
+                sum(after[name] for name in lookups),
+                sum(before[name] for name in lookups),
+            )
+
+
+class TestUploads(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.testing = True
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.config.update(
+            MAX_CONTENT_LENGTH=100 * 1024 * 1024,
+            EXCEL_MAX_ROWS=200_000,
+            EXCEL_MAX_COLUMNS=64,
+        )
+
+    def post_workbook(self, path):
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            data = {"file": (file, "MinimalDataModelExample.xlsx")}
+            return self.client.post(path, content_type="multipart/form-data", data=data)
+
+    def test_spooled_to_a_file_deleted_with_the_request(self):
+        with self.app.test_request_context(
+            "/validate-excel",
+            method="POST",
+            data={"file": (BytesIO(b"workbook"), "model.xlsx")},
+        ):
+            path = upload_path(request.files["file"])
+            with open(path, "rb") as spooled:
+                self.assertEqual(spooled.read(), b"workbook")
+        self.assertFalse(os.path.exists(path))
+
+    def test_request_too_large(self):
+        self.app.config["MAX_CONTENT_LENGTH"] = 1024
+        response = self.post_workbook("/excel-to-json")
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json, {"error": "Request body too large."})
+
+    def test_too_many_rows(self):
+        self.app.config["EXCEL_MAX_ROWS"] = 2
+        for path in ("/excel-to-json", "/validate-excel"):
+            response = self.post_workbook(path)
+            self.assertEqual(response.status_code, 413)
+            self.assertEqual(
+                response.json,
+                {"error": "The workbook has 3 data rows, at most 2 are allowed."},
+            )
+
+    def workbook(self, edit):
+        # MinimalDataModelExample.xlsx edited by edit(sheet)
+        workbook = load_workbook("MinimalDataModelExample.xlsx")
+        edit(workbook.worksheets[0])
+        output = BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+
+    def post(self, path, workbook):
+        data = {"file": (BytesIO(workbook), "model.xlsx")}
+        return self.client.post(path, content_type="multipart/form-data", data=data)
+
+    def test_blank_rows_are_skipped(self):
+        workbook = self.workbook(lambda sheet: sheet.insert_rows(3))
+        validate_excel(pd.read_excel(BytesIO(workbook)))
+        for path in ("/excel-to-json", "/validate-excel"):
+            self.assertEqual(self.post(path, workbook).status_code, 200)
+
+    def test_invalid_rows(self):
+        def clear_concept_path(sheet):
+            header = [cell.value for cell in sheet[1]]
+            sheet.cell(row=3, column=header.index("conceptPath") + 1).value = None
+
+        workbook = self.workbook(clear_concept_path)
+        for path in ("/excel-to-json", "/validate-excel"):
+            response = self.post(path, workbook)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual([error["row"] for error in response.json["errors"]], [3])
+
+    def test_too_many_columns(self):
+        self.app.config["EXCEL_MAX_COLUMNS"] = 10
+        response = self.post_workbook("/validate-excel")
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(
+            response.json,
+            {"error": "The workbook has 11 columns, at most 10 are allowed."},
+        )
@@ -0,0 +1,144 @@
+import os
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import Flask, g
+
+import metrics
+from common_entities import InvalidExcelRowsError
+from executors import (
+    WorkloadTimeoutError,
+    get_process_pool,
+    map_unordered,
+    process_pool_size,
+    run_workload,
+)
+
+
+def square(number):
+    if number < 0:
+        raise ValueError(number)
+    return number * number
+
+
+def timed_square(number):
+    with metrics.stage("square"):
+        if number < 0:
+            raise InvalidExcelRowsError([{"row": 2, "code": "x", "error": "Negative."}])
+        return number * number
+
+
+class TestMapUnordered(unittest.TestCase):
+    def test_inline(self):
+        results = list(map_unordered(None, square, [1, -1, 3]))
+        self.assertEqual([index for index, _ in results], [0, 1, 2])
+        self.assertEqual(results[0][1], 1)
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertEqual(results[2][1], 9)
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            pool.max_workers = 2
+            results = dict(map_unordered(pool, square, iter(range(-1, 20))))
+        self.assertIsInstance(results.pop(0), ValueError)
+        self.assertEqual(results, {index: (index - 1) ** 2 for index in range(1, 21)})
+
+    def test_empty(self):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.max_workers = 1
+            self.assertEqual(list(map_unordered(pool, square, [])), [])
+
+
+class TestGetProcessPool(unittest.TestCase):
+    def test_configuration(self):
+        app = Flask(__name__)
+        app.config["PROCESS_POOL_WORKERS"] = 0
+        self.assertIsNone(get_process_pool(app))
+
+        app.config["PROCESS_POOL_WORKERS"] = "2"
+        pool = get_process_pool(app)
+        try:
+            self.assertEqual(pool.max_workers, 2)
+            self.assertIs(get_process_pool(app), pool)
+        finally:
+            pool.shutdown()
+
+        app.config["PROCESS_POOL_WORKERS"] = None
+        self.assertGreaterEqual(process_pool_size(app), 1)
+
+    def test_processes_are_not_forked_from_the_worker(self):
+        app = Flask(__name__)
+        app.config["PROCESS_POOL_WORKERS"] = 1
+        pool = get_process_pool(app)
+        try:
+            self.assertIn(pool._mp_context.get_start_method(), ("forkserver", "spawn"))
+        finally:
+            pool.shutdown()
+
+    def test_created_once_by_concurrent_threads(self):
+        app = Flask(__name__)
+        app.config["PROCESS_POOL_WORKERS"] = 1
+        with ThreadPoolExecutor(max_workers=8) as threads:
+            pools = set(threads.map(lambda _: get_process_pool(app), range(32)))
+        self.assertEqual(len(pools), 1)
+        pools.pop().shutdown()
+
+
+class TestRunWorkload(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def run_in_request(self, *args, offload=True):
+        with self.app.test_request_context():
+            metrics.start_request()
+            try:
+                return run_workload(timed_square, *args, offload=offload)
+            finally:
+                self.stages = [name for name, _ in g.metrics["stages"]]
+
+    def test_inline(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 2
+        self.assertEqual(self.run_in_request(3, offload=False), 9)
+        self.assertEqual(self.stages, ["square"])
+        self.assertNotIn("process_pool", self.app.extensions)
+
+    def test_process_pool(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 1
+        try:
+            self.assertEqual(self.run_in_request(3), 9)
+            self.assertEqual(self.stages, ["offload", "square"])
+
+            with self.assertRaises(InvalidExcelRowsError) as context:
+                self.run_in_request(-1)
+            self.assertEqual(context.exception.errors[0]["row"], 2)
+            self.assertEqual(str(context.exception), "Row 2: Negative.")
+        finally:
+            self.app.extensions["process_pool"].shutdown()
+
+    def test_broken_pool_is_replaced(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 1
+        with self.app.app_context():
+            try:
+                with self.assertRaises(BrokenProcessPool):
+                    run_workload(os._exit, 1)
+                self.assertEqual(run_workload(sum, [1, 2]), 3)
+            finally:
+                self.app.extensions["process_pool"].shutdown()
+
+    def test_timeout(self):
+        self.app.config["PROCESS_POOL_WORKERS"] = 1
+        with self.app.app_context():
+            try:
+                # Once the pool process is started
+                run_workload(sum, [1, 2])
+                self.app.config["PROCESS_POOL_TIMEOUT"] = 0.5
+                start = time.perf_counter()
+                with self.assertRaises(WorkloadTimeoutError):
+                    run_workload(time.sleep, 30)
+                self.assertLess(time.perf_counter() - start, 10)
+                self.app.config["PROCESS_POOL_TIMEOUT"] = None
+                self.assertEqual(run_workload(sum, [1, 2]), 3)
+            finally:
+                self.app.extensions["process_pool"].shutdown()
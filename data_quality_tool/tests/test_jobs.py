@@ -0,0 +1,179 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+import jobs
+from admission import get_gate
+from controller import app
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = patch.dict(
+            app.config, JOBS_DIR=self.directory.name, PROCESS_POOL_WORKERS=0
+        )
+        self.config.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        jobs.get_job_runner(app).shutdown(wait=True)
+        app.extensions.pop("job_runner")
+        self.config.stop()
+        self.directory.cleanup()
+
+    def submit(self, workbook="MinimalDataModelExample.xlsx", query=""):
+        with open(workbook, "rb") as file:
+            return self.client.post(
+                "/jobs/excel-to-json" + query,
+                content_type="multipart/form-data",
+                data={"file": (BytesIO(file.read()), "model.xlsx")},
+            )
+
+    def wait(self, response):
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(response.headers["Location"] + "?wait=10").json
+
+    def test_conversion(self):
+        response = self.submit()
+        # The job may have started, or even finished, by the time it is returned.
+        self.assertIn(response.json["status"], ("queued", "running", "succeeded"))
+        job_id = response.json["id"]
+        self.assertEqual(response.headers["Location"], f"/jobs/{job_id}")
+
+        job = self.wait(response)
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["result"], f"/jobs/{job_id}/result")
+        self.assertIn("finished", job)
+
+        result = self.client.get(job["result"])
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            expected = self.client.post(
+                "/excel-to-json",
+                content_type="multipart/form-data",
+                data={"file": (file, "model.xlsx")},
+            )
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json, expected.json)
+        # The kept upload is deleted once converted.
+        self.assertFalse(os.path.exists(jobs.get_job_store(app).input_path(job_id)))
+
+    def test_conversion_in_the_process_pool(self):
+        with patch.dict(app.config, PROCESS_POOL_WORKERS=2):
+            job = self.wait(self.submit(query="?pretty"))
+        self.assertEqual(job["status"], "succeeded")
+        self.assertIn(b'\n  "code"', self.client.get(job["result"]).data)
+
+    def test_invalid_workbook(self):
+        job = self.wait(self.submit("MinimalDataModelError.xlsx"))
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["errors"][0]["code"], "dataset")
+        result = self.client.get(f"/jobs/{job['id']}/result")
+        self.assertEqual(result.status_code, 400)
+        self.assertEqual(result.json["errors"], job["errors"])
+
+    def test_not_finished(self):
+        started, proceed = threading.Event(), threading.Event()
+
+        def blocked(*args, **kwargs):
+            started.set()
+            proceed.wait(5)
+            return b"{}"
+
+        with patch.object(jobs, "run_workload", blocked):
+            response = self.submit()
+            job_id = response.json["id"]
+            self.assertTrue(started.wait(5))
+            start = time.monotonic()
+            job = self.client.get(f"/jobs/{job_id}?wait=0.3").json
+            self.assertGreaterEqual(time.monotonic() - start, 0.3)
+            self.assertEqual(job["status"], "running")
+            result = self.client.get(f"/jobs/{job_id}/result")
+            self.assertEqual(result.status_code, 409)
+            self.assertEqual(
+                result.json, {"error": "Job not finished", "status": "running"}
+            )
+            with patch.dict(app.config, JOBS_MAX_PENDING=1):
+                rejected = self.submit()
+            self.assertEqual(rejected.status_code, 503)
+            self.assertIn("Retry-After", rejected.headers)
+
+            # Polls beyond the budget are answered at once.
+            poll = get_gate("poll", app)
+            for _ in range(poll.concurrency):
+                self.assertTrue(poll.enter())
+            try:
+                start = time.monotonic()
+                job = self.client.get(f"/jobs/{job_id}?wait=10").json
+                self.assertLess(time.monotonic() - start, 5)
+                self.assertEqual(job["status"], "running")
+            finally:
+                for _ in range(poll.concurrency):
+                    poll.leave()
+            proceed.set()
+        self.assertEqual(self.wait(response)["status"], "succeeded")
+
+    def test_unknown_and_expired_jobs(self):
+        self.assertEqual(self.client.get("/jobs/not-an-id").status_code, 404)
+        self.assertEqual(self.client.get(f"/jobs/{'0' * 32}").status_code, 404)
+        self.assertEqual(self.client.get(f"/jobs/{'0' * 32}/result").status_code, 404)
+        for wait in ("x", "nan", "inf", "-inf"):
+            response = self.client.get(f"/jobs/{'0' * 32}?wait={wait}")
+            self.assertEqual(response.status_code, 400)
+
+        job = self.wait(self.submit())
+        store = jobs.get_job_store(app)
+        with patch.object(store, "ttl", 0):
+            self.assertEqual(self.client.get(f"/jobs/{job['id']}").status_code, 404)
+            self.assertEqual(store.stats()["succeeded"], 0)
+
+    def test_no_file(self):
+        response = self.client.post(
+            "/jobs/excel-to-json", content_type="multipart/form-data", data={}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStaleJobs(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = jobs.JobStore(self.directory.name, ttl=60, stale_after=0.3)
+        self.job_id = "1" * 32
+        self.store.create(self.job_id)
+        self.store.start(self.job_id)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_jobs_of_stopped_workers_fail(self):
+        self.assertEqual(self.store.pending(), 1)
+        time.sleep(0.4)
+        job = self.store.get(self.job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], jobs.STALE_ERROR)
+        self.assertEqual(self.store.pending(), 0)
+
+    def test_heartbeat(self):
+        for _ in range(4):
+            time.sleep(0.1)
+            self.store.touch([self.job_id])
+        self.assertEqual(self.store.get(self.job_id)["status"], "running")
+        self.store.succeed(self.job_id, b"{}")
+        time.sleep(0.4)
+        self.assertEqual(self.store.get(self.job_id)["status"], "succeeded")
+
+    def test_running_jobs_are_updated(self):
+        with patch.dict(app.config, JOBS_HEARTBEAT=0.05):
+            runner = jobs.get_job_runner(app)
+        runner.jobs[self.job_id] = self.store
+        try:
+            time.sleep(0.5)
+            self.assertEqual(self.store.get(self.job_id)["status"], "running")
+        finally:
+            runner.jobs.clear()
+            runner.shutdown()
+            app.extensions.pop("job_runner")
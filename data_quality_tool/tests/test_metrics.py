@@ -0,0 +1,108 @@
+import json
+import time
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+import metrics
+from controller import app
+from metrics import Histogram
+from uploads import SpooledUploadRequest
+
+
+class TestHistogram(unittest.TestCase):
+    def test_render(self):
+        histogram = Histogram("test_seconds", "A test.", ("endpoint",), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, endpoint="/a")
+        histogram.observe(1, endpoint='/"b"')
+        self.assertEqual(
+            histogram.render(),
+            [
+                "# HELP test_seconds A test.",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{endpoint="/\\"b\\"",le="0.1"} 0',
+                'test_seconds_bucket{endpoint="/\\"b\\"",le="1"} 1',
+                'test_seconds_bucket{endpoint="/\\"b\\"",le="+Inf"} 1',
+                'test_seconds_count{endpoint="/\\"b\\""} 1',
+                'test_seconds_sum{endpoint="/\\"b\\""} 1',
+                'test_seconds_bucket{endpoint="/a",le="0.1"} 2',
+                'test_seconds_bucket{endpoint="/a",le="1"} 3',
+                'test_seconds_bucket{endpoint="/a",le="+Inf"} 4',
+                'test_seconds_count{endpoint="/a"} 4',
+                'test_seconds_sum{endpoint="/a"} 5.65',
+            ],
+        )
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        self.client = app.test_client()
+        with open("MinimalDataModelExample.json", "r") as file:
+            self.data_model = json.load(file)
+
+    def stages(self, response):
+        return [
+            timing.split(";")[0]
+            for timing in response.headers["Server-Timing"].split(", ")
+        ]
+
+    def test_server_timing(self):
+        response = self.client.post("/validate-json", json=self.data_model)
+        self.assertEqual(
+            self.stages(response), ["parse", "validate", "compress", "total"]
+        )
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            response = self.client.post(
+                "/excel-to-json",
+                data={"file": (BytesIO(file.read()), "model.xlsx")},
+                content_type="multipart/form-data",
+            )
+        self.assertEqual(
+            self.stages(response),
+            ["read", "parse", "convert", "serialize", "compress", "total"],
+        )
+
+    def test_read_stage_times_the_spooling_of_the_upload(self):
+        spool = SpooledUploadRequest._get_file_stream
+
+        def slow_spool(*args, **kwargs):
+            time.sleep(0.05)
+            return spool(*args, **kwargs)
+
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            workbook = file.read()
+        with patch.object(SpooledUploadRequest, "_get_file_stream", slow_spool):
+            response = self.client.post(
+                "/validate-excel",
+                data={"file": (BytesIO(workbook), "model.xlsx")},
+                content_type="multipart/form-data",
+            )
+        timings = dict(
+            timing.split(";dur=")
+            for timing in response.headers["Server-Timing"].split(", ")
+        )
+        self.assertEqual(self.stages(response).count("read"), 1)
+        self.assertGreaterEqual(float(timings["read"]), 50)
+
+    def test_metrics_endpoint(self):
+        self.client.post("/validate-json", json=self.data_model)
+        self.client.post("/validate-json", json={**self.data_model, "code": ""})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.mimetype, "text/plain")
+        text = response.get_data(as_text=True)
+        for line in [
+            'dqt_request_duration_seconds_count{endpoint="/validate-json",outcome="success"} 1',
+            'dqt_request_duration_seconds_count{endpoint="/validate-json",outcome="invalid"} 1',
+            'dqt_request_stage_duration_seconds_count{endpoint="/validate-json",stage="validate",outcome="success"} 1',
+            'dqt_data_model_cdes_bucket{endpoint="/validate-json",outcome="success",le="10"} 1',
+            'dqt_validated_subtrees{value="max_entries"} 65536',
+        ]:
+            self.assertIn(line, text)
+        self.assertIn(
+            'dqt_payload_size_bytes_count{endpoint="/validate-json",direction="request",outcome="success"} 1',
+            text,
+        )
+        self.assertIn('dqt_values_parse_cache{value="hits"}', text)
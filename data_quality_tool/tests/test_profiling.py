@@ -0,0 +1,138 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from controller import app
+from profiling import rotate_profiles
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = patch.dict(
+            app.config,
+            PROFILING_ENABLED=True,
+            PROFILE_DIR=self.directory.name,
+            PROFILE_MAX_FILES=2,
+            ADMIN_TOKEN="secret",
+        )
+        self.config.start()
+        self.client = app.test_client()
+        self.admin = {"Authorization": "Bearer secret"}
+        with open("MinimalDataModelExample.json", "r") as file:
+            self.data_model = json.load(file)
+
+    def tearDown(self):
+        self.config.stop()
+        self.directory.cleanup()
+
+    def test_profiled_request(self):
+        response = self.client.post(
+            "/validate-json", json=self.data_model, headers={"X-Profile": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        profile_id = response.headers["X-Profile-Id"]
+
+        profiles = self.client.get("/admin/profiles", headers=self.admin).json
+        self.assertEqual(
+            [profile["id"] for profile in profiles["profiles"]], [profile_id]
+        )
+
+        download = self.client.get(f"/admin/profiles/{profile_id}", headers=self.admin)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(
+            download.data,
+            open(os.path.join(self.directory.name, f"{profile_id}.prof"), "rb").read(),
+        )
+        download.close()
+
+        summary = self.client.get(
+            f"/admin/profiles/{profile_id}?format=text", headers=self.admin
+        )
+        self.assertIn("validate_json", summary.get_data(as_text=True))
+
+    def test_offloaded_work_runs_in_the_profiled_thread(self):
+        with patch.dict(app.config, PROCESS_POOL_WORKERS=2, OFFLOAD_MIN_BYTES=0):
+            with open("MinimalDataModelExample.xlsx", "rb") as file:
+                response = self.client.post(
+                    "/excel-to-json",
+                    content_type="multipart/form-data",
+                    data={"file": (file, "MinimalDataModelExample.xlsx")},
+                    headers={"X-Profile": "1"},
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("offload", response.headers["Server-Timing"])
+        stats = pstats.Stats(
+            os.path.join(
+                self.directory.name, f"{response.headers['X-Profile-Id']}.prof"
+            )
+        )
+        functions = {function for _, _, function in stats.stats}
+        self.assertIn("import_excel_rows", functions)
+        self.assertIn("validate_variable", functions)
+
+    def test_query_flag(self):
+        response = self.client.post("/validate-json?profile", json=self.data_model)
+        self.assertIn("X-Profile-Id", response.headers)
+
+    def test_not_requested_or_disabled(self):
+        response = self.client.post("/validate-json", json=self.data_model)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        app.config["PROFILING_ENABLED"] = False
+        response = self.client.post(
+            "/validate-json", json=self.data_model, headers={"X-Profile": "1"}
+        )
+        self.assertNotIn("X-Profile-Id", response.headers)
+
+    def test_profiles_are_rotated(self):
+        ids = []
+        for _ in range(3):
+            response = self.client.post(
+                "/validate-json", json=self.data_model, headers={"X-Profile": "1"}
+            )
+            ids.append(response.headers["X-Profile-Id"])
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+        self.assertNotIn(f"{ids[0]}.prof", os.listdir(self.directory.name))
+
+    def test_rotate_profiles(self):
+        for index, name in enumerate(["a" * 32, "b" * 32, "c" * 32]):
+            path = os.path.join(self.directory.name, f"{name}.prof")
+            open(path, "w").close()
+            os.utime(path, (index, index))
+        open(os.path.join(self.directory.name, "notes.txt"), "w").close()
+        rotate_profiles(self.directory.name, 1)
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)), ["c" * 32 + ".prof", "notes.txt"]
+        )
+
+    def test_admin_endpoints_require_the_token(self):
+        for headers in [{}, {"Authorization": "Bearer wrong"}]:
+            response = self.client.get("/admin/profiles", headers=headers)
+            self.assertEqual(response.status_code, 401)
+        app.config["ADMIN_TOKEN"] = None
+        response = self.client.get(
+            "/admin/profiles", headers={"Authorization": "Bearer "}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_profiles(self):
+        for profile_id in ["0" * 32, "..%2F..%2Fetc%2Fpasswd"]:
+            response = self.client.get(
+                f"/admin/profiles/{profile_id}", headers=self.admin
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_profiled_requests_bypass_the_result_cache(self):
+        app.config["RESULT_CACHE_PATH"] = os.path.join(self.directory.name, "cache")
+        try:
+            for _ in range(2):
+                response = self.client.post(
+                    "/validate-json", json=self.data_model, headers={"X-Profile": "1"}
+                )
+                self.assertIn("X-Profile-Id", response.headers)
+            self.assertEqual(self.client.get("/cache-stats").json["hits"], 0)
+        finally:
+            app.config["RESULT_CACHE_PATH"] = None
@@ -0,0 +1,186 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from admission import AdmissionGate
+from controller import app
+from result_cache import ResultCache
+from uploads import SpooledUploadRequest
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite3")
+        self.cache = ResultCache(self.path, max_bytes=1000, ttl=60)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_and_put(self):
+        key = ResultCache.key("endpoint", b"payload")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, 200, [("Content-Type", "application/json")], b"{}")
+        self.assertEqual(
+            self.cache.get(key), (200, [["Content-Type", "application/json"]], b"{}")
+        )
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        self.assertEqual((stats["entries"], stats["size_bytes"]), (1, 2))
+
+    def test_cache_is_shared_through_the_file(self):
+        key = ResultCache.key("endpoint", b"payload")
+        self.cache.put(key, 400, [], b"error")
+        other = ResultCache(self.path, max_bytes=1000, ttl=60)
+        self.assertEqual(other.get(key), (400, [], b"error"))
+
+    def test_keys_depend_on_endpoint_and_payload(self):
+        keys = {
+            ResultCache.key("a", b"payload"),
+            ResultCache.key("b", b"payload"),
+            ResultCache.key("a", b"other payload"),
+        }
+        self.assertEqual(len(keys), 3)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in ["a", "b", "c"]:
+            self.cache.put(name, 200, [], b"x" * 400)
+            time.sleep(0.01)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_expired_entries_are_not_returned(self):
+        cache = ResultCache(self.path, max_bytes=1000, ttl=0)
+        cache.put("a", 200, [], b"x")
+        self.assertIsNone(cache.get("a"))
+
+
+class TestCachedEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        app.testing = True
+        app.config["RESULT_CACHE_PATH"] = os.path.join(
+            self.directory.name, "cache.sqlite3"
+        )
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config["RESULT_CACHE_PATH"] = None
+        self.directory.cleanup()
+
+    def test_validate_json_is_cached(self):
+        with open("MinimalDataModelExample.json", "r") as file:
+            json_data = json.load(file)
+        for _ in range(2):
+            response = self.client.post("/validate-json", json=json_data)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {"message": "Data model is valid."})
+        stats = self.client.get("/cache-stats").json
+        self.assertTrue(stats["enabled"])
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_json_to_excel_is_cached(self):
+        with open("MinimalDataModelExample.json", "r") as file:
+            json_data = json.load(file)
+        first = self.client.post("/json-to-excel", json=json_data)
+        second = self.client.post("/json-to-excel", json=json_data)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(
+            first.headers["Content-Disposition"], second.headers["Content-Disposition"]
+        )
+        self.assertEqual(self.client.get("/cache-stats").json["hits"], 1)
+
+    def test_non_finite_numbers_are_cached_apart(self):
+        with open("MinimalDataModelExample.json", "r") as file:
+            json_data = json.load(file)
+        # The integer variable of the only group
+        json_data["groups"][0]["variables"][0]["minValue"] = "MIN_VALUE"
+        responses = {}
+        for value in ["null", "NaN", "null"]:
+            body = json.dumps(json_data).replace('"MIN_VALUE"', value)
+            responses.setdefault(value, []).append(
+                self.client.post(
+                    "/json-to-excel", data=body, content_type="application/json"
+                ).data
+            )
+        self.assertNotEqual(responses["null"][0], responses["NaN"][0])
+        self.assertEqual(responses["null"][0], responses["null"][1])
+        self.assertEqual(self.client.get("/cache-stats").json["hits"], 1)
+
+    def test_excel_to_json_is_cached(self):
+        responses = []
+        for _ in range(2):
+            with open("MinimalDataModelExample.xlsx", "rb") as file:
+                data = {"file": (file, "MinimalDataModelExample.xlsx")}
+                responses.append(
+                    self.client.post(
+                        "/excel-to-json", content_type="multipart/form-data", data=data
+                    )
+                )
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertEqual(responses[0].json, responses[1].json)
+        self.assertEqual(self.client.get("/cache-stats").json["hits"], 1)
+
+    def test_query_string_variants_are_cached_apart(self):
+        responses = []
+        for query in ["", "?pretty", "?pretty", ""]:
+            with open("MinimalDataModelExample.xlsx", "rb") as file:
+                data = {"file": (file, "MinimalDataModelExample.xlsx")}
+                responses.append(
+                    self.client.post(
+                        "/excel-to-json" + query,
+                        content_type="multipart/form-data",
+                        data=data,
+                    )
+                )
+        compact, pretty, cached_pretty, cached_compact = (r.data for r in responses)
+        self.assertNotEqual(compact, pretty)
+        self.assertEqual(pretty, cached_pretty)
+        self.assertEqual(compact, cached_compact)
+        self.assertEqual(self.client.get("/cache-stats").json["hits"], 2)
+
+    def post_workbook(self):
+        with open("MinimalDataModelExample.xlsx", "rb") as file:
+            data = {"file": (file, "MinimalDataModelExample.xlsx")}
+            return self.client.post(
+                "/validate-excel", content_type="multipart/form-data", data=data
+            )
+
+    def test_admission_of_uploads(self):
+        self.assertEqual(self.post_workbook().status_code, 200)
+        gate = AdmissionGate(concurrency=1, queue_size=0, timeout=5)
+        app.extensions["admission_gates"] = {"heavy": gate}
+        # The gates of the configured budgets are created again on their next use.
+        self.addCleanup(app.extensions.pop, "admission_gates", None)
+        gate.enter()
+        spooled = mock.patch.object(
+            SpooledUploadRequest,
+            "_get_file_stream",
+            autospec=True,
+            side_effect=SpooledUploadRequest._get_file_stream,
+        )
+        with spooled as get_file_stream:
+            # Small requests are looked up before admission, the hit needs no slot.
+            self.assertEqual(self.post_workbook().status_code, 200)
+            self.assertEqual(get_file_stream.call_count, 1)
+            # Bigger ones are rejected before their upload is read.
+            app.config["RESULT_CACHE_EARLY_MAX_BYTES"] = 0
+            self.addCleanup(
+                app.config.__setitem__, "RESULT_CACHE_EARLY_MAX_BYTES", 256 * 1024
+            )
+            self.assertEqual(self.post_workbook().status_code, 503)
+            self.assertEqual(get_file_stream.call_count, 1)
+        gate.leave()
+        self.assertEqual(self.post_workbook().status_code, 200)
+        self.assertEqual(self.client.get("/cache-stats").json["hits"], 2)
+
+    def test_cache_disabled(self):
+        app.config["RESULT_CACHE_PATH"] = None
+        self.assertEqual(self.client.get("/cache-stats").json, {"enabled": False})
@@ -0,0 +1,81 @@
+import json
+import logging
+import unittest
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+
+from controller import app
+from structured_logging import StructuredFormatter, payload_summary
+
+
+def make_record(fields=None):
+    record = logging.LogRecord(
+        "dqt", logging.INFO, __file__, 1, "Hello %s", ("you",), None
+    )
+    if fields is not None:
+        record.fields = fields
+    return record
+
+
+class TestStructuredFormatter(unittest.TestCase):
+    def test_text(self):
+        formatter = StructuredFormatter()
+        self.assertEqual(formatter.format(make_record()), "INFO:dqt:Hello you")
+        self.assertEqual(
+            formatter.format(make_record({"bytes": 10, "cdes": 2})),
+            "INFO:dqt:Hello you bytes=10 cdes=2",
+        )
+
+    def test_json(self):
+        entry = json.loads(
+            StructuredFormatter(json_lines=True).format(make_record({"bytes": 10}))
+        )
+        self.assertEqual(
+            {key: entry[key] for key in ("level", "logger", "message", "bytes")},
+            {"level": "INFO", "logger": "dqt", "message": "Hello you", "bytes": 10},
+        )
+
+
+class TestPayloadSummary(unittest.TestCase):
+    def test_summary(self):
+        data_model = {
+            "variables": [{"code": "a"}],
+            "groups": [{"variables": [{"code": "b"}, {"code": "c"}]}],
+        }
+        summary = payload_summary(b"{}", data_model)
+        self.assertEqual(summary["bytes"], 2)
+        self.assertEqual(summary["cdes"], 3)
+        self.assertEqual(len(summary["sha256"]), 16)
+
+    def test_malformed_data_model(self):
+        self.assertNotIn("cdes", payload_summary(b"[]", {"groups": [1]}))
+        self.assertNotIn("cdes", payload_summary(b"[]", [1]))
+
+
+class TestRequestLogging(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with open("MinimalDataModelExample.json", "r") as file:
+            self.data_model = json.load(file)
+
+    def test_records_go_through_a_queue(self):
+        self.assertTrue(
+            any(
+                isinstance(handler, QueueHandler)
+                for handler in logging.getLogger().handlers
+            )
+        )
+
+    def test_payload_is_summarized(self):
+        with self.assertLogs("controller", level="INFO") as logs:
+            self.client.post("/validate-json", json=self.data_model)
+        received = [record for record in logs.records if record.msg == "Received JSON"]
+        self.assertEqual(received[0].fields["cdes"], 3)
+        self.assertFalse(any("Sampled payload" in line for line in logs.output))
+        self.assertFalse(any('"variables"' in line for line in logs.output))
+
+    def test_payload_dump_is_sampled(self):
+        with patch.dict(app.config, LOG_PAYLOAD_SAMPLE_RATE=1.0):
+            with self.assertLogs("controller", level="INFO") as logs:
+                self.client.post("/validate-json", json=self.data_model)
+        self.assertTrue(any("Sampled payload" in line for line in logs.output))
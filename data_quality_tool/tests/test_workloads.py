@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import workloads
+from common_parsers import parse_cache_info
+from validator.json_validator import validated_subtrees
+
+
+class TestWarmUp(unittest.TestCase):
+    def test_fills_the_caches(self):
+        workloads.warm_up()
+        self.assertGreater(parse_cache_info()["currsize"], 0)
+        self.assertGreater(validated_subtrees.stats()["entries"], 0)
+
+    def test_controller_imports_no_spreadsheet_library(self):
+        modules = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, controller; print(*sorted(sys.modules))",
+            ],
+            cwd=os.path.dirname(os.path.abspath(workloads.__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        self.assertNotIn("pandas", modules)
+        self.assertNotIn("openpyxl", modules)
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from validator.json_validator import DataModelFacts, validate_group, validate_json
+
+
+def cde(code, **fields):
+    return {
+        "code": code,
+        "sql_type": "text",
+        "isCategorical": False,
+        "type": "text",
+        **fields,
+    }
+
+
+class TestDataModelFacts(unittest.TestCase):
+    def test_visit_variable(self):
+        facts = DataModelFacts()
+        facts.visit_variable(cde("dataset"))
+        self.assertFalse(facts.dataset_present)
+        facts.visit_variable(cde("dataset", isCategorical=True))
+        facts.visit_variable(cde("dataset", sql_type="int"))
+        facts.visit_variable(cde("subjectid"))
+        self.assertTrue(facts.dataset_present)
+        self.assertTrue(facts.subjectid_present)
+        self.assertFalse(facts.visitid_present)
+
+    def test_facts_are_gathered_from_nested_groups(self):
+        facts = DataModelFacts()
+        group = {
+            "code": "root",
+            "variables": [cde("subjectid")],
+            "groups": [
+                {
+                    "code": "nested",
+                    "groups": [{"code": "deep", "variables": [cde("visitid")]}],
+                }
+            ],
+        }
+        validate_group(group, "", facts=facts)
+        self.assertTrue(facts.subjectid_present)
+        self.assertTrue(facts.visitid_present)
+        self.assertFalse(facts.dataset_present)
+
+    def test_validate_json_walks_the_tree_once(self):
+        data_model = {
+            "code": "DM",
+            "version": "1.0",
+            "label": "Data Model",
+            "longitudinal": True,
+            "variables": [
+                cde("dataset", isCategorical=True, type="nominal", enumerations=["d"])
+            ],
+            "groups": [
+                {"code": "ids", "variables": [cde("subjectid"), cde("visitid")]}
+            ],
+        }
+        with patch(
+            "validator.json_validator.contains_required_dataset"
+        ) as dataset, patch(
+            "validator.json_validator.has_valid_cde_in_group"
+        ) as has_cde:
+            validate_json(data_model)
+        dataset.assert_not_called()
+        has_cde.assert_not_called()
@@ -2,7 +2,8 @@ import unittest
 
 import pandas as pd
 
-from common_entities import REQUIRED_COLUMNS, EXCEL_COLUMNS
+from common_entities import EXCEL_COLUMNS, InvalidExcelRowsError
+from converter.excel_to_json import import_excel_rows
 from validator.excel_validator import (
     validate_enumerations,
     InvalidDataModelError,
@@ -29,7 +30,7 @@ class TestValidationFunctions(unittest.TestCase):
         )
 
     def test_validate_min_max_valid(self):
-        self.assertIsNone(validate_min_max("1-2"))
+        self.assertEqual(validate_min_max("1-2"), (1.0, 2.0))
 
     def test_validate_min_max_invalid_format(self):
         with self.assertRaises(InvalidDataModelError) as context:
@@ -147,3 +148,115 @@ class TestValidationFunctions(unittest.TestCase):
         with self.assertRaises(InvalidDataModelError) as context:
             validate_enumerations(duplicate_values)
         self.assertIn("Duplicate codes found", str(context.exception))
+
+    def test_validate_excel_reports_every_invalid_row(self):
+        rows = [
+            ("T01", "nominal", '{"code1", "label1"}', "valid/format"),
+            (
+                "T02",
+                "nominal",
+                '{"code1", "label1"}, {"code1", "label2"}',
+                "valid/format",
+            ),
+            ("T03", "integer", "10-1", "valid/format"),
+            ("T04", "real", "ten-eleven", "valid/format"),
+            ("T05", "unknown", None, "valid/format"),
+            ("T06", "text", None, "invalid//format"),
+            ("T07", "real", "-10-10", None),
+            ("T08", "real", "-10-10", "valid/format"),
+        ]
+        df = pd.DataFrame(
+            [
+                {
+                    "name": f"test {code}",
+                    "code": code,
+                    "type": type_,
+                    "values": values,
+                    "conceptPath": concept_path,
+                }
+                for code, type_, values, concept_path in rows
+            ],
+            columns=EXCEL_COLUMNS,
+        )
+        with self.assertRaises(InvalidExcelRowsError) as context:
+            validate_excel(df)
+        errors = context.exception.errors
+        self.assertEqual([error["row"] for error in errors], [3, 4, 5, 6, 7, 8])
+        self.assertEqual(
+            [error["code"] for error in errors],
+            ["T02", "T03", "T04", "T05", "T06", "T07"],
+        )
+        self.assertIn("Duplicate codes found", errors[0]["error"])
+        self.assertEqual(
+            "On :T03 got: Min value must be smaller than max value min_str='10' and max_str='1'.",
+            errors[1]["error"],
+        )
+        self.assertEqual(
+            "On :T04 got: Values must match format '<float or integer>-<float or integer>' but got 'ten-eleven'.",
+            errors[2]["error"],
+        )
+        self.assertIn("Invalid 'type': unknown.", errors[3]["error"])
+        self.assertIn("ConceptPath format error", errors[4]["error"])
+        self.assertEqual(
+            "On :T07 got: Missing value for required column 'conceptPath'.",
+            errors[5]["error"],
+        )
+
+    def test_validate_excel_missing_code_is_reported(self):
+        df = pd.DataFrame(
+            [{"name": "test", "type": "text", "conceptPath": "valid/format"}],
+            columns=EXCEL_COLUMNS,
+        )
+        with self.assertRaises(InvalidExcelRowsError) as context:
+            validate_excel(df)
+        self.assertEqual(
+            context.exception.errors,
+            [
+                {
+                    "row": 2,
+                    "code": None,
+                    "error": "On :None got: Missing value for required column 'code'.",
+                }
+            ],
+        )
+
+    def test_validate_excel_matches_the_row_by_row_validation(self):
+        rows = [
+            {"values": "nan-5"},
+            {"values": "0-nan"},
+            {"values": "1_0-20"},
+            {"values": "1e1-20"},
+            {"values": " 1 - 2 "},
+            {"values": "2-1"},
+            {"type": "integer", "values": "1.5-2"},
+            {"type": "nominal", "values": '{"a", "A"},'},
+            {"conceptPath": "a//b"},
+            {"name": None},
+        ]
+        rows = [
+            {
+                "name": f"name {index}",
+                "code": f"c{index}",
+                "type": "real",
+                "conceptPath": "model/group",
+                **row,
+            }
+            for index, row in enumerate(rows)
+        ]
+        # A blank row in the middle, which read_excel_rows skips.
+        rows.insert(5, {})
+        df = pd.DataFrame(rows, columns=EXCEL_COLUMNS)
+        with self.assertRaises(InvalidExcelRowsError) as from_df:
+            validate_excel(df)
+        numbered_rows = [
+            (row_number, {column: row.get(column) for column in EXCEL_COLUMNS})
+            for row_number, row in enumerate(rows, start=2)
+            if row
+        ]
+        with self.assertRaises(InvalidExcelRowsError) as from_rows:
+            import_excel_rows(EXCEL_COLUMNS, numbered_rows, validate_only=True)
+        self.assertEqual(from_df.exception.errors, from_rows.exception.errors)
+        self.assertEqual(
+            [error["code"] for error in from_df.exception.errors],
+            ["c0", "c1", "c5", "c6", "c7", "c8", "c9"],
+        )
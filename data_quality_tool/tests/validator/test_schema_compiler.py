@@ -0,0 +1,123 @@
+import unittest
+
+from common_entities import InvalidDataModelError
+from validator.json_validator import LazyPath
+from validator.schema_compiler import compile_schema
+
+
+class TestCompileSchema(unittest.TestCase):
+    def compile(self, *rules):
+        return compile_schema({"title": "Thing", "rules": list(rules)})
+
+    def assert_error(self, validator, instance, message):
+        with self.assertRaises(InvalidDataModelError) as context:
+            validator(instance, "/path")
+        self.assertEqual(str(context.exception), message)
+
+    def test_required(self):
+        validator = self.compile(
+            {"rule": "required", "fields": ["a", "b"], "message": "{field} at {path}"}
+        )
+        validator({"a": None, "b": 0})
+        self.assert_error(validator, {"a": 1}, "b at /path")
+        self.assert_error(validator, {}, "a at /path")
+
+    def test_type(self):
+        validator = self.compile(
+            {
+                "rule": "type",
+                "type": "string",
+                "non_empty": True,
+                "fields": ["a"],
+                "message": "{field}={value}",
+            }
+        )
+        validator({"a": "x"})
+        self.assert_error(validator, {"a": "  "}, "a=  ")
+        self.assert_error(validator, {"a": 1}, "a=1")
+
+    def test_type_default(self):
+        validator = self.compile(
+            {"rule": "type", "type": "list", "default": list, "fields": ["a"]}
+        )
+        first, second = {"a": None}, {}
+        validator(first)
+        validator(second)
+        self.assertEqual(first, {"a": []})
+        self.assertEqual(second, {"a": []})
+        self.assertIsNot(first["a"], second["a"])
+
+    def test_items_type(self):
+        validator = self.compile(
+            {
+                "rule": "items_type",
+                "type": "dict",
+                "fields": ["a"],
+                "message": "{field}",
+            }
+        )
+        validator({"a": [{}, {}]})
+        self.assert_error(validator, {"a": [{}, 1]}, "a")
+
+    def test_enum_and_depends(self):
+        validator = self.compile(
+            {
+                "rule": "enum",
+                "field": "t",
+                "values": ["x", "y"],
+                "message": "{value} {values}",
+            },
+            {
+                "rule": "depends",
+                "field": "t",
+                "fields": ["u"],
+                "values": {"x": (1,), "y": (2,)},
+                "message": "{value} {expected[0]} {actual[0]}",
+            },
+        )
+        validator({"t": "y", "u": 2})
+        self.assert_error(validator, {"t": "z"}, "z ['x', 'y']")
+        self.assert_error(validator, {"t": "x", "u": 2}, "x 1 2")
+
+    def test_requires(self):
+        validator = self.compile(
+            {
+                "rule": "requires",
+                "field": "a",
+                "required": "b",
+                "message": "b at {path}",
+            }
+        )
+        validator({"a": False})
+        validator({"a": True, "b": [1]})
+        self.assert_error(validator, {"a": True, "b": []}, "b at /path")
+
+    def test_less_than(self):
+        validator = self.compile(
+            {"rule": "less_than", "low": "a", "high": "b", "message": "{low}>={high}"}
+        )
+        validator({"a": 1})
+        validator({"a": 1, "b": 2})
+        self.assert_error(validator, {"a": 2, "b": 2}, "2>=2")
+
+    def test_rules_run_in_order(self):
+        validator = self.compile(
+            {"rule": "required", "fields": ["a"], "message": "first"},
+            {"rule": "less_than", "low": "a", "high": "b", "message": "second"},
+        )
+        self.assert_error(validator, {"b": 0}, "first")
+
+    def test_lazy_path_is_formatted(self):
+        validator = self.compile(
+            {"rule": "required", "fields": ["a"], "message": "at '{path}'"}
+        )
+        with self.assertRaises(InvalidDataModelError) as context:
+            validator({}, LazyPath("/model", "cde"))
+        self.assertEqual(str(context.exception), "at '/model/cde'")
+
+    def test_source_is_kept(self):
+        validator = compile_schema(
+            {"title": "Thing", "rules": []}, function_name="validate_thing"
+        )
+        self.assertEqual(validator.__name__, "validate_thing")
+        self.assertIn("def validate_thing(instance, path=''):", validator.source)
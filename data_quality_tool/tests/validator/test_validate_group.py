@@ -1,6 +1,6 @@
 import unittest
 
-from validator.json_validator import validate_group, InvalidDataModelError
+from validator.json_validator import LazyPath, validate_group, InvalidDataModelError
 
 
 class TestValidateGroup(unittest.TestCase):
@@ -245,3 +245,57 @@ class TestValidateGroup(unittest.TestCase):
         path = "/test/duplicate_across_groups"
         with self.assertRaises(InvalidDataModelError):
             validate_group(group, path, seen_codes=set())
+
+    def test_duplicate_group_message_has_the_full_path(self):
+        group = {
+            "code": "root",
+            "groups": [
+                {
+                    "code": "parent",
+                    "groups": [{"code": "child"}, {"code": "child"}],
+                }
+            ],
+        }
+        with self.assertRaises(InvalidDataModelError) as context:
+            validate_group(group, "")
+        self.assertEqual(
+            "Duplicate group code 'child' detected at path: '/root/parent'. Group codes must be unique within the data model hierarchy.",
+            str(context.exception),
+        )
+
+    def test_same_codes_in_different_groups_are_allowed(self):
+        variable = {
+            "code": "001",
+            "sql_type": "text",
+            "isCategorical": False,
+            "type": "text",
+        }
+        group = {
+            "code": "root",
+            "variables": [variable],
+            "groups": [
+                {"code": "a", "variables": [variable], "groups": [{"code": "a"}]},
+                {"code": "b", "variables": [variable], "groups": [{"code": "a"}]},
+            ],
+        }
+        validate_group(group, "")
+
+    def test_deep_hierarchy(self):
+        group = {"code": "level0", "groups": []}
+        current = group
+        for level in range(1, 5000):
+            subgroup = {"code": f"level{level}", "groups": []}
+            current["groups"].append(subgroup)
+            current = subgroup
+        current["variables"] = [{"code": "deep_var"}]
+        with self.assertRaises(InvalidDataModelError) as context:
+            validate_group(group, "")
+        self.assertIn("/level4998/level4999/deep_var'", str(context.exception))
+
+
+class TestLazyPath(unittest.TestCase):
+    def test_path_is_built_when_formatted(self):
+        path = LazyPath(LazyPath("/root", "group"), "variable")
+        self.assertEqual(str(path), "/root/group/variable")
+        self.assertEqual(f"at '{path}'", "at '/root/group/variable'")
+        self.assertEqual(str(LazyPath("", "root")), "/root")
@@ -0,0 +1,148 @@
+import copy
+import unittest
+from unittest.mock import patch
+
+from validator.json_validator import (
+    InvalidDataModelError,
+    ValidatedSubtrees,
+    subtree_hashes,
+    validate_json,
+)
+
+
+def cde(code, **fields):
+    return {
+        "code": code,
+        "sql_type": "text",
+        "isCategorical": False,
+        "type": "text",
+        **fields,
+    }
+
+
+def data_model():
+    return {
+        "code": "model",
+        "version": "1.0",
+        "label": "Model",
+        "longitudinal": True,
+        "variables": [cde("root_variable")],
+        "groups": [
+            {
+                "code": "group1",
+                "variables": [
+                    cde(
+                        "dataset",
+                        isCategorical=True,
+                        type="nominal",
+                        enumerations=[{"code": "d", "label": "D"}],
+                    ),
+                    cde("subjectid"),
+                ],
+            },
+            {
+                "code": "group2",
+                "variables": [cde("visitid"), cde("age")],
+                "groups": [{"code": "nested", "variables": [cde("weight")]}],
+            },
+        ],
+    }
+
+
+class TestSubtreeHashes(unittest.TestCase):
+    def test_hashes_change_up_to_the_root(self):
+        model = data_model()
+        before = subtree_hashes(model)
+        edited = copy.deepcopy(model)
+        edited["groups"][1]["groups"][0]["variables"][0]["label"] = "Weight"
+        after = subtree_hashes(edited)
+
+        self.assertEqual(before[id(model["groups"][0])], after[id(edited["groups"][0])])
+        for path in [
+            lambda m: m,
+            lambda m: m["groups"][1],
+            lambda m: m["groups"][1]["groups"][0],
+        ]:
+            self.assertNotEqual(before[id(path(model))], after[id(path(edited))])
+
+    def test_unhashable_groups(self):
+        model = data_model()
+        model["groups"][0]["variables"][0]["enumerations"] = object()
+        hashes = subtree_hashes(model)
+        self.assertIsNone(hashes[id(model["groups"][0])])
+        self.assertIsNone(hashes[id(model)])
+        self.assertIsNotNone(hashes[id(model["groups"][1])])
+
+
+class TestValidatedSubtrees(unittest.TestCase):
+    def setUp(self):
+        self.cache = ValidatedSubtrees()
+
+    def validated_codes(self, model):
+        with patch(
+            "validator.json_validator.validate_common_data_element"
+        ) as validate_common_data_element:
+            validate_json(model, self.cache)
+        return [
+            call.args[0]["code"] for call in validate_common_data_element.call_args_list
+        ]
+
+    def test_only_edited_subtrees_are_revalidated(self):
+        model = data_model()
+        validate_json(model, self.cache)
+
+        self.assertEqual(self.validated_codes(copy.deepcopy(model)), [])
+
+        model["groups"][1]["groups"][0]["variables"].append(cde("height"))
+        self.assertEqual(
+            self.validated_codes(model),
+            ["root_variable", "visitid", "age", "weight", "height"],
+        )
+
+    def test_facts_of_cached_subtrees_are_kept(self):
+        model = data_model()
+        validate_json(model, self.cache)
+        model["variables"].append(cde("new_variable"))
+        # dataset, subjectid and visitid are in cached subtrees only
+        self.assertEqual(self.validated_codes(model), ["root_variable", "new_variable"])
+
+    def test_invalid_edits_are_detected(self):
+        model = data_model()
+        validate_json(model, self.cache)
+        model["groups"][1]["groups"][0]["variables"][0]["sql_type"] = "int"
+        with self.assertRaises(InvalidDataModelError) as context:
+            validate_json(model, self.cache)
+        self.assertIn("at path: '/model/group2/nested/weight'", str(context.exception))
+
+    def test_duplicates_across_cached_subtrees_are_detected(self):
+        model = data_model()
+        validate_json(model, self.cache)
+        model["groups"].append(copy.deepcopy(model["groups"][1]))
+        with self.assertRaises(InvalidDataModelError) as context:
+            validate_json(model, self.cache)
+        self.assertIn("Duplicate group code 'group2'", str(context.exception))
+
+    def test_global_checks_run_on_cached_models(self):
+        model = data_model()
+        validate_json(model, self.cache)
+        del model["groups"][0]
+        with self.assertRaises(InvalidDataModelError) as context:
+            validate_json(model, self.cache)
+        self.assertIn("at least one dataset CommonDataElement", str(context.exception))
+
+    def test_failed_validations_are_not_cached(self):
+        model = data_model()
+        model["groups"][0]["variables"].append(cde("subjectid"))
+        with self.assertRaises(InvalidDataModelError):
+            validate_json(model, self.cache)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_size_is_bounded(self):
+        cache = ValidatedSubtrees(maxsize=2)
+        for key in (b"a", b"b", b"c"):
+            cache.put(key, (False, False, False))
+        self.assertIsNone(cache.get(b"a"))
+        self.assertEqual(cache.get(b"c"), (False, False, False))
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "misses": 1, "entries": 2, "max_entries": 2}
+        )
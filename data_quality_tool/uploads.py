@@ -0,0 +1,47 @@
+"""Uploaded files spooled once to disk, and hashed without being loaded in memory.
+
+The files of multipart requests are written by werkzeug straight to a named
+temporary file, deleted when the request ends. The parsers, in this process or in
+the worker processes, open the file by path, so the raw bytes of an upload are held
+once, on disk, instead of being copied in memory.
+"""
+
+import tempfile
+
+from flask import Request
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class SpooledUploadRequest(Request):
+    """Request that spools every uploaded file to a named temporary file."""
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        # openpyxl checks the extension of the paths it opens, only workbooks are
+        # uploaded.
+        return tempfile.NamedTemporaryFile("w+b", prefix="dqt-upload-", suffix=".xlsx")
+
+
+def upload_path(file):
+    """The path of the spooled file of an upload, with all its bytes written to it."""
+    file.stream.flush()
+    return file.stream.name
+
+
+def update_digest(digest, payload):
+    """Hash bytes, or the content of a seekable binary file read in chunks.
+
+    Returns the number of bytes hashed. The file is rewound afterwards.
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        digest.update(payload)
+        return len(payload)
+    size = 0
+    payload.seek(0)
+    for chunk in iter(lambda: payload.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    payload.seek(0)
+    return size
@@ -1,6 +1,4 @@
-import json
 import re
-import pandas as pd
 
 from common_entities import (
     InvalidDataModelError,
@@ -8,54 +6,30 @@ from common_entities import (
     EXCEL_COLUMNS,
     EXCEL_TYPE_2_SQL_TYPE_ISCATEGORICAL_MAP,
 )
+from common_parsers import is_missing, parse_values
+from converter.excel_reader import normalize_cell
 
 # Regex for validation
 CONCEPT_PATH_PATTERN = r"^[^/]+(/[^/]+)*$"
 
 
 def validate_enumerations(values):
-    # Transform the string to a JSON-compatible format
-    try:
-        # Transforming {"key","value"} into [{"key": "value"}]
-        transformed_values = (
-            "[" + values.replace('","', '":"').replace('", "', '": "') + "]"
-        )
-        enumerations = json.loads(transformed_values)
-    except json.JSONDecodeError:
-        raise InvalidDataModelError(
-            'Nominal values format error: \'{"code", "label"}, {"code", "label"}\' expected but got '
-            + values
-            + "."
-        )
-    codes = [code for _enum in enumerations for code, label in _enum.items()]
-    if len(codes) != len(set(codes)):
-        raise InvalidDataModelError(
-            f"Duplicate codes found in enumeration values {codes=}."
-        )
+    """Validate the format of enumeration values and return them as (code, label) pairs."""
+    return parse_values(values, "nominal")
 
-def validate_min_max(values):
-    """Validate the format and logic of min-max values."""
-    # Split on the last hyphen only, so "-10-100" → ["-10", "100"]
-    parts = values.rsplit("-", 1)
-    if len(parts) != 2:
-        raise InvalidDataModelError(
-            f"Values must match format '<float or integer>-<float or integer>' but got '{values}'."
-        )
 
-    min_str, max_str = parts[0].strip(), parts[1].strip()
-
-    try:
-        min_val = float(min_str)
-        max_val = float(max_str)
-    except ValueError:
-        raise InvalidDataModelError(
-            f"Values must match format '<float or integer>-<float or integer>' but got '{values}'."
-        )
+def validate_min_max(values, variable_type="real"):
+    """Validate the format and logic of min-max values and return them as floats."""
+    min_val, max_val = parse_values(values, variable_type)
 
     if min_val >= max_val:
+        # Split on the last hyphen only, so "-10-100" → ("-10", "-", "100")
+        min_str, _, max_str = values.rpartition("-")
+        min_str, max_str = min_str.strip(), max_str.strip()
         raise InvalidDataModelError(
             f"Min value must be smaller than max value {min_str=} and {max_str=}."
         )
+    return min_val, max_val
 
 
 def validate_concept_path(concept_path):
@@ -67,7 +41,11 @@ def validate_concept_path(concept_path):
 
 
 def validate_variable_type(row):
-    """Validate the type and values of a variable based on its type."""
+    """Validate the type and values of a variable based on its type.
+
+    Returns the parsed 'values' of the variable: the enumerations for nominal
+    variables, the (min, max) range for real and integer ones, otherwise None.
+    """
     type_val = row.get("type")
     valid_excel_types = EXCEL_TYPE_2_SQL_TYPE_ISCATEGORICAL_MAP.keys()
     if type_val not in valid_excel_types:
@@ -76,32 +54,65 @@ def validate_variable_type(row):
             f"Invalid 'type': {type_val}. Valid types: {valid_types_str}."
         )
     if type_val == "nominal":
-        validate_enumerations(row.get("values", ""))
+        return validate_enumerations(row.get("values") or "")
     elif type_val in ["real", "integer"] and row.get("values"):
-        validate_min_max(row["values"])
+        return validate_min_max(row["values"], type_val)
+    return None
 
 
 def validate_variable(row):
-    """Validate required columns, variable type, and conceptPath for a single row."""
+    """Validate required columns, variable type, and conceptPath for a single row.
+
+    Returns the parsed 'values' of the row, see validate_variable_type.
+    """
     try:
         for required_col in REQUIRED_COLUMNS:
-            if pd.isnull(row[required_col]) or row[required_col] is None:
+            if is_missing(row[required_col]):
                 raise InvalidDataModelError(
                     f"Missing value for required column '{required_col}'."
                 )
-        validate_variable_type(row)
+        parsed_values = validate_variable_type(row)
         validate_concept_path(row["conceptPath"])
+        return parsed_values
     except InvalidDataModelError as e:
         raise InvalidDataModelError(f"On :{row['code']} got: {e}")
 
 
-def validate_excel(df):
-    """Validate the structure and data of an Excel file represented as a DataFrame."""
-    df = df.astype(str).replace("nan", None)
-    if set(df.columns) != set(EXCEL_COLUMNS):
-        missing_excel_columns = set(EXCEL_COLUMNS) - set(df.columns)
+def validate_excel_columns(columns):
+    """Validate that the header of an Excel file contains exactly the expected columns."""
+    if set(columns) != set(EXCEL_COLUMNS):
+        missing_excel_columns = set(EXCEL_COLUMNS) - set(columns)
         raise InvalidDataModelError(
             "Mismatch in Excel columns. Missing columns: "
             + ", ".join(missing_excel_columns)
         )
-    df.apply(validate_variable, axis=1)
+
+
+def validate_excel(df):
+    """Validate the structure and data of an Excel file represented as a DataFrame.
+
+    The rows go through import_excel_rows, the checks of the endpoints, and every
+    invalid row is reported at once, with the first error found for it, in an
+    InvalidExcelRowsError.
+    """
+    # Imported here, the converter imports this module.
+    from converter.excel_to_json import import_excel_rows
+
+    # Cells normalized as read_excel_rows does, NaN being an empty cell too.
+    records = (
+        (
+            row_number,
+            {
+                column: None if is_missing(value) else normalize_cell(value)
+                for column, value in record.items()
+            },
+        )
+        for row_number, record in enumerate(df.to_dict("records"), start=2)
+    )
+    # read_excel_rows skips the blank rows, pandas keeps them.
+    numbered_rows = (
+        (row_number, row)
+        for row_number, row in records
+        if any(value is not None for value in row.values())
+    )
+    import_excel_rows(list(df.columns), numbered_rows, validate_only=True)
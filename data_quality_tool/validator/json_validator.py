@@ -1,4 +1,12 @@
+import hashlib
+import json
+import marshal
+import threading
+from collections import OrderedDict
+from itertools import count
+
 from common_entities import InvalidDataModelError
+from validator.schema_compiler import compile_schema
 
 TYPE_2_SQL = {
     "nominal": ("text", True),
@@ -8,128 +16,379 @@ TYPE_2_SQL = {
 }
 
 
-def validate_common_data_element(cde, path):
-    required_fields = ["code", "sql_type", "isCategorical", "type"]
-
-    for field in required_fields:
-        if field not in cde:
-            raise InvalidDataModelError(
-                f"Missing required field '{field}' in CommonDataElement at path: '{path}'. Please ensure all required fields are provided."
-            )
-    type_key = cde.get("type")
-    if type_key not in TYPE_2_SQL:
-        raise InvalidDataModelError(
-            f"Invalid 'type' value '{type_key}' in CommonDataElement at path: '{path}'. Must be one of {list(TYPE_2_SQL.keys())}."
-        )
+COMMON_DATA_ELEMENT_SCHEMA = {
+    "title": "CommonDataElement",
+    "instance": "cde",
+    "rules": [
+        {
+            "rule": "required",
+            "fields": ["code", "sql_type", "isCategorical", "type"],
+            "message": "Missing required field '{field}' in CommonDataElement at path: '{path}'. Please ensure all required fields are provided.",
+        },
+        {
+            "rule": "enum",
+            "field": "type",
+            "values": list(TYPE_2_SQL),
+            "message": "Invalid 'type' value '{value}' in CommonDataElement at path: '{path}'. Must be one of {values}.",
+        },
+        {
+            "rule": "depends",
+            "field": "type",
+            "fields": ["sql_type", "isCategorical"],
+            "values": TYPE_2_SQL,
+            "message": "Incorrect 'sql_type' or 'isCategorical' for type '{value}' in CommonDataElement at path: '{path}'. Expected ('{expected[0]}', {expected[1]}), but got ('{actual[0]}', {actual[1]}).",
+        },
+        {
+            "rule": "requires",
+            "field": "isCategorical",
+            "required": "enumerations",
+            "message": "'enumerations' is required for categorical CommonDataElement at path: '{path}', but it is missing.",
+        },
+        {
+            "rule": "less_than",
+            "low": "minValue",
+            "high": "maxValue",
+            "message": "Invalid range: 'minValue' ({low}) is greater than or equal to 'maxValue' ({high}) in CommonDataElement at path: '{path}'.",
+        },
+    ],
+}
 
-    expected_sql_type, expected_is_categorical = TYPE_2_SQL[type_key]
-    if (
-        cde.get("sql_type") != expected_sql_type
-        or cde.get("isCategorical") != expected_is_categorical
-    ):
-        raise InvalidDataModelError(
-            f"Incorrect 'sql_type' or 'isCategorical' for type '{type_key}' in CommonDataElement at path: '{path}'. Expected ('{expected_sql_type}', {expected_is_categorical}), but got ('{cde.get('sql_type')}', {cde.get('isCategorical')})."
-        )
+DATA_MODEL_SCHEMA = {
+    "title": "DataModel",
+    "instance": "data_model",
+    "rules": [
+        {
+            "rule": "required",
+            "fields": ["code", "version", "label", "variables", "groups"],
+            "message": "DataModel is missing the required field '{field}'. Please include it in the input JSON.",
+        },
+        {
+            "rule": "type",
+            "type": "string",
+            "non_empty": True,
+            "fields": ["code", "version", "label"],
+            "message": "'{field}' in DataModel must be a non-empty string. Current value: '{value}'.",
+        },
+        {
+            "rule": "type",
+            "type": "list",
+            "non_empty": True,
+            "fields": ["variables"],
+            "message": "'variables' in DataModel must be a non-empty list of dictionaries. Ensure that variables are properly defined.",
+        },
+        {
+            "rule": "items_type",
+            "type": "dict",
+            "fields": ["variables"],
+            "message": "'variables' in DataModel must only contain dictionaries. Found invalid entries.",
+        },
+        {
+            "rule": "type",
+            "type": "list",
+            "default": list,
+            "fields": ["groups"],
+        },
+        {
+            "rule": "items_type",
+            "type": "dict",
+            "fields": ["groups"],
+            "message": "'groups' in DataModel must only contain dictionaries. Found invalid entries.",
+        },
+    ],
+}
 
-    if cde.get("isCategorical") and not cde.get("enumerations"):
-        raise InvalidDataModelError(
-            f"'enumerations' is required for categorical CommonDataElement at path: '{path}', but it is missing."
-        )
+# The schemas are compiled once, see validator.schema_compiler
+validate_common_data_element = compile_schema(
+    COMMON_DATA_ELEMENT_SCHEMA, "validate_common_data_element"
+)
+validate_data_model = compile_schema(DATA_MODEL_SCHEMA, "validate_data_model")
 
-    if cde.get("minValue") is not None and cde.get("maxValue") is not None:
-        if cde["minValue"] >= cde["maxValue"]:
-            raise InvalidDataModelError(
-                f"Invalid range: 'minValue' ({cde['minValue']}) is greater than or equal to 'maxValue' ({cde['maxValue']}) in CommonDataElement at path: '{path}'."
-            )
 
+class DataModelFacts:
+    """Facts about the CommonDataElements of a data model, gathered while validating its groups.
 
-def validate_group(group, path, seen_codes=None, seen_group_codes=None):
-    if seen_codes is None:
-        seen_codes = set()
-    if seen_group_codes is None:
-        seen_group_codes = set()
+    They let validate_json run its data model wide checks without walking the tree again.
+    """
 
-    group_code = group.get("code")
-    if not group_code:
-        raise InvalidDataModelError(
-            f"Group at path: '{path}' is missing the 'code' field. Please provide a unique code for each group."
-        )
+    def __init__(self):
+        self.dataset_present = False
+        self.subjectid_present = False
+        self.visitid_present = False
 
-    group_path_code = f"{path}/{group_code}"
-    if group_path_code in seen_group_codes:
-        raise InvalidDataModelError(
-            f"Duplicate group code '{group_code}' detected at path: '{path}'. Group codes must be unique within the data model hierarchy."
-        )
-    seen_group_codes.add(group_path_code)
+    def as_tuple(self):
+        return self.dataset_present, self.subjectid_present, self.visitid_present
 
-    updated_path = f"{path}/{group_code}"
+    def merge(self, facts):
+        """Add the facts, as returned by as_tuple, of another part of the data model."""
+        dataset_present, subjectid_present, visitid_present = facts
+        self.dataset_present = self.dataset_present or dataset_present
+        self.subjectid_present = self.subjectid_present or subjectid_present
+        self.visitid_present = self.visitid_present or visitid_present
 
-    for variable in group.get("variables") or []:
+    def visit_variable(self, variable):
         code = variable.get("code")
-        variable_path_code = f"{updated_path}/{code}"
-        if variable_path_code in seen_codes:
-            raise InvalidDataModelError(
-                f"Duplicate CommonDataElement code '{code}' detected in group '{group_code}' at path: '{updated_path}'. Ensure all variable codes are unique within their group."
+        if code == "dataset":
+            self.dataset_present = self.dataset_present or bool(
+                variable.get("sql_type") == "text" and variable.get("isCategorical")
             )
-        seen_codes.add(variable_path_code)
-        validate_common_data_element(variable, variable_path_code)
-
-    for sub_group in group.get("groups") or []:
-        validate_group(
-            sub_group,
-            updated_path,
-            seen_codes,
-            seen_group_codes,
-        )
-
-
-def validate_json(data_model):
-    required_fields = ["code", "version", "label", "variables", "groups"]
-
-    for field in required_fields:
-        if field not in data_model:
+        elif code == "subjectid":
+            self.subjectid_present = True
+        elif code == "visitid":
+            self.visitid_present = True
+
+
+class LazyPath:
+    """The path of a group or CommonDataElement in the data model.
+
+    Paths are only needed in error messages, so the string is built from the chain
+    of parent paths when the path is formatted instead of for every node.
+    """
+
+    __slots__ = ("parent", "code")
+
+    def __init__(self, parent, code):
+        self.parent = parent
+        self.code = code
+
+    def __str__(self):
+        codes = []
+        path = self
+        while isinstance(path, LazyPath):
+            codes.append(path.code)
+            path = path.parent
+        return str(path) + "".join(f"/{code}" for code in reversed(codes))
+
+
+# Number of group subtrees whose successful validation is remembered.
+VALIDATED_SUBTREES_SIZE = 65536
+
+
+class ValidatedSubtrees:
+    """A bounded LRU of the content hashes of the group subtrees that passed validation.
+
+    Whether a group is valid only depends on its own content, so a subtree whose hash
+    is known was validated before and can be skipped. The DataModelFacts of the
+    subtree are kept with the hash for the data model wide checks.
+    """
+
+    def __init__(self, maxsize=VALIDATED_SUBTREES_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._subtrees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subtree_hash):
+        with self._lock:
+            facts = self._subtrees.get(subtree_hash)
+            if facts is None:
+                self.misses += 1
+                return None
+            self._subtrees.move_to_end(subtree_hash)
+            self.hits += 1
+            return facts
+
+    def put(self, subtree_hash, facts):
+        with self._lock:
+            self._subtrees[subtree_hash] = facts
+            self._subtrees.move_to_end(subtree_hash)
+            while len(self._subtrees) > self.maxsize:
+                self._subtrees.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._subtrees),
+                "max_entries": self.maxsize,
+            }
+
+
+validated_subtrees = ValidatedSubtrees()
+
+
+def subtree_hashes(group):
+    """Merkle hashes of the group subtrees, keyed by id(group).
+
+    The hash of a group covers its own fields and the hashes of its subgroups, so it
+    changes when anything below it changes. Groups that cannot be hashed, such as
+    malformed ones, get None and so do their ancestors.
+    """
+    hashes = {}
+    # Groups are pushed twice, the second time once their subgroups are hashed.
+    stack = [(group, False)]
+    while stack:
+        group, subgroups_hashed = stack.pop()
+        if not isinstance(group, dict):
+            hashes[id(group)] = None
+            continue
+        subgroups = group.get("groups") or []
+        if not isinstance(subgroups, list):
+            hashes[id(group)] = None
+            continue
+        if not subgroups_hashed:
+            stack.append((group, True))
+            stack.extend((sub_group, False) for sub_group in subgroups)
+            continue
+
+        subgroup_hashes = [hashes[id(sub_group)] for sub_group in subgroups]
+        try:
+            # marshal is much faster than json.dumps. Equal bytes always mean equal
+            # content, equal content serialized differently only costs a cache miss.
+            own_fields = marshal.dumps(
+                {key: value for key, value in group.items() if key != "groups"}
+            )
+        except ValueError:
+            own_fields = None
+        if own_fields is None or None in subgroup_hashes:
+            hashes[id(group)] = None
+            continue
+        digest = hashlib.blake2b(own_fields, digest_size=16)
+        for subgroup_hash in subgroup_hashes:
+            digest.update(subgroup_hash)
+        hashes[id(group)] = digest.digest()
+    return hashes
+
+
+def validate_group(
+    group,
+    path,
+    seen_codes=None,
+    seen_group_codes=None,
+    facts=None,
+    subtree_cache=None,
+):
+    if seen_codes is None:
+        seen_codes = set()
+    if seen_group_codes is None:
+        seen_group_codes = set()
+    if subtree_cache is not None:
+        hashes = subtree_hashes(group)
+        # The validated groups in visiting order, with the id of their parent and the
+        # facts of their own variables, to cache their subtrees once all are valid.
+        validated = []
+        subtree_facts = {}
+
+    # The groups are validated in depth-first order with an explicit stack of
+    # (group, path of its parent, id of its parent). Duplicates are detected on
+    # (id of the parent group, code) pairs, where ids are given in visiting order.
+    group_ids = count(1)
+    stack = [(group, path, 0)]
+    while stack:
+        group, path, parent_id = stack.pop()
+
+        group_code = group.get("code")
+        if not group_code:
             raise InvalidDataModelError(
-                f"DataModel is missing the required field '{field}'. Please include it in the input JSON."
+                f"Group at path: '{path}' is missing the 'code' field. Please provide a unique code for each group."
             )
 
-    for field in ["code", "version", "label"]:
-        if not isinstance(data_model[field], str) or not data_model[field].strip():
+        group_key = (parent_id, group_code)
+        if group_key in seen_group_codes:
             raise InvalidDataModelError(
-                f"'{field}' in DataModel must be a non-empty string. Current value: '{data_model[field]}'."
+                f"Duplicate group code '{group_code}' detected at path: '{path}'. Group codes must be unique within the data model hierarchy."
             )
-
-    if not isinstance(data_model["variables"], list) or not data_model["variables"]:
-        raise InvalidDataModelError(
-            "'variables' in DataModel must be a non-empty list of dictionaries. Ensure that variables are properly defined."
-        )
-    if not all(isinstance(var, dict) for var in data_model["variables"]):
-        raise InvalidDataModelError(
-            "'variables' in DataModel must only contain dictionaries. Found invalid entries."
+        seen_group_codes.add(group_key)
+
+        group_id = next(group_ids)
+        group_facts = facts
+        if subtree_cache is not None:
+            group_hash = hashes.get(id(group))
+            cached_facts = (
+                subtree_cache.get(group_hash) if group_hash is not None else None
+            )
+            if cached_facts is not None:
+                subtree_facts[group_id] = DataModelFacts()
+                subtree_facts[group_id].merge(cached_facts)
+                validated.append((group_id, parent_id, None))
+                continue
+            group_facts = subtree_facts[group_id] = DataModelFacts()
+            validated.append((group_id, parent_id, group_hash))
+
+        updated_path = LazyPath(path, group_code)
+
+        for variable in group.get("variables") or []:
+            code = variable.get("code")
+            variable_key = (group_id, code)
+            if variable_key in seen_codes:
+                raise InvalidDataModelError(
+                    f"Duplicate CommonDataElement code '{code}' detected in group '{group_code}' at path: '{updated_path}'. Ensure all variable codes are unique within their group."
+                )
+            seen_codes.add(variable_key)
+            validate_common_data_element(variable, LazyPath(updated_path, code))
+            if group_facts is not None:
+                group_facts.visit_variable(variable)
+
+        stack.extend(
+            (sub_group, updated_path, group_id)
+            for sub_group in reversed(group.get("groups") or [])
         )
 
-    if not isinstance(data_model["groups"], list):
-        data_model["groups"] = []
+    if subtree_cache is not None:
+        # Subgroups are visited after their parent, in reverse order the facts of
+        # every subtree are complete before they are added to those of its parent.
+        for group_id, parent_id, group_hash in reversed(validated):
+            group_facts = subtree_facts[group_id].as_tuple()
+            if group_hash is not None:
+                subtree_cache.put(group_hash, group_facts)
+            if parent_id:
+                subtree_facts[parent_id].merge(group_facts)
+            elif facts is not None:
+                facts.merge(group_facts)
 
-    if not all(isinstance(group, dict) for group in data_model["groups"]):
-        raise InvalidDataModelError(
-            "'groups' in DataModel must only contain dictionaries. Found invalid entries."
-        )
+
+def validate_json(data_model, subtree_cache=validated_subtrees):
+    validate_data_model(data_model)
 
     seen_codes, seen_group_codes = set(), set()
+    # The dataset and longitudinal CommonDataElements are looked up in the same pass
+    facts = DataModelFacts()
 
-    validate_group(data_model, "", seen_codes, seen_group_codes)
+    validate_group(data_model, "", seen_codes, seen_group_codes, facts, subtree_cache)
 
-    if not contains_required_dataset(data_model["variables"], data_model["groups"]):
+    if not facts.dataset_present:
         raise InvalidDataModelError(
             "The DataModel must include at least one dataset CommonDataElement with code 'dataset', 'sql_type' as 'text', and 'isCategorical' set to true."
         )
 
     if data_model.get("longitudinal"):
-        validate_longitudinal_elements(
-            data_model["variables"], data_model["groups"], path="DataModel"
+        require_longitudinal_elements(
+            facts.subjectid_present, facts.visitid_present, path="DataModel"
         )
 
 
+def validation_result(data_model):
+    """The outcome of validate_json as a JSON serializable dict, for batch validation."""
+    if not isinstance(data_model, dict):
+        return {"valid": False, "error": "Data model must be a JSON object."}
+    try:
+        validate_json(data_model)
+    except InvalidDataModelError as e:
+        return {"valid": False, "error": str(e)}
+    return {"valid": True, "message": "Data model is valid."}
+
+
+def json_validation_result(text):
+    """The validation_result of a data model serialized as JSON text."""
+    try:
+        data_model = json.loads(text)
+    except ValueError as e:
+        return {"valid": False, "error": f"Invalid JSON: {e}"}
+    return validation_result(data_model)
+
+
+def count_common_data_elements(group):
+    """The number of CommonDataElements in a group and its subgroups."""
+    count = 0
+    stack = [group]
+    while stack:
+        group = stack.pop()
+        count += len(group.get("variables") or [])
+        stack.extend(group.get("groups") or [])
+    return count
+
+
 def contains_required_dataset(variables, groups, path=""):
     if groups is None:
         groups = []
@@ -168,6 +427,10 @@ def validate_longitudinal_elements(variables, groups, path):
                 "visitid", group, group_path
             )
 
+    require_longitudinal_elements(subjectid_present, visitid_present, path)
+
+
+def require_longitudinal_elements(subjectid_present, visitid_present, path):
     if not subjectid_present:
         raise InvalidDataModelError(
             f"Missing 'subjectid' CommonDataElement required for longitudinal studies at path: '{path}'. Ensure a valid 'subjectid' is defined."
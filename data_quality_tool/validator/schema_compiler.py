@@ -0,0 +1,170 @@
+"""Compile declarative schemas into specialized validation functions.
+
+A schema is a dict with a "title" and an ordered list of "rules". Every rule is a
+dict with a "rule" kind, the fields it applies to and the "message" template of the
+InvalidDataModelError raised when it fails. Templates are str.format strings, they
+can refer to {path}, {field}, {value} and to the rule specific names documented in
+the _compile_* functions below.
+
+compile_schema generates the Python source of a function that checks the rules in
+order, with the field names, allowed values and messages inlined as constants, and
+executes it once. The generated function is called as validator(instance, path).
+"""
+
+from common_entities import InvalidDataModelError
+
+_TYPES = {"string": "str", "list": "list", "dict": "dict"}
+
+
+class _Codegen:
+    def __init__(self, instance_name):
+        self.instance = instance_name
+        self.lines = []
+        self.constants = {}
+        self.required = set()
+
+    def constant(self, value):
+        """The name under which a value is available to the generated source."""
+        for name, constant in self.constants.items():
+            if constant is value:
+                return name
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def emit(self, line, indent=1):
+        self.lines.append("    " * indent + line)
+
+    def get(self, field):
+        """Source of the value of a field, None when it is missing."""
+        if field in self.required:
+            return f"{self.instance}[{field!r}]"
+        return f"{self.instance}.get({field!r})"
+
+    def fail(self, rule, indent=2, **fields):
+        message = self.constant(rule["message"])
+        arguments = "".join(f", {name}={value}" for name, value in fields.items())
+        self.emit(f"raise _error({message}.format(path=path{arguments}))", indent)
+
+
+def _compile_required(codegen, rule):
+    """The fields must be present. The message gets the first missing {field}."""
+    fields = rule["fields"]
+    condition = " or ".join(f"{field!r} not in {codegen.instance}" for field in fields)
+    codegen.emit(f"if {condition}:")
+    codegen.emit(f"for _field in {codegen.constant(tuple(fields))}:", 2)
+    codegen.emit(f"if _field not in {codegen.instance}:", 3)
+    codegen.fail(rule, indent=4, field="_field")
+    codegen.required.update(fields)
+
+
+def _compile_type(codegen, rule):
+    """The fields must be of a "type" of _TYPES, and not empty when "non_empty" is set.
+
+    Strings made only of whitespace are empty. When a "default" factory is given,
+    a value of the wrong type is replaced by default() instead of failing.
+    """
+    type_name = _TYPES[rule["type"]]
+    for field in rule["fields"]:
+        codegen.emit(f"_value = {codegen.get(field)}")
+        condition = f"not isinstance(_value, {type_name})"
+        if rule.get("non_empty"):
+            empty = "_value.strip()" if type_name == "str" else "_value"
+            condition += f" or not {empty}"
+        codegen.emit(f"if {condition}:")
+        if "default" in rule:
+            default = codegen.constant(rule["default"])
+            codegen.emit(f"{codegen.instance}[{field!r}] = {default}()", 2)
+        else:
+            codegen.fail(rule, field=repr(field), value="_value")
+
+
+def _compile_items_type(codegen, rule):
+    """Every item of the list fields must be of a "type" of _TYPES."""
+    type_name = _TYPES[rule["type"]]
+    for field in rule["fields"]:
+        codegen.emit(
+            f"if not all(isinstance(_item, {type_name}) for _item in {codegen.get(field)}):"
+        )
+        codegen.fail(rule, field=repr(field))
+
+
+def _compile_enum(codegen, rule):
+    """The field must be one of the "values". The message gets {value} and {values}."""
+    values = rule["values"]
+    codegen.emit(f"_value = {codegen.get(rule['field'])}")
+    codegen.emit(f"if _value not in {codegen.constant(frozenset(values))}:")
+    codegen.fail(rule, value="_value", values=codegen.constant(list(values)))
+
+
+def _compile_depends(codegen, rule):
+    """The "fields" must equal the tuple that "values" maps the value of "field" to.
+
+    Must follow an enum rule on the same field. The message gets {value},
+    {expected} and {actual}, the expected and actual tuples of values.
+    """
+    fields = rule["fields"]
+    codegen.emit(
+        f"_expected = {codegen.constant(rule['values'])}[{codegen.get(rule['field'])}]"
+    )
+    condition = " or ".join(
+        f"{codegen.get(field)} != _expected[{index}]"
+        for index, field in enumerate(fields)
+    )
+    codegen.emit(f"if {condition}:")
+    actual = "(" + ", ".join(codegen.get(field) for field in fields) + ",)"
+    codegen.fail(
+        rule, value=codegen.get(rule["field"]), expected="_expected", actual=actual
+    )
+
+
+def _compile_requires(codegen, rule):
+    """The "required" field must be truthy when the "field" is truthy."""
+    codegen.emit(
+        f"if {codegen.get(rule['field'])} and not {codegen.get(rule['required'])}:"
+    )
+    codegen.fail(rule)
+
+
+def _compile_less_than(codegen, rule):
+    """The "low" field must be less than the "high" one when both are not None.
+
+    The message gets {low} and {high}, their values.
+    """
+    codegen.emit(f"_low = {codegen.get(rule['low'])}")
+    codegen.emit(f"_high = {codegen.get(rule['high'])}")
+    codegen.emit("if _low is not None and _high is not None and _low >= _high:")
+    codegen.fail(rule, low="_low", high="_high")
+
+
+_COMPILERS = {
+    "required": _compile_required,
+    "type": _compile_type,
+    "items_type": _compile_items_type,
+    "enum": _compile_enum,
+    "depends": _compile_depends,
+    "requires": _compile_requires,
+    "less_than": _compile_less_than,
+}
+
+
+def generate_source(schema, function_name):
+    """The source of the validation function of a schema and the constants it uses."""
+    codegen = _Codegen(schema.get("instance", "instance"))
+    for rule in schema["rules"]:
+        _COMPILERS[rule["rule"]](codegen, rule)
+    codegen.emit("return None")
+    header = f"def {function_name}({codegen.instance}, path=''):"
+    return "\n".join([header, *codegen.lines]) + "\n", codegen.constants
+
+
+def compile_schema(schema, function_name=None):
+    """Compile a schema into a function that raises InvalidDataModelError on the first failing rule."""
+    function_name = function_name or f"validate_{schema['title']}"
+    source, constants = generate_source(schema, function_name)
+    namespace = {"_error": InvalidDataModelError, **constants}
+    exec(compile(source, f"<schema {schema['title']}>", "exec"), namespace)
+    validator = namespace[function_name]
+    validator.__doc__ = f"Validate a {schema['title']} against its compiled schema."
+    validator.source = source
+    return validator
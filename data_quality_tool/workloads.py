@@ -0,0 +1,121 @@
+"""The CPU bound work of the endpoints, run inline or in the process pool.
+
+The functions take and return picklable values, so they can be sent to the worker
+processes with executors.run_workload. Uploaded workbooks are passed as the path
+of their spooled file and JSON bodies as bytes, both parsed by the worker, which
+also records the number of CDEs. The exported workbook is passed back as the path
+of a temporary file.
+"""
+
+import os
+import tempfile
+from io import BytesIO
+
+from codec import dumps, loads
+from common_entities import NoJSONError
+from converter.excel_reader import read_excel_rows
+from converter.excel_to_json import import_excel_rows
+from converter.json_to_excel import write_json_to_excel
+from metrics import counted_cdes, record_cdes, stage
+from validator import json_validator
+
+EXAMPLE_DATA_MODEL = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "examples",
+    "MinimalDataModelExample.json",
+)
+
+
+def convert_workbook(workbook, pretty=False, max_rows=None, max_columns=None):
+    """Validate and convert an uploaded workbook, returning the JSON data model as bytes.
+
+    Args:
+        workbook: The path of the workbook, or a seekable binary file.
+        pretty: Whether to indent the JSON.
+        max_rows, max_columns: The size limits of the sheet, see read_excel_rows.
+    """
+    with stage("parse"):
+        columns, rows = read_excel_rows(workbook, max_rows, max_columns)
+    # Rows are parsed as they are validated and converted.
+    with stage("convert"):
+        json_data = import_excel_rows(columns, counted_cdes(rows))
+    with stage("serialize"):
+        return dumps(json_data, pretty=pretty)
+
+
+def validate_workbook(workbook, max_rows=None, max_columns=None):
+    """Validate an uploaded workbook, see convert_workbook."""
+    with stage("parse"):
+        columns, rows = read_excel_rows(workbook, max_rows, max_columns)
+    # Rows are parsed as they are validated.
+    with stage("validate"):
+        import_excel_rows(columns, counted_cdes(rows), validate_only=True)
+
+
+def load_data_model(body):
+    """Parse a JSON body and record its number of CDEs.
+
+    Raises:
+        NoJSONError: If the body is not JSON, or is empty.
+    """
+    with stage("parse"):
+        try:
+            data_model = loads(body)
+        except ValueError:
+            data_model = None
+    if not data_model:
+        raise NoJSONError("No JSON provided")
+    try:
+        record_cdes(json_validator.count_common_data_elements(data_model))
+    except (AttributeError, TypeError):
+        # Malformed data models are reported by the validation.
+        pass
+    return data_model
+
+
+def validate_data_model(data_model):
+    """Validate a data model, given as parsed JSON or as a JSON body."""
+    if isinstance(data_model, bytes):
+        data_model = load_data_model(data_model)
+    with stage("validate"):
+        json_validator.validate_json(data_model)
+
+
+def export_data_model(data_model, output):
+    """Validate a data model and write it as a workbook to a binary file object."""
+    if isinstance(data_model, bytes):
+        data_model = load_data_model(data_model)
+    with stage("validate"):
+        json_validator.validate_json(data_model)
+    with stage("write"):
+        write_json_to_excel(data_model, output)
+
+
+def export_data_model_to_file(data_model):
+    """Like export_data_model, to a temporary file whose path is returned.
+
+    The caller owns the file and must delete it.
+    """
+    descriptor, path = tempfile.mkstemp(suffix=".xlsx", prefix="dqt-")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            export_data_model(data_model, output)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def warm_up(example=EXAMPLE_DATA_MODEL):
+    """Run every workload once on an example data model.
+
+    Imports the modules loaded on first use and fills the caches of the parsers and
+    validators, so that the gunicorn workers forked afterwards start warm.
+    """
+    with open(example, "rb") as file:
+        body = file.read()
+    validate_data_model(body)
+    workbook = BytesIO()
+    export_data_model(body, workbook)
+    validate_workbook(workbook)
+    convert_workbook(workbook)